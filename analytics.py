@@ -0,0 +1,124 @@
+"""
+Deterministic engagement analytics over a profile's scraped posts: per-type
+engagement, posting cadence, best weekdays and hours, hashtag lift and
+outlier posts. Computed locally in one pass per grouping (no model call), so
+the prompts get checked numbers instead of asking the model to count.
+"""
+
+from datetime import timedelta
+from statistics import fmean, median
+
+from prompt_pack import _parse_ts, engagement
+
+WEEKDAYS = ("segunda", "terça", "quarta", "quinta", "sexta", "sábado", "domingo")
+HOUR_BLOCK = 3  # best-hour stats use 3-hour windows; single hours are too sparse
+
+
+def _group(rows, key):
+    groups = {}
+    for row in rows:
+        k = key(row)
+        if k is not None:
+            groups.setdefault(k, []).append(row["engagement"])
+    return groups
+
+def _ranked(groups, mean, label, top):
+    out = [{"key": label(k), "posts": len(v), "avg_engagement": round(fmean(v), 1),
+            "lift": round(fmean(v) / mean, 2) if mean else None} for k, v in groups.items()]
+    out.sort(key=lambda g: g["avg_engagement"], reverse=True)
+    return out[:top] if top else out
+
+def profile_stats(profile, posts=None, tz_offset_hours=0, top=3, top_hashtags=8, min_tag_posts=2):
+    posts = profile.get("posts", []) if posts is None else posts
+    followers = profile.get("followersCount") or 0
+    stats = {"username": profile.get("username"), "followers": followers, "posts": len(posts)}
+    if not posts:
+        return stats
+
+    offset = timedelta(hours=tz_offset_hours)
+    rows = []
+    for p in posts:
+        ts = _parse_ts(p.get("timestamp"))
+        rows.append({"post": p, "engagement": engagement(p), "ts": ts + offset if ts else None,
+                     "type": p.get("type") or "?", "tags": {h.lower() for h in p.get("hashtags") or []}})
+    engs = [r["engagement"] for r in rows]
+    mean, med = fmean(engs), median(engs)
+
+    def rate(value):
+        return round(value / followers * 100, 3) if followers else None
+
+    stats["engagement"] = {"mean": round(mean, 1), "median": med, "rate": rate(mean)}
+
+    by_type = _ranked(_group(rows, lambda r: r["type"]), mean, str, None)
+    for t in by_type:
+        views = [r["post"].get("videoViewCount") for r in rows
+                 if r["type"] == t["key"] and r["post"].get("videoViewCount")]
+        t.update(rate=rate(t["avg_engagement"]), avg_views=round(fmean(views)) if views else None)
+    stats["by_type"] = by_type
+
+    dated = sorted(r["ts"] for r in rows if r["ts"])
+    if len(dated) > 1:
+        span = (dated[-1] - dated[0]).total_seconds() / 86400
+        gaps = [(b - a).total_seconds() / 86400 for a, b in zip(dated, dated[1:])]
+        stats["cadence"] = {"period_days": round(span, 1),
+                            "posts_per_week": round(len(dated) / span * 7, 2) if span else None,
+                            "median_gap_days": round(median(gaps), 2)}
+
+    stats["best_days"] = _ranked(_group(rows, lambda r: r["ts"] and r["ts"].weekday()),
+                                 mean, lambda d: WEEKDAYS[d], top)
+    stats["best_hours"] = _ranked(
+        _group(rows, lambda r: r["ts"] and r["ts"].hour // HOUR_BLOCK), mean,
+        lambda b: f"{b * HOUR_BLOCK}h–{(b + 1) * HOUR_BLOCK}h", top)
+
+    tags = {}
+    for r in rows:
+        for tag in r["tags"]:
+            tags.setdefault(tag, []).append(r["engagement"])
+    stats["hashtags"] = _ranked({f"#{t}": v for t, v in tags.items() if len(v) >= min_tag_posts},
+                                mean, str, top_hashtags)
+
+    # Robust z-score (median absolute deviation); > 3.5 is an outlier
+    mad = median(abs(e - med) for e in engs)
+    outliers = []
+    if mad:
+        for r in rows:
+            z = 0.6745 * (r["engagement"] - med) / mad
+            if z > 3.5:
+                p = r["post"]
+                outliers.append({"date": str(p.get("timestamp", ""))[:10], "type": r["type"],
+                                 "engagement": r["engagement"], "z": round(z, 1),
+                                 "shortCode": p.get("shortCode"),
+                                 "caption": " ".join((p.get("caption") or "").split())[:120]})
+        outliers.sort(key=lambda o: o["z"], reverse=True)
+    stats["outliers"] = outliers[:top]
+    return stats
+
+def format_stats(stats):
+    """Compact plain-text block of profile_stats for a prompt"""
+    if not stats.get("posts"):
+        return "Sem posts coletados."
+    e = stats["engagement"]
+    lines = [f"Posts analisados: {stats['posts']} · engajamento médio (likes+comentários) "
+             f"{e['mean']:,.0f} · mediana {e['median']:,.0f}"
+             + (f" · taxa {e['rate']}% dos seguidores" if e["rate"] is not None else "")]
+
+    def ranked(items):
+        return " · ".join(f"{g['key']} {g['lift']}x ({g['posts']} posts)" for g in items)
+
+    lines.append("Por tipo: " + " · ".join(
+        f"{t['key']} {t['posts']} posts, média {t['avg_engagement']:,.0f} ({t['lift']}x)"
+        + (f", {t['avg_views']:,} views" if t["avg_views"] else "") for t in stats["by_type"]))
+    if stats.get("cadence"):
+        c = stats["cadence"]
+        lines.append(f"Frequência: {c['posts_per_week']} posts/semana · intervalo mediano "
+                     f"{c['median_gap_days']} dias · período de {c['period_days']} dias")
+    if stats["best_days"]:
+        lines.append("Melhores dias: " + ranked(stats["best_days"]))
+    if stats["best_hours"]:
+        lines.append("Melhores horários: " + ranked(stats["best_hours"]))
+    if stats["hashtags"]:
+        lines.append("Hashtags com maior engajamento relativo: " + ranked(stats["hashtags"]))
+    for o in stats["outliers"]:
+        lines.append(f"Post fora da curva: {o['date']} {o['type']} {o['engagement']:,} "
+                     f"(z {o['z']}) \"{o['caption']}\"")
+    return "\n".join(lines)
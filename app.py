@@ -7,11 +7,39 @@ import os
 import json
 import time
 import threading
-from datetime import datetime
+import asyncio
+import contextvars
+import gzip
+import zlib
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from functools import partial
 from pathlib import Path
-from flask import Flask, render_template, request, jsonify
-import anthropic
-from apify_client import ApifyClient
+try:
+    import fcntl
+except ImportError:  # not on Windows: a single process there
+    fcntl = None
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
+from scrape_cache import ScrapeCache, merge_posts, newest_timestamp, post_key, project_profile, project_post
+from llm_cache import LLMCache
+from clients import ClientRegistry
+from report_index import ReportIndex
+from report_store import ReportStore, encode_json
+from jobs import Job, JobQueue, JobCancelled, STATUS_FIELDS
+from governor import CallGovernor, classify
+from async_engine import AsyncEngine
+from checkpoints import Checkpoint
+from memwatch import PeakRSS
+from metrics_store import MetricsStore
+from fingerprints import profile_fingerprint
+from shared_results import Abandoned, SharedResults
+import prompt_pack
+import pdf_report
+import analytics
+import tracing
 
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", "radar-ig-secret-2026")
@@ -22,11 +50,89 @@ CONFIG_FILE = DATA_DIR / "config.json"
 DATA_DIR.mkdir(exist_ok=True)
 REPORTS_DIR.mkdir(exist_ok=True)
 
-run_status = {
-    "running": False, "logs": [], "progress": 0,
-    "total": 0, "current_profile": "", "finished": False,
-    "last_run": None, "error": None,
+MODEL = "claude-opus-4-6"
+
+llm_cache = LLMCache(DATA_DIR / "llm_cache.sqlite",
+                     max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", 50)) * 1024 * 1024))
+
+# The SDKs are imported on first use, not at worker startup (anthropic alone
+# takes over a second to import)
+def new_anthropic_client(key):
+    import anthropic
+    # Model calls are retried by anthropic_governor, so the SDK's own retries are off
+    return anthropic.Anthropic(api_key=key, max_retries=0)
+
+def new_apify_client(token):
+    from apify_client import ApifyClient
+    return ApifyClient(token)
+
+def new_async_anthropic_client(key):
+    import anthropic
+    return anthropic.AsyncAnthropic(api_key=key, max_retries=0)
+
+def new_async_apify_client(token):
+    from apify_client import ApifyClientAsync
+    return ApifyClientAsync(token)
+
+# Shared, keep-alive SDK clients (one per credential) for all worker threads
+anthropic_clients = ClientRegistry("anthropic", new_anthropic_client)
+apify_clients = ClientRegistry("apify", new_apify_client)
+
+# Runs with engine="async" multiplex all their actor runs and model calls on
+# one event loop instead of a thread per in-flight call. Async clients are
+# bound to that loop, so they are also closed on it.
+engine = AsyncEngine()
+async_anthropic_clients = ClientRegistry("anthropic-async", new_async_anthropic_client,
+                                         close=lambda c: engine.submit(c.close()))
+async_apify_clients = ClientRegistry("apify-async", new_async_apify_client,
+                                     close=lambda c: engine.submit(c.http_client.aclose()))
+STARTED_AT = time.time()
+
+# Process-wide rate limits for every job and thread (0 = no budget)
+anthropic_governor = CallGovernor(
+    "anthropic", rpm=int(os.getenv("ANTHROPIC_RPM", 50)), tpm=int(os.getenv("ANTHROPIC_TPM", 0)),
+    max_concurrency=int(os.getenv("ANTHROPIC_MAX_CONCURRENCY", 6)))
+apify_governor = CallGovernor(
+    "apify", rpm=int(os.getenv("APIFY_RPM", 0)),
+    max_concurrency=int(os.getenv("APIFY_MAX_CONCURRENCY", 8)))
+PROFILE_RETRIES = int(os.getenv("PROFILE_RETRIES", 1))
+
+scrape_cache = ScrapeCache(
+    DATA_DIR / "scrape_cache",
+    profile_ttl=float(os.getenv("SCRAPE_PROFILE_TTL_HOURS", 24)) * 3600,
+    posts_ttl=float(os.getenv("SCRAPE_POSTS_TTL_HOURS", 6)) * 3600,
+    max_bytes=int(float(os.getenv("SCRAPE_CACHE_MAX_MB", 200)) * 1024 * 1024),
+)
+
+# Scraped snapshots, niches and competitor facts shared by concurrent runs
+shared_artifacts = SharedResults(ttl=float(os.getenv("SHARED_TTL_SECONDS", 300)),
+                                 max_entries=int(os.getenv("SHARED_MAX_ENTRIES", 512)))
+
+metrics = MetricsStore(DATA_DIR / "metrics.sqlite")
+
+STREAM_FLUSH_S = 0.25
+
+# Input-token budgets per prompt section; override per config with "prompt_budgets"
+PROMPT_BUDGETS = {
+    "posts":             int(os.getenv("PROMPT_POSTS_TOKENS", 1500)),
+    "content_plan":      int(os.getenv("PROMPT_PLAN_TOKENS", 4000)),
+    "executive_summary": int(os.getenv("PROMPT_SUMMARY_TOKENS", 3500)),
 }
+_call_usage = contextvars.ContextVar("call_usage", default=None)
+# Timezone used for best day/hour stats (Instagram timestamps are UTC)
+ANALYTICS_UTC_OFFSET = float(os.getenv("ANALYTICS_UTC_OFFSET", -3))
+NICHE_MAX_TOKENS = 50
+ANALYSIS_MAX_TOKENS = 3000
+# A competitor analysis is its niche-independent facts (shared between the
+# runs that track that competitor) plus a part written for the requester's niche
+FACTS_MAX_TOKENS = 2200
+ANGLE_MAX_TOKENS = 1000
+
+# Message Batches mode (opt-in per config / run with "batch_mode")
+BATCH_POLL_S = float(os.getenv("BATCH_POLL_SECONDS", 10))
+BATCH_DISCOUNT = 0.5
+PRICE_PER_MTOK = {"input":  float(os.getenv("MODEL_PRICE_INPUT_PER_MTOK", 5.0)),
+                  "output": float(os.getenv("MODEL_PRICE_OUTPUT_PER_MTOK", 25.0))}
 
 def load_config():
     env_comp = os.getenv("COMPETITORS", "")
@@ -37,86 +143,539 @@ def load_config():
         "competitors":   [c.strip() for c in env_comp.split(",") if c.strip()] if env_comp else [],
         "apify_token":   os.getenv("APIFY_TOKEN", ""),
         "anthropic_key": os.getenv("ANTHROPIC_API_KEY", ""),
+        "scrape_concurrency": int(os.getenv("SCRAPE_CONCURRENCY", 4)),
+        "llm_concurrency":    int(os.getenv("LLM_CONCURRENCY", 3)),
+        "scrape_batch_size":  int(os.getenv("SCRAPE_BATCH_SIZE", 50)),
+        "batch_mode":         os.getenv("BATCH_MODE", "0") == "1",
+        # "threads" (a worker thread per in-flight call) or "async" (one event loop)
+        "engine":             os.getenv("ENGINE", "threads"),
+        "async_concurrency":  int(os.getenv("ASYNC_CONCURRENCY", 50)),
+        # Reuse the last analysis of an unchanged profile if it is at most this old (0 = off)
+        "carry_over_max_days": float(os.getenv("CARRY_OVER_MAX_DAYS", 7)),
     }
     if CONFIG_FILE.exists():
         try:
             saved = json.loads(CONFIG_FILE.read_text(encoding="utf-8"))
             for k, v in saved.items():
-                if v or v == []:
+                # Empty strings fall back to the environment; saved numbers and
+                # booleans (carry_over_max_days=0, batch_mode=false) are kept
+                if v or v == [] or isinstance(v, (bool, int, float)):
                     config[k] = v
         except:
             pass
     return config
 
 def save_config(config):
-    CONFIG_FILE.write_text(json.dumps(config, ensure_ascii=False, indent=2), encoding="utf-8")
+    # Written aside and swapped in, so other workers never read half a file
+    tmp = CONFIG_FILE.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(config, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, CONFIG_FILE)
+
+_config_lock = threading.Lock()
+
+@contextmanager
+def config_lock():
+    """Held around read-modify-writes of the config, across worker processes"""
+    with _config_lock, open(DATA_DIR / "config.lock", "a") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+class ProfileNotFound(Exception):
+    pass
+
+def _retryable(error):
+    """Worth another attempt later: not a missing profile and not a fatal API error"""
+    if isinstance(error, ProfileNotFound):
+        return False
+    return classify(error.__cause__ or error) != "fatal"
+
+def _dataset_id(run):
+    # apify-client 1.x returns the run as a dict, later versions as a Run model
+    return run["defaultDatasetId"] if isinstance(run, dict) else run.default_dataset_id
+
+# Dataset items are cut down to the used fields page by page as they are read,
+# so a run never holds the raw payloads (images, URLs, comments...) at once
+ACTOR_PROJECTIONS = {"apify/instagram-profile-scraper": project_profile,
+                     "apify/instagram-scraper": project_post}
+ACTOR_SPANS = {"apify/instagram-profile-scraper": "profile", "apify/instagram-scraper": "posts"}
+
+def _actor_items(client, actor, run_input):
+    run = client.actor(actor).call(run_input=run_input)
+    project = ACTOR_PROJECTIONS.get(actor, dict)
+    return [project(item) for item in client.dataset(_dataset_id(run)).iterate_items()]
+
+async def _actor_items_async(client, actor, run_input):
+    run = await client.actor(actor).call(run_input=run_input)
+    project = ACTOR_PROJECTIONS.get(actor, dict)
+    return [project(item) async for item in client.dataset(_dataset_id(run)).iterate_items()]
+
+def _posts_input(unames, max_posts, newer_than=None):
+    """instagram-scraper input: one run for all profile URLs"""
+    run_input = {
+        "directUrls": [f"https://www.instagram.com/{u}/" for u in unames],
+        "resultsType": "posts",
+        "resultsLimit": max_posts,
+        "proxy": {"useApifyProxy": True},
+    }
+    if newer_than:
+        run_input["onlyPostsNewerThan"] = newer_than[:10]
+    return run_input
+
+def _group_posts(items):
+    posts_by_owner = {}
+    for post in items:
+        owner = (post.get("ownerUsername") or "").lower()
+        posts_by_owner.setdefault(owner, []).append(post)
+    return posts_by_owner
+
+SHARED_WAIT = "shared-wait"  # scrape step: wait for profiles another run is scraping
+
+def _scrape_steps(usernames, max_posts, cache, force_refresh, stats, unchanged=None):
+    """The scraping logic of scrape_profiles, independent of how actors are run:
+    a generator that yields (actor, run_input) for every actor run it needs and
+    is sent back the dataset items (or thrown the error), and (SHARED_WAIT,
+    futures) when it needs profiles another run is already scraping (sent back
+    None once they are done). Returns the results.
+
+    Profiles are claimed in shared_artifacts first, so concurrent runs scrape
+    each of them once; forced refreshes only join scrapes still in flight."""
+    unames = list(dict.fromkeys(u.lstrip("@") for u in usernames))
+    stats.setdefault("profiles_shared", 0)
+    keys = {u: ("scrape", u.lower(), max_posts) for u in unames}
+    claims = {u: shared_artifacts.claim(keys[u], fresh=force_refresh) for u in unames}
+    owned = [u for u in unames if claims[u][1]]
+    posts_skipped = set()
+    try:
+        results = yield from _scrape_owned(owned, max_posts, cache, force_refresh, stats,
+                                           unchanged, posts_skipped)
+    except BaseException:
+        for u in owned:
+            shared_artifacts.abandon(keys[u], claims[u][0])
+        raise
+    for u in owned:
+        if u in posts_skipped:
+            # Not a full snapshot: runs waiting for it scrape it themselves
+            shared_artifacts.abandon(keys[u], claims[u][0])
+        elif isinstance(results[u], Exception):
+            shared_artifacts.fail(keys[u], claims[u][0], results[u])
+        else:
+            shared_artifacts.resolve(keys[u], claims[u][0], results[u])
+
+    joined = {u: claims[u][0] for u in unames if not claims[u][1]}
+    if joined:
+        with tracing.span("shared_wait", stage="scrape"):
+            yield SHARED_WAIT, list(joined.values())
+        again = []
+        for u, fut in joined.items():
+            try:
+                # Each run gets its own copy, without the marks of what was
+                # fetched: the run that fetched it records its metrics
+                results[u] = {k: v for k, v in fut.result().items() if k not in ("fetched_at", "fresh_posts")}
+                stats["profiles_shared"] += 1
+            except Abandoned:
+                again.append(u)
+            except Exception as e:
+                results[u] = e
+        if again:
+            results.update((yield from _scrape_steps(again, max_posts, cache, force_refresh,
+                                                     stats, unchanged)))
+    return {u: results[u] for u in unames}
+
+def _scrape_owned(unames, max_posts, cache, force_refresh, stats, unchanged, posts_skipped):
+    for k in ("actor_runs", "actor_runs_skipped", "profiles_cached", "posts_cached",
+              "posts_incremental", "posts_skipped"):
+        stats.setdefault(k, 0)
+    entries = {u: cache.get(u) for u in unames} if cache else {}
+    for entry in entries.values():
+        if entry:  # entries cached before projection still hold raw items
+            if entry.get("profile"):
+                entry["profile"] = project_profile(entry["profile"])
+            if entry.get("posts"):
+                entry["posts"] = [project_post(p) for p in entry["posts"]]
+    results = {}
+
+    # Step 1: Get profile data for every stale username in a single actor run
+    to_fetch = []
+    for u in unames:
+        entry = entries.get(u)
+        if not force_refresh and cache and cache.profile_fresh(entry):
+            results[u] = dict(entry["profile"])
+            stats["profiles_cached"] += 1
+        else:
+            to_fetch.append(u)
+    if to_fetch:
+        try:
+            profile_items = yield "apify/instagram-profile-scraper", {"usernames": to_fetch}
+            stats["actor_runs"] += 1
+        except Exception as e:
+            for u in to_fetch:
+                results[u] = Exception(f"Erro Apify (perfil) para @{u}: {str(e)}")
+                results[u].__cause__ = e
+            profile_items = []
+
+        by_username = {}
+        for item in profile_items:
+            name = (item.get("username") or "").lower()
+            if name and not item.get("error"):
+                by_username.setdefault(name, item)
+        for u in to_fetch:
+            if u in results:
+                continue
+            profile = by_username.get(u.lower())
+            results[u] = profile if profile else ProfileNotFound(f"Perfil @{u} não encontrado ou privado")
+            if profile and cache:
+                cache.put(u, profile=profile)
+            if profile:
+                profile["fetched_at"] = time.time()
+
+    found = [u for u in unames if not isinstance(results[u], Exception)]
+
+    # Step 2: Get posts — cached, incremental (one run) or full (one run) — and
+    # route each item back to its profile by ownerUsername
+    full, incremental, skipped = [], [], False
+    for u in found:
+        entry = entries.get(u)
+        if unchanged and unchanged(u, results[u]):
+            # Nothing new since the last analysis: that analysis is reused, so
+            # the posts are not fetched
+            results[u]["posts"] = ((entry or {}).get("posts") or results[u].get("latestPosts", []))[:max_posts]
+            stats["posts_skipped"] += 1
+            posts_skipped.add(u)
+            skipped = True
+        elif not force_refresh and cache and cache.posts_fresh(entry):
+            results[u]["posts"] = entry["posts"][:max_posts]
+            stats["posts_cached"] += 1
+        elif entry and entry.get("posts"):
+            incremental.append(u)
+        else:
+            full.append(u)
+    if skipped and not full and not incremental:
+        stats["actor_runs_skipped"] += 1
+
+    for group, newer_than in ((full, None), (incremental, min(
+            (newest_timestamp(entries[u]["posts"]) or "" for u in incremental), default=None))):
+        if not group:
+            continue
+        try:
+            posts_by_owner = _group_posts((yield "apify/instagram-scraper",
+                                           _posts_input(group, max_posts, newer_than)))
+            stats["actor_runs"] += 1
+        except Exception:
+            # Posts failed but profiles OK — continue with cached or embedded posts
+            posts_by_owner = None
+        for u in group:
+            profile = results[u]
+            cached = (entries.get(u) or {}).get("posts") or []
+            if posts_by_owner is None:
+                profile["posts"] = cached[:max_posts] or profile.get("latestPosts", [])
+                continue
+            fresh = posts_by_owner.get(u.lower(), [])
+            if group is incremental:
+                stats["posts_incremental"] += 1
+                posts = merge_posts(cached, fresh, max_posts)
+            else:
+                posts = fresh or profile.get("latestPosts", [])
+                fresh = posts if fresh or "fetched_at" in profile else []
+            profile["posts"] = posts
+            # Only these carry this run's likes/comments; merged older posts
+            # keep the numbers of the run that fetched them
+            profile["fresh_posts"] = [post_key(p) for p in fresh if post_key(p)]
+            if cache:
+                cache.put(u, posts=posts)
+    return results
+
+def scrape_profiles(usernames, apify_token, max_posts=30, cache=None,
+                    force_refresh=False, stats=None, unchanged=None):
+    """Scrape several Instagram profiles + posts with one run of each Apify actor.
+
+    Returns {username: profile dict or Exception}, so a missing or private
+    profile fails on its own without failing the rest of the batch.
+
+    With a ScrapeCache, fresh layers are served from disk; stale or forced
+    posts are fetched incrementally (only newer than the newest cached post)
+    and merged into the cached set. Posts are not fetched at all for profiles
+    where unchanged(username, profile) is true.
+    """
+    client = apify_clients.get(apify_token)
+    steps = _scrape_steps(usernames, max_posts, cache, force_refresh,
+                          stats if stats is not None else {}, unchanged)
+    step = steps.send
+    arg = None
+    while True:
+        try:
+            actor, run_input = step(arg)
+        except StopIteration as done:
+            return done.value
+        if actor == SHARED_WAIT:
+            wait(run_input)
+            step, arg = steps.send, None
+            continue
+        try:
+            with tracing.span("apify", actor=ACTOR_SPANS.get(actor, actor)) as sp:
+                try:
+                    items = apify_governor.call(_actor_items, client, actor, run_input)
+                finally:
+                    sp.add(retries=apify_governor.retries())
+                sp.add(items=len(items))
+            step, arg = steps.send, items
+        except Exception as e:
+            step, arg = steps.throw, e
+
+async def scrape_profiles_async(usernames, apify_token, max_posts=30, cache=None,
+                                force_refresh=False, stats=None, unchanged=None):
+    """scrape_profiles on the async engine, with the async Apify client"""
+    client = async_apify_clients.get(apify_token)
+    steps = _scrape_steps(usernames, max_posts, cache, force_refresh,
+                          stats if stats is not None else {}, unchanged)
+    step = steps.send
+    arg = None
+    while True:
+        try:
+            actor, run_input = step(arg)
+        except StopIteration as done:
+            return done.value
+        if actor == SHARED_WAIT:
+            await asyncio.wait([asyncio.wrap_future(f) for f in run_input])
+            step, arg = steps.send, None
+            continue
+        try:
+            with tracing.span("apify", actor=ACTOR_SPANS.get(actor, actor)) as sp:
+                try:
+                    items = await apify_governor.acall(_actor_items_async, client, actor, run_input)
+                finally:
+                    sp.add(retries=apify_governor.retries())
+                sp.add(items=len(items))
+            step, arg = steps.send, items
+        except Exception as e:
+            step, arg = steps.throw, e
 
 def scrape_profile(username, apify_token, max_posts=30):
     """Scrape Instagram profile + posts using apify/instagram-profile-scraper"""
-    client = ApifyClient(apify_token)
     uname = username.lstrip("@")
-
-    # Step 1: Get profile data
+    result = scrape_profiles([uname], apify_token, max_posts)[uname]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+def ask_claude(key, prompt, max_tokens, on_text=None):
+    """Single-turn model call, served from llm_cache when the exact prompt was seen before.
+
+    With on_text, the response is streamed and on_text receives the text in
+    chunks coalesced to at most one call every STREAM_FLUSH_S seconds.
+    """
+    cache_key, cached = _cached_reply(prompt, max_tokens, on_text)
+    if cached is not None:
+        return cached
+    ai = anthropic_clients.get(key)
     try:
-        profile_run = client.actor("apify/instagram-profile-scraper").call(run_input={
-            "usernames": [uname],
-        })
-        profile_items = list(client.dataset(profile_run["defaultDatasetId"]).iterate_items())
-    except Exception as e:
-        raise Exception(f"Erro Apify (perfil) para @{uname}: {str(e)}")
-
-    if not profile_items:
-        raise Exception(f"Perfil @{uname} não encontrado ou privado")
-
-    profile = profile_items[0]
-
-    # Step 2: Get posts separately
+        msg = anthropic_governor.call(_send_message, ai, prompt, max_tokens, on_text,
+                                      tokens=prompt_pack.estimate_tokens(prompt))
+    finally:
+        tracing.annotate(retries=anthropic_governor.retries())
+    return _store_reply(cache_key, prompt, msg)
+
+async def ask_claude_async(key, prompt, max_tokens, on_text=None):
+    """ask_claude on the async engine's loop"""
+    cache_key, cached = _cached_reply(prompt, max_tokens, on_text)
+    if cached is not None:
+        return cached
+    ai = async_anthropic_clients.get(key)
     try:
-        posts_run = client.actor("apify/instagram-scraper").call(run_input={
-            "directUrls": [f"https://www.instagram.com/{uname}/"],
-            "resultsType": "posts",
-            "resultsLimit": max_posts,
-            "proxy": {"useApifyProxy": True},
-        })
-        posts = list(client.dataset(posts_run["defaultDatasetId"]).iterate_items())
-        profile["posts"] = posts
-    except Exception:
-        # Posts failed but profile OK — continue with empty posts
-        profile["posts"] = profile.get("latestPosts", [])
-
-    return profile
-
-def detect_niche(profile_data, key):
-    ai = anthropic.Anthropic(api_key=key)
+        msg = await anthropic_governor.acall(_send_message_async, ai, prompt, max_tokens, on_text,
+                                             tokens=prompt_pack.estimate_tokens(prompt))
+    finally:
+        tracing.annotate(retries=anthropic_governor.retries())
+    return _store_reply(cache_key, prompt, msg)
+
+def _cached_reply(prompt, max_tokens, on_text):
+    cache_key = llm_cache.key(MODEL, max_tokens, prompt)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        _add_usage(cached=True)
+        tracing.label(cached=1)
+        if on_text:
+            on_text(cached)
+    return cache_key, cached
+
+def _add_usage(cached, input_tokens=0, output_tokens=0, shared=0):
+    """Add a model call to the usage of the current stage task (read by _timed);
+    the task counts as cached only if all of its calls were"""
+    usage = _call_usage.get()
+    if usage is None:
+        return  # not in a stage task
+    usage["calls"] += 1
+    usage["cached"] = usage["cached"] and cached
+    usage["input_tokens"] += input_tokens
+    usage["output_tokens"] += output_tokens
+    usage["shared"] += shared
+
+def _shared_text(text, on_text):
+    """A reply another run paid for"""
+    _add_usage(cached=True, shared=1)
+    tracing.label(shared=1)
+    if on_text:
+        on_text(text)
+    return text
+
+def shared_reply(kind, username, key, prompt, max_tokens, on_text=None):
+    """ask_claude for a per-profile artifact: concurrent runs sending the same
+    prompt about the same profile share one call"""
+    text, computed = shared_artifacts.get_or_compute(
+        (kind, username.lower(), llm_cache.key(MODEL, max_tokens, prompt)),
+        ask_claude, key, prompt, max_tokens, on_text)
+    return text if computed else _shared_text(text, on_text)
+
+async def shared_reply_async(kind, username, key, prompt, max_tokens, on_text=None):
+    text, computed = await shared_artifacts.aget_or_compute(
+        (kind, username.lower(), llm_cache.key(MODEL, max_tokens, prompt)),
+        ask_claude_async, key, prompt, max_tokens, on_text)
+    return text if computed else _shared_text(text, on_text)
+
+def _store_reply(cache_key, prompt, msg):
+    text = msg.content[0].text
+    usage = getattr(msg, "usage", None)
+    input_tokens = getattr(usage, "input_tokens", 0) or 0
+    output_tokens = getattr(usage, "output_tokens", 0) or 0
+    _add_usage(cached=False, input_tokens=input_tokens, output_tokens=output_tokens)
+    tracing.annotate(input_tokens=input_tokens, output_tokens=output_tokens)
+    anthropic_governor.charge(input_tokens)
+    prompt_pack.calibrate(prompt, input_tokens)
+    llm_cache.put(cache_key, MODEL, text)
+    return text
+
+def _send_message(ai, prompt, max_tokens, on_text=None):
+    messages = [{"role": "user", "content": prompt}]
+    if on_text is None:
+        return ai.messages.create(model=MODEL, max_tokens=max_tokens, messages=messages)
+    pending, flushed = [], time.monotonic()
+    with ai.messages.stream(model=MODEL, max_tokens=max_tokens, messages=messages) as stream:
+        for chunk in stream.text_stream:
+            pending.append(chunk)
+            if time.monotonic() - flushed >= STREAM_FLUSH_S:
+                on_text("".join(pending))
+                pending, flushed = [], time.monotonic()
+        msg = stream.get_final_message()
+    if pending:
+        on_text("".join(pending))
+    return msg
+
+async def _send_message_async(ai, prompt, max_tokens, on_text=None):
+    messages = [{"role": "user", "content": prompt}]
+    if on_text is None:
+        return await ai.messages.create(model=MODEL, max_tokens=max_tokens, messages=messages)
+    pending, flushed = [], time.monotonic()
+    async with ai.messages.stream(model=MODEL, max_tokens=max_tokens, messages=messages) as stream:
+        async for chunk in stream.text_stream:
+            pending.append(chunk)
+            if time.monotonic() - flushed >= STREAM_FLUSH_S:
+                on_text("".join(pending))
+                pending, flushed = [], time.monotonic()
+        msg = await stream.get_final_message()
+    if pending:
+        on_text("".join(pending))
+    return msg
+
+def ask_claude_batch(key, calls, check_cancelled=None, on_progress=None):
+    """Send single-turn prompts as one Message Batch and wait for it to end.
+
+    calls is {custom_id: (prompt, max_tokens)}; returns ({custom_id: text or
+    Exception}, usage). Prompts already in llm_cache never reach the batch.
+    Polls every BATCH_POLL_S seconds from the calling (job) thread, checking
+    check_cancelled in between so a cancelled job also cancels the batch.
+    """
+    results, usage = {}, {"input_tokens": 0, "output_tokens": 0, "cached": 0, "batched": 0}
+    todo = {}
+    for custom_id, (prompt, max_tokens) in calls.items():
+        cached = llm_cache.get(llm_cache.key(MODEL, max_tokens, prompt))
+        if cached is not None:
+            results[custom_id] = cached
+            usage["cached"] += 1
+        else:
+            todo[custom_id] = (prompt, max_tokens)
+    if not todo:
+        return results, usage
+
+    ai = anthropic_clients.get(key)
+    batch = anthropic_governor.call(ai.messages.batches.create, requests=[
+        {"custom_id": custom_id, "params": {
+            "model": MODEL, "max_tokens": max_tokens,
+            "messages": [{"role": "user", "content": prompt}]}}
+        for custom_id, (prompt, max_tokens) in todo.items()])
+    usage["batched"] = len(todo)
+    next_poll = time.monotonic() + BATCH_POLL_S
+    while batch.processing_status != "ended":
+        if check_cancelled:
+            try:
+                check_cancelled()
+            except Exception:
+                ai.messages.batches.cancel(batch.id)
+                raise
+        if time.monotonic() < next_poll:
+            time.sleep(min(1, BATCH_POLL_S))
+            continue
+        batch = anthropic_governor.call(ai.messages.batches.retrieve, batch.id)
+        next_poll = time.monotonic() + BATCH_POLL_S
+        if on_progress:
+            on_progress(batch)
+
+    for entry in ai.messages.batches.results(batch.id):
+        result = entry.result
+        if result.type != "succeeded":
+            results[entry.custom_id] = Exception(f"Lote: pedido {result.type}")
+            continue
+        prompt, max_tokens = todo[entry.custom_id]
+        text = result.message.content[0].text
+        llm_cache.put(llm_cache.key(MODEL, max_tokens, prompt), MODEL, text)
+        results[entry.custom_id] = text
+        usage["input_tokens"] += result.message.usage.input_tokens or 0
+        usage["output_tokens"] += result.message.usage.output_tokens or 0
+        prompt_pack.calibrate(prompt, result.message.usage.input_tokens)
+    for custom_id in todo:
+        results.setdefault(custom_id, Exception("Lote: pedido sem resultado"))
+    return results, usage
+
+def token_cost(input_tokens, output_tokens, batch=False):
+    """Estimated USD cost; Message Batches are billed at BATCH_DISCOUNT of the list price"""
+    cost = (input_tokens * PRICE_PER_MTOK["input"] + output_tokens * PRICE_PER_MTOK["output"]) / 1e6
+    return cost * (BATCH_DISCOUNT if batch else 1)
+
+def niche_prompt(profile_data):
     posts = [p.get("caption", "")[:200] for p in profile_data.get("posts", [])[:8]]
-    prompt = f"""Analise este perfil do Instagram e identifique em UMA frase curta o nicho/área de atuação.
+    return f"""Analise este perfil do Instagram e identifique em UMA frase curta o nicho/área de atuação.
 Bio: {profile_data.get('biography', '')}
 Nome: {profile_data.get('fullName', '')}
 Posts recentes: {json.dumps(posts, ensure_ascii=False)}
 Responda APENAS com o nicho em uma frase curta. Ex: "Coach de emagrecimento", "Advogado tributarista", "Personal trainer", "Chef de cozinha vegana". Seja específico."""
-    msg = ai.messages.create(model="claude-opus-4-6", max_tokens=50,
-                              messages=[{"role": "user", "content": prompt}])
-    return msg.content[0].text.strip()
-
-def build_posts_summary(profile_data):
-    posts = []
-    for post in profile_data.get("posts", [])[:25]:
-        posts.append({
-            "caption": post.get("caption", "")[:400],
-            "likes": post.get("likesCount", 0),
-            "comments": post.get("commentsCount", 0),
-            "type": post.get("type", ""),
-            "date": str(post.get("timestamp", ""))[:10],
-            "hashtags": post.get("hashtags", [])[:10],
-        })
-    return posts
 
-def analyze_own_profile(profile_data, config, key, detected_niche):
-    ai = anthropic.Anthropic(api_key=key)
-    posts = build_posts_summary(profile_data)
+def detect_niche(profile_data, key):
+    with tracing.span("llm", stage="niche"):
+        return shared_reply("niche", profile_data.get("username", ""), key,
+                            niche_prompt(profile_data), NICHE_MAX_TOKENS).strip()
+
+async def detect_niche_async(profile_data, key):
+    with tracing.span("llm", stage="niche"):
+        return (await shared_reply_async("niche", profile_data.get("username", ""), key,
+                                         niche_prompt(profile_data), NICHE_MAX_TOKENS)).strip()
+
+def _budget(config, name):
+    return int((config.get("prompt_budgets") or {}).get(name) or PROMPT_BUDGETS[name])
+
+def build_posts_summary(profile_data, budget_tokens=None):
+    """Compact post table: best posts by engagement/recency that fit budget_tokens"""
+    text, _, _ = prompt_pack.pack_posts(profile_data.get("posts", []),
+                                        budget_tokens or PROMPT_BUDGETS["posts"])
+    return text
+
+def profile_analytics(profile_data):
+    return analytics.profile_stats(profile_data, tz_offset_hours=ANALYTICS_UTC_OFFSET)
+
+def own_profile_prompt(profile_data, config, detected_niche):
+    stats = analytics.format_stats(profile_analytics(profile_data))
+    posts = build_posts_summary(profile_data, _budget(config, "posts"))
     niche = detected_niche or config.get("niche", "criador de conteúdo")
     loc = f" em {config['location']}" if config.get("location") else ""
-    prompt = f"""Você é especialista em marketing digital e estratégia de conteúdo para Instagram.
+    return f"""Você é especialista em marketing digital e estratégia de conteúdo para Instagram.
 Analise MEU PRÓPRIO perfil com diagnóstico honesto e acionável.
 Nicho identificado: {niche}{loc}
 
@@ -124,8 +683,11 @@ PERFIL: {profile_data.get('fullName')} | @{profile_data.get('username')}
 Bio: {profile_data.get('biography')}
 Seguidores: {profile_data.get('followersCount',0):,} | Posts: {profile_data.get('postsCount',0)}
 
-ÚLTIMOS POSTS:
-{json.dumps(posts, ensure_ascii=False, indent=2)}
+MÉTRICAS CALCULADAS (dados exatos, não recalcule):
+{stats}
+
+POSTS DE MAIOR DESTAQUE:
+{posts}
 
 ### 1. DIAGNÓSTICO GERAL
 Nota 0-10 com justificativa. Clareza do posicionamento no nicho "{niche}". Eficácia da bio.
@@ -134,7 +696,7 @@ Nota 0-10 com justificativa. Clareza do posicionamento no nicho "{niche}". Efic
 Para cada post: tema, tipo, performance (likes+comentários), o que funcionou, o que melhorar.
 
 ### 3. PADRÕES IDENTIFICADOS
-Temas que mais engajam. Tipos de post com melhor performance. Frequência. Hashtags.
+Temas que mais engajam. Interprete as métricas calculadas: tipos de post, frequência, dias/horários e hashtags.
 
 ### 4. PONTOS FORTES
 O que fazer mais.
@@ -146,54 +708,99 @@ O que mudar, em ordem de prioridade e impacto.
 Ações concretas e implementáveis para crescer no nicho {niche}.
 
 Responda em português, direto e profissional."""
-    msg = ai.messages.create(model="claude-opus-4-6", max_tokens=3000,
-                              messages=[{"role": "user", "content": prompt}])
-    return msg.content[0].text
 
-def analyze_competitor(profile_data, config, key, my_niche, comp_niche):
-    ai = anthropic.Anthropic(api_key=key)
-    posts = build_posts_summary(profile_data)
-    loc = f" em {config['location']}" if config.get("location") else ""
-    prompt = f"""Você é especialista em inteligência competitiva e estratégia de conteúdo para Instagram.
-Analise este CONCORRENTE e gere relatório de inteligência competitiva.
-Meu nicho: {my_niche}{loc}
+def analyze_own_profile(profile_data, config, key, detected_niche, on_text=None):
+    with tracing.span("llm", stage="analysis", profile="own"):
+        return ask_claude(key, own_profile_prompt(profile_data, config, detected_niche),
+                          ANALYSIS_MAX_TOKENS, on_text)
+
+def competitor_facts_prompt(profile_data, config, comp_niche):
+    """The niche-independent part of a competitor analysis: the same for every
+    run tracking this competitor, whatever its own niche"""
+    stats = analytics.format_stats(profile_analytics(profile_data))
+    posts = build_posts_summary(profile_data, _budget(config, "posts"))
+    return f"""Você é especialista em inteligência competitiva e estratégia de conteúdo para Instagram.
+Analise este perfil CONCORRENTE de forma objetiva, sem considerar o nicho de quem vai ler.
 Nicho do concorrente: {comp_niche}
 
 PERFIL: {profile_data.get('fullName')} | @{profile_data.get('username')}
 Bio: {profile_data.get('biography')}
 Seguidores: {profile_data.get('followersCount',0):,} | Posts: {profile_data.get('postsCount',0)}
 
-POSTS:
-{json.dumps(posts, ensure_ascii=False, indent=2)}
+MÉTRICAS CALCULADAS (dados exatos, não recalcule):
+{stats}
+
+POSTS DE MAIOR DESTAQUE:
+{posts}
 
 ### 1. PERFIL ESTRATÉGICO
-Posicionamento e nicho. Proposta de valor. Público-alvo. Nível de ameaça 1-10 com justificativa.
+Posicionamento e nicho. Proposta de valor. Público-alvo.
 
 ### 2. ANÁLISE DOS POSTS
 Para cada post relevante: tema, tipo, performance, por que funcionou ou não.
 
 ### 3. ESTRATÉGIA DE CONTEÚDO
-Temas mais engajados. Mix de conteúdo. Tom. Frequência. Hashtags.
+Temas mais engajados. Tom. Interprete as métricas calculadas: mix de formatos, frequência, dias/horários e hashtags.
 
 ### 4. PONTOS FORTES
 O que ele faz bem — o que aprender.
 
-### 5. LACUNAS E OPORTUNIDADES
-O que ele não faz — suas oportunidades.
+Responda em português, direto e analítico."""
 
-### 6. INSIGHTS ACIONÁVEIS
-O que implementar para se diferenciar (sem copiar).
+def competitor_prompt(facts, profile_data, config, my_niche, comp_niche):
+    """The part of a competitor analysis written for my_niche, on top of its facts"""
+    loc = f" em {config['location']}" if config.get("location") else ""
+    return f"""Você é especialista em inteligência competitiva e estratégia de conteúdo para Instagram.
+Complete o relatório de inteligência competitiva deste CONCORRENTE para o meu perfil.
+Meu nicho: {my_niche}{loc}
+Concorrente: @{profile_data.get('username')} | Nicho: {comp_niche} | Seguidores: {profile_data.get('followersCount',0):,}
 
-Responda em português, direto e analítico."""
-    msg = ai.messages.create(model="claude-opus-4-6", max_tokens=3000,
-                              messages=[{"role": "user", "content": prompt}])
-    return msg.content[0].text
+ANÁLISE DO CONCORRENTE:
+{facts}
 
-def generate_content_plan(all_analyses, config, key, my_niche):
-    ai = anthropic.Anthropic(api_key=key)
+### 5. NÍVEL DE AMEAÇA
+Nota 1-10 para o meu nicho, com justificativa.
+
+### 6. LACUNAS E OPORTUNIDADES
+O que ele não faz — minhas oportunidades.
+
+### 7. INSIGHTS ACIONÁVEIS
+O que implementar para se diferenciar (sem copiar).
+
+Responda em português, direto e analítico, sem repetir a análise acima."""
+
+def _join_analysis(facts, angle):
+    return f"{facts}\n\n{angle}"
+
+def analyze_competitor(profile_data, config, key, my_niche, comp_niche, on_text=None):
+    with tracing.span("llm", stage="facts"):
+        facts = shared_reply("facts", profile_data.get("username", ""), key,
+                             competitor_facts_prompt(profile_data, config, comp_niche),
+                             FACTS_MAX_TOKENS, on_text)
+    if on_text:
+        on_text("\n\n")
+    with tracing.span("llm", stage="analysis", profile="competitor"):
+        angle = ask_claude(key, competitor_prompt(facts, profile_data, config, my_niche, comp_niche),
+                           ANGLE_MAX_TOKENS, on_text)
+    return _join_analysis(facts, angle)
+
+async def analyze_competitor_async(profile_data, config, key, my_niche, comp_niche, on_text=None):
+    with tracing.span("llm", stage="facts"):
+        facts = await shared_reply_async("facts", profile_data.get("username", ""), key,
+                                         competitor_facts_prompt(profile_data, config, comp_niche),
+                                         FACTS_MAX_TOKENS, on_text)
+    if on_text:
+        on_text("\n\n")
+    with tracing.span("llm", stage="analysis", profile="competitor"):
+        angle = await ask_claude_async(key, competitor_prompt(facts, profile_data, config, my_niche, comp_niche),
+                                       ANGLE_MAX_TOKENS, on_text)
+    return _join_analysis(facts, angle)
+
+def generate_content_plan(all_analyses, config, key, my_niche, on_text=None):
     summaries = [{"perfil": a["username"], "nicho": a.get("detected_niche",""),
-                  "seguidores": a["followers"], "analise": a["analysis"][:800]}
+                  "seguidores": a["followers"], "analise": a["analysis"]}
                  for a in all_analyses if a["type"] == "competitor"]
+    summaries = prompt_pack.pack_analyses(summaries, "analise", _budget(config, "content_plan"))
     loc = f" em {config['location']}" if config.get("location") else ""
     prompt = f"""Você é estrategista de conteúdo especializado em Instagram e growth digital.
 Crie um PLANO DE CONTEÚDO estratégico baseado nas análises dos concorrentes.
@@ -201,7 +808,7 @@ Crie um PLANO DE CONTEÚDO estratégico baseado nas análises dos concorrentes.
 MEU PERFIL: @{config.get('my_profile','')} | Nicho: {my_niche}{loc}
 
 CONCORRENTES ANALISADOS:
-{json.dumps(summaries, ensure_ascii=False, indent=2)}
+{prompt_pack.compact_json(summaries)}
 
 ### 1. TOP 10 TEMAS QUE MAIS ENGAJAM NESTE NICHO
 Com justificativa baseada nos dados reais dos concorrentes.
@@ -219,22 +826,21 @@ Como se destacar com conteúdo único e autêntico.
 Frequência ideal, melhores dias e horários.
 
 Responda em português, específico e implementável."""
-    msg = ai.messages.create(model="claude-opus-4-6", max_tokens=3500,
-                              messages=[{"role": "user", "content": prompt}])
-    return msg.content[0].text
+    with tracing.span("llm", stage="content_plan"):
+        return ask_claude(key, prompt, 3500, on_text)
 
-def generate_executive_summary(all_analyses, config, key, my_niche):
-    ai = anthropic.Anthropic(api_key=key)
+def generate_executive_summary(all_analyses, config, key, my_niche, on_text=None):
     summaries = [{"tipo": a["type"], "perfil": a["username"],
                   "nicho": a.get("detected_niche",""), "seguidores": a["followers"],
-                  "resumo": a["analysis"][:600]}
+                  "resumo": a["analysis"]}
                  for a in all_analyses]
+    summaries = prompt_pack.pack_analyses(summaries, "resumo", _budget(config, "executive_summary"))
     loc = f" em {config['location']}" if config.get("location") else ""
     prompt = f"""Crie RELATÓRIO EXECUTIVO consolidando toda a inteligência competitiva coletada.
 {len(all_analyses)} perfis | @{config.get('my_profile')} | Nicho: {my_niche}{loc} | {datetime.now().strftime('%d/%m/%Y')}
 
 ANÁLISES:
-{json.dumps(summaries, ensure_ascii=False, indent=2)}
+{prompt_pack.compact_json(summaries)}
 
 ### PANORAMA COMPETITIVO
 Situação atual do mercado no Instagram para o nicho {my_niche}{loc}.
@@ -252,22 +858,137 @@ O que nenhum concorrente está fazendo bem.
 3 fases de 30 dias com marcos claros.
 
 Seja direto, executivo, máx 700 palavras."""
-    msg = ai.messages.create(model="claude-opus-4-6", max_tokens=2000,
-                              messages=[{"role": "user", "content": prompt}])
-    return msg.content[0].text
+    with tracing.span("llm", stage="executive_summary"):
+        return ask_claude(key, prompt, 2000, on_text)
+
+def _task_usage():
+    """A fresh usage record for the model calls of the current stage task. It is
+    filled in place, so calls made in tasks started from this one count too."""
+    usage = {"calls": 0, "cached": True, "input_tokens": 0, "output_tokens": 0, "shared": 0}
+    _call_usage.set(usage)
+    return lambda: usage if usage["calls"] else None
+
+def _timed(fn, *args):
+    """Run fn in a worker and return (result, error, elapsed_seconds, usage), where
+    usage is the token usage of the model calls fn made (None if it made none)"""
+    usage = _task_usage()
+    start = time.perf_counter()
+    try:
+        return fn(*args), None, time.perf_counter() - start, usage()
+    except Exception as e:
+        return None, e, time.perf_counter() - start, usage()
 
-def run_analysis_thread(config):
-    global run_status
+async def _atimed(fn, *args, timeout=None, **kwargs):
+    """_timed for a coroutine function on the async engine; a call that outlives
+    `timeout` seconds is cancelled and reported as a TimeoutError"""
+    usage = _task_usage()  # wait_for runs fn in a task of its own
+    start = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(fn(*args, **kwargs), timeout)
+        return result, None, time.perf_counter() - start, usage()
+    except asyncio.TimeoutError:
+        error = TimeoutError(f"sem resposta após {timeout:g}s")
+        return None, error, time.perf_counter() - start, usage()
+    except Exception as e:
+        return None, e, time.perf_counter() - start, usage()
+
+def _stream_to(events, stage, profile=None):
+    """on_text callback that publishes streamed model text as run delta events"""
+    return lambda text: events.emit("delta", {"stage": stage, "profile": profile, "text": text})
+
+def _analyze_task(p_type, data, config, key, my_niche, detected_niche, on_text=None):
+    if p_type == "own":
+        analysis = analyze_own_profile(data, config, key, detected_niche, on_text)
+    else:
+        analysis = analyze_competitor(data, config, key, my_niche, detected_niche, on_text)
+    return analysis
+
+async def _analyze_task_async(p_type, data, config, key, my_niche, detected_niche, on_text=None):
+    if p_type != "own":
+        return await analyze_competitor_async(data, config, key, my_niche, detected_niche, on_text)
+    with tracing.span("llm", stage="analysis", profile="own"):
+        return await ask_claude_async(key, own_profile_prompt(data, config, detected_niche),
+                                      ANALYSIS_MAX_TOKENS, on_text)
+
+# Coroutine version of each stage function, for runs on the async engine
+ASYNC_STAGES = {
+    scrape_profiles: scrape_profiles_async,
+    detect_niche: detect_niche_async,
+    _analyze_task: _analyze_task_async,
+}
+ASYNC_TIMEOUTS = {"scrape": float(os.getenv("ASYNC_SCRAPE_TIMEOUT", 900)),
+                  "llm":    float(os.getenv("ASYNC_LLM_TIMEOUT", 300))}
+
+CARRY_OVER_SCAN = 20  # newest reports searched for a profile's previous analysis
+
+def previous_analyses(usernames, max_age_days):
+    """{username: newest stored analysis with a fingerprint, at most max_age_days
+    old}, each with the report_id and my_niche of the report it is in"""
+    wanted = {u.lower() for u in usernames}
+    found = {}
+    if not max_age_days:
+        return found
+    for report_id in report_index.latest_ids(CARRY_OVER_SCAN):
+        try:
+            header = report_store.header(report_id)
+        except Exception:
+            continue
+        for a in header.get("analyses", []):
+            u = a["username"].lower()
+            if u in wanted and u not in found and a.get("fingerprint"):
+                found[u] = dict(a, report_id=report_id, my_niche=header.get("my_niche", ""))
+        if len(found) == len(wanted):
+            break
+    cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+    return {u: a for u, a in found.items() if (a.get("collected_at") or "") >= cutoff}
+
+def run_analysis_thread(config, force_refresh=False, job=None, checkpoint=None):
+    """Run one analysis. With a Checkpoint, every finished stage is appended to
+    it and stages it already holds (from an interrupted run) are skipped."""
+    job = job or Job("local")
+    run_status, run_events = job.status, job.events
+    run_events.reset()
     run_status.update({"running": True, "logs": [], "finished": False,
                        "error": None, "progress": 0})
 
     apify_token = config.get("apify_token") or os.getenv("APIFY_TOKEN", "")
     anthropic_key = config.get("anthropic_key") or os.getenv("ANTHROPIC_API_KEY", "")
-
+    scrape_workers = max(1, int(config.get("scrape_concurrency") or 1))
+    llm_workers = max(1, int(config.get("llm_concurrency") or 1))
+    batch_size = max(1, int(config.get("scrape_batch_size") or 1))
+    batch_mode = bool(config.get("batch_mode"))
+    use_async = config.get("engine") == "async"
+
+    # Logs are only written from the coordinating thread, so their order in
+    # run_status always matches the order in which stages completed.
     def log(msg, level="info"):
-        run_status["logs"].append({"msg": msg, "level": level,
-                                   "time": datetime.now().strftime("%H:%M:%S")})
-
+        entry = {"msg": msg, "level": level, "time": datetime.now().strftime("%H:%M:%S")}
+        run_status["logs"].append(entry)
+        run_events.emit("log", entry)
+
+    def set_status(**fields):
+        run_status.update(fields)
+        run_events.emit("status", {k: run_status[k] for k in STATUS_FIELDS})
+
+    tokens = {"input": 0, "output": 0, "calls": 0, "cached_calls": 0, "shared_calls": 0}
+
+    def log_usage(label, usage):
+        if not usage:
+            return
+        tokens["shared_calls"] += usage["shared"]
+        if usage["cached"]:
+            tokens["cached_calls"] += 1
+            return
+        tokens["calls"] += 1
+        tokens["input"] += usage["input_tokens"]
+        tokens["output"] += usage["output_tokens"]
+        log(f"🔢 {label}: {usage['input_tokens']:,} tokens de entrada · "
+            f"{usage['output_tokens']:,} de saída", "dim")
+
+    # Finished analyses are written to the report draft as they come in and
+    # only their header entries stay in memory
+    draft = memory = None
+    trace, trace_token = tracing.start_run()
     try:
         if not apify_token:
             raise Exception("Apify Token não configurado. Vá em Configurações.")
@@ -276,80 +997,425 @@ def run_analysis_thread(config):
 
         profiles = [{"username": config["my_profile"], "type": "own"}]
         profiles += [{"username": c, "type": "competitor"} for c in config.get("competitors", [])]
-        run_status["total"] = len(profiles)
-        all_analyses = []
+        for p in profiles:
+            p["username"] = p["username"].lstrip("@")
+        set_status(total=len(profiles))
+        results = {}
         my_niche = config.get("niche", "")
-
+        # Competitor analyses need my_niche; when it isn't configured it comes
+        # from the own profile's detected niche, so they wait for it.
+        my_niche_ready = bool(my_niche)
+        waiting_for_niche = []
+        scraped, niches = {}, {}
+        stages = {"scrape": 0.0, "niche": 0.0, "analysis": 0.0}
+        batch_stats = []
+        # Profiles whose scrape or analysis failed transiently are retried
+        # (up to PROFILE_RETRIES times) once the rest of the pass has drained
+        retries, deferred = {}, []
+        memory = PeakRSS()
+        draft = report_store.draft(job.id)
+        saved = checkpoint.load() if checkpoint else {"analyses": {}}
         for i, p in enumerate(profiles):
-            username = p["username"].lstrip("@")
-            label = "MEU PERFIL" if p["type"] == "own" else "CONCORRENTE"
-            run_status.update({"current_profile": username, "progress": i})
-            log(f"[{label}] Coletando @{username}...", "info")
-
-            try:
-                data = scrape_profile(username, apify_token)
-            except Exception as e:
-                log(f"⚠️  @{username} — {str(e)}", "warn")
-                continue
-
-            if not data:
-                log(f"⚠️  @{username} — perfil não encontrado ou privado", "warn")
-                continue
-
-            followers = data.get("followersCount", 0)
-            posts_count = len(data.get("posts", []))
-            log(f"✅ @{username} — {followers:,} seguidores · {posts_count} posts", "success")
-
-            log(f"🔍 Detectando nicho de @{username}...", "info")
-            try:
-                detected_niche = detect_niche(data, anthropic_key)
-                log(f"🏷️  Nicho: {detected_niche}", "info")
-            except:
-                detected_niche = config.get("niche", "criador de conteúdo")
-
-            if p["type"] == "own" and not my_niche:
-                my_niche = detected_niche
-
-            log(f"🤖 Analisando @{username} com IA...", "info")
-            try:
-                if p["type"] == "own":
-                    analysis = analyze_own_profile(data, config, anthropic_key, detected_niche)
+            if p["username"] in saved["analyses"]:
+                results[i] = draft.add_analysis(saved["analyses"].pop(p["username"]))
+                niches[i] = results[i]["detected_niche"]
+                if p["type"] == "own" and not my_niche:
+                    my_niche, my_niche_ready = niches[i], True
+        resumed = len(results)
+        if resumed:
+            log(f"💾 Retomando: {len(results)} de {len(profiles)} perfis já analisados", "info")
+        if force_refresh:
+            log("♻️  Atualização forçada: ignorando o cache de coleta", "info")
+        # Profiles with nothing new since their last analysis reuse it
+        # (carried over) instead of being analyzed again
+        previous = {} if force_refresh else previous_analyses(
+            [p["username"] for i, p in enumerate(profiles) if i not in results],
+            float(config.get("carry_over_max_days") or 0))
+        types = {p["username"]: p["type"] for p in profiles}
+        fingerprints, reusable, carried = {}, {}, []
+
+        def fingerprint(username, data):
+            return profile_fingerprint(data, (types[username], MODEL, config.get("niche", ""),
+                                              config.get("location", ""), _budget(config, "posts")))
+
+        def unchanged(username, data):
+            prev = previous.get(username.lower())
+            return bool(prev) and prev["fingerprint"] == fingerprint(username, data)
+        done_count = len(results)
+        if results:
+            set_status(progress=done_count)
+        started = time.perf_counter()
+
+        if use_async:
+            limit = max(1, int(config.get("async_concurrency") or 1))
+            group = engine.group({"scrape": limit, "llm": limit})
+            log(f"⚡ Motor assíncrono: até {limit} chamadas simultâneas por etapa", "dim")
+        else:
+            pools = {"scrape": ThreadPoolExecutor(scrape_workers, thread_name_prefix="scrape"),
+                     "llm": ThreadPoolExecutor(llm_workers, thread_name_prefix="llm")}
+        try:
+            pending = {}
+
+            def submit(kind, fn, *args, **kwargs):
+                """Run a stage function as a thread-pool or async-engine task, in
+                this thread's context (so its spans land in this run's trace)"""
+                if use_async:
+                    return group.submit(kind, _atimed, ASYNC_STAGES[fn], *args,
+                                        timeout=ASYNC_TIMEOUTS[kind], **kwargs)
+                return pools[kind].submit(contextvars.copy_context().run,
+                                          _timed, partial(fn, **kwargs), *args)
+
+            def finish(i):
+                nonlocal done_count
+                done_count += 1
+                scraped.pop(i, None)
+                set_status(progress=done_count, current_profile=profiles[i]["username"])
+
+            def submit_scrape(batch):
+                batch_stats.append({})
+                fut = submit("scrape", scrape_profiles, [profiles[i]["username"] for i in batch],
+                             apify_token, cache=scrape_cache, force_refresh=force_refresh,
+                             stats=batch_stats[-1], unchanged=unchanged if previous else None)
+                pending[fut] = ("scrape", batch)
+
+            def retry_later(i, error, submit):
+                if retries.get(i, 0) >= PROFILE_RETRIES or not _retryable(error):
+                    return False
+                retries[i] = retries.get(i, 0) + 1
+                deferred.append((i, submit))
+                return True
+
+            def submit_analysis(i):
+                p = profiles[i]
+                log(f"🤖 Analisando @{p['username']} com IA...", "info")
+                fut = submit("llm", _analyze_task, p["type"], scraped[i],
+                             config, anthropic_key, my_niche, niches[i],
+                             _stream_to(run_events, "analysis", p["username"]))
+                pending[fut] = ("analysis", i)
+
+            def record(i, analysis):
+                """Store a finished analysis (or log its error) and mark the profile done"""
+                username = profiles[i]["username"]
+                if isinstance(analysis, Exception):
+                    log(f"⚠️  Erro na análise de @{username}: {str(analysis)}", "warn")
+                    if not batch_mode and retry_later(i, analysis, lambda: submit_analysis(i)):
+                        return
                 else:
-                    analysis = analyze_competitor(data, config, anthropic_key, my_niche, detected_niche)
-            except Exception as e:
-                log(f"⚠️  Erro na análise de @{username}: {str(e)}", "warn")
-                continue
-
-            all_analyses.append({
-                "type": p["type"], "username": username,
-                "full_name": data.get("fullName", username),
-                "followers": followers, "posts_analyzed": posts_count,
-                "detected_niche": detected_niche, "analysis": analysis,
-                "collected_at": datetime.now().isoformat(),
-            })
-            log(f"✅ @{username} concluído!", "success")
-            time.sleep(1)
+                    data = scraped[i]
+                    entry = {
+                        "type": profiles[i]["type"], "username": username,
+                        "full_name": data.get("fullName", username),
+                        "followers": data.get("followersCount", 0),
+                        "posts_analyzed": len(data.get("posts", [])),
+                        "detected_niche": niches[i], "analysis": analysis,
+                        "stats": profile_analytics(data),
+                        "collected_at": datetime.now().isoformat(),
+                        "fingerprint": fingerprints.get(i),
+                    }
+                    if checkpoint:
+                        checkpoint.add("analysis", entry)
+                    results[i] = draft.add_analysis(entry)
+                    log(f"✅ @{username} concluído!", "success")
+                finish(i)
+
+            def carry_over(i):
+                """Reuse the previous analysis of an unchanged profile. Competitor
+                analyses are only reused if they were written for the same niche."""
+                prev = reusable.pop(i, None)
+                if not prev or (profiles[i]["type"] != "own" and prev["my_niche"] != my_niche):
+                    return False
+                try:
+                    analysis = report_store.read(prev["report_id"], f"analysis/{prev['username']}")["analysis"]
+                except Exception:
+                    return False
+                entry = {k: v for k, v in prev.items() if k not in ("report_id", "my_niche")}
+                entry.update(username=profiles[i]["username"], analysis=analysis,
+                             followers=scraped[i].get("followersCount", 0),
+                             carried_over=True, carried_from=prev["report_id"])
+                if checkpoint:
+                    checkpoint.add("analysis", entry)
+                results[i] = draft.add_analysis(entry)
+                carried.append(i)
+                log(f"♻️  @{profiles[i]['username']} sem novidades desde "
+                    f"{prev['collected_at'][:10]}: análise reaproveitada", "success")
+                finish(i)
+                return True
+
+            def start_analysis(i):
+                if not carry_over(i):
+                    submit_analysis(i)
+
+            def niche_known(i):
+                """Start the analysis of a profile whose niche is known, in niche order"""
+                nonlocal my_niche
+                if profiles[i]["type"] == "own":
+                    if not my_niche:
+                        my_niche = niches[i]
+                    start_analysis(i)
+                    if not my_niche_ready:
+                        release_niche()
+                elif my_niche_ready:
+                    start_analysis(i)
+                else:
+                    waiting_for_niche.append(i)
+
+            def release_niche():
+                nonlocal my_niche_ready
+                my_niche_ready = True
+                for j in waiting_for_niche:
+                    start_analysis(j)
+                waiting_for_niche.clear()
+
+            # Usernames are scraped in batches (one actor run per batch)
+            todo = [i for i in range(len(profiles)) if i not in results]
+            for i in todo:
+                label = "MEU PERFIL" if profiles[i]["type"] == "own" else "CONCORRENTE"
+                log(f"[{label}] Coletando @{profiles[i]['username']}...", "info")
+            for b in range(0, len(todo), batch_size):
+                submit_scrape(todo[b:b + batch_size])
+
+            while pending or deferred:
+                if not pending:
+                    for i, resubmit in deferred:
+                        log(f"🔁 Tentando novamente @{profiles[i]['username']} "
+                            f"(tentativa {retries[i] + 1})...", "info")
+                        resubmit()
+                    deferred.clear()
+                done, _ = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                job.check_cancelled()
+                for fut in done:
+                    stage, i = pending.pop(fut)
+                    result, error, elapsed, usage = fut.result()
+                    stages[stage] += elapsed
+
+                    if stage == "scrape":
+                        for j in i:
+                            p = profiles[j]
+                            username = p["username"]
+                            data = error or (result or {}).get(username)
+                            set_status(current_profile=username)
+                            if not data or isinstance(data, Exception):
+                                reason = str(data) if data else "perfil não encontrado ou privado"
+                                log(f"⚠️  @{username} — {reason}", "warn")
+                                if data and retry_later(j, data, lambda j=j: submit_scrape([j])):
+                                    continue
+                                finish(j)
+                                if p["type"] == "own" and not my_niche_ready:
+                                    release_niche()
+                                continue
+                            scraped[j] = data
+                            try:
+                                # Only what this run fetched: cached layers were
+                                # recorded by the run that fetched them
+                                fresh = set(data.get("fresh_posts") or ())
+                                if data.get("fetched_at") or fresh:
+                                    metrics.record(job.id, username, data if data.get("fetched_at") else None,
+                                                   [p for p in data.get("posts", []) if post_key(p) in fresh],
+                                                   ts=data.get("fetched_at"))
+                            except Exception as e:
+                                log(f"⚠️  Métricas de @{username} não registradas: {str(e)}", "dim")
+                            followers = data.get("followersCount", 0)
+                            posts_count = len(data.get("posts", []))
+                            log(f"✅ @{username} — {followers:,} seguidores · {posts_count} posts", "success")
+                            fingerprints[j] = fingerprint(username, data)
+                            prev = previous.get(username.lower())
+                            if prev and prev["fingerprint"] == fingerprints[j]:
+                                niches[j], reusable[j] = prev["detected_niche"], prev
+                                if not batch_mode:
+                                    niche_known(j)
+                                    continue
+                                if (p["type"] == "own" or my_niche) and carry_over(j):
+                                    if not my_niche:
+                                        my_niche = niches[j]
+                                    continue
+                            if batch_mode:
+                                continue  # model calls go out as Message Batches below
+                            log(f"🔍 Detectando nicho de @{username}...", "info")
+                            fut = submit("llm", detect_niche, data, anthropic_key)
+                            pending[fut] = ("niche", j)
+                        continue
+
+                    p = profiles[i]
+                    username = p["username"]
+                    set_status(current_profile=username)
+                    log_usage(f"@{username} — {'nicho' if stage == 'niche' else 'análise'}", usage)
+
+                    if stage == "niche":
+                        if error:
+                            niches[i] = config.get("niche", "criador de conteúdo")
+                        else:
+                            niches[i] = result
+                            log(f"🏷️  @{username} — Nicho: {result}", "info")
+                        niche_known(i)
+
+                    else:
+                        record(i, error or result)
+
+        finally:
+            # On cancellation, drop queued stages and don't wait for in-flight calls
+            if use_async:
+                group.cancel()
+            else:
+                for pool in pools.values():
+                    pool.shutdown(wait=not job.cancelled, cancel_futures=True)
+
+        batch_info = None
+        if batch_mode and scraped:
+            order = sorted(scraped)
+            batch_info = {"requests": 0, "cached": 0, "input_tokens": 0, "output_tokens": 0}
+
+            def run_batch(stage, calls):
+                def on_progress(batch):
+                    counts = batch.request_counts
+                    log(f"⏳ Lote {batch.id}: {counts.succeeded + counts.errored} de "
+                        f"{len(calls)} pedidos processados", "dim")
+                t0 = time.perf_counter()
+                with tracing.span("llm_batch", stage=stage) as sp:
+                    out, usage = ask_claude_batch(anthropic_key, calls, job.check_cancelled, on_progress)
+                    sp.add(requests=usage["batched"], input_tokens=usage["input_tokens"],
+                           output_tokens=usage["output_tokens"])
+                stages[stage] += time.perf_counter() - t0
+                batch_info["requests"] += usage["batched"]
+                batch_info["cached"] += usage["cached"]
+                batch_info["input_tokens"] += usage["input_tokens"]
+                batch_info["output_tokens"] += usage["output_tokens"]
+                return out
+
+            need_niche = [i for i in order if i not in reusable]
+            if need_niche:
+                log(f"📦 Modo lote: nicho de {len(need_niche)} perfis em um único lote...", "info")
+                out = run_batch("niche", {f"niche-{i}": (niche_prompt(scraped[i]), NICHE_MAX_TOKENS)
+                                          for i in need_niche})
+            for i in need_niche:
+                if isinstance(out[f"niche-{i}"], Exception):
+                    niches[i] = config.get("niche", "criador de conteúdo")
+                else:
+                    niches[i] = out[f"niche-{i}"].strip()
+                    log(f"🏷️  @{profiles[i]['username']} — Nicho: {niches[i]}", "info")
+            for i in order:
+                if profiles[i]["type"] == "own" and not my_niche:
+                    my_niche = niches[i]
+            # Unchanged competitors that were scraped before my_niche was known
+            for i in [i for i in order if i in reusable]:
+                carry_over(i)
+            order = sorted(scraped)
+
+        if batch_mode and scraped:
+            log(f"📦 Modo lote: {len(order)} análises em um único lote...", "info")
+            out = run_batch("analysis", {f"analysis-{i}": (
+                (own_profile_prompt(scraped[i], config, niches[i]), ANALYSIS_MAX_TOKENS)
+                if profiles[i]["type"] == "own"
+                else (competitor_facts_prompt(scraped[i], config, niches[i]), FACTS_MAX_TOKENS))
+                for i in order})
+            # Competitors: the niche-specific part goes out as a second batch, on top of the facts
+            facts = {i: out[f"analysis-{i}"] for i in order if profiles[i]["type"] != "own"
+                     and not isinstance(out[f"analysis-{i}"], Exception)}
+            if facts:
+                log(f"📦 Modo lote: leitura de {len(facts)} concorrentes para o nicho '{my_niche}'...", "info")
+                angles = run_batch("analysis", {f"angle-{i}": (
+                    competitor_prompt(text, scraped[i], config, my_niche, niches[i]), ANGLE_MAX_TOKENS)
+                    for i, text in facts.items()})
+                for i, text in facts.items():
+                    angle = angles[f"angle-{i}"]
+                    out[f"analysis-{i}"] = angle if isinstance(angle, Exception) else _join_analysis(text, angle)
+            for i in order:
+                record(i, out[f"analysis-{i}"])
+
+        # Keep the report in configured order (own profile first)
+        all_analyses = [results[i] for i in sorted(results)]
+        scrape_stats = {}
+        for st in batch_stats:
+            for k, v in st.items():
+                scrape_stats[k] = scrape_stats.get(k, 0) + v
+        if scrape_stats.get("profiles_cached") or scrape_stats.get("posts_cached") \
+                or scrape_stats.get("posts_incremental"):
+            log(f"🗄️  Cache de coleta: {scrape_stats['profiles_cached']} perfis e "
+                f"{scrape_stats['posts_cached']} listas de posts reaproveitados · "
+                f"{scrape_stats['posts_incremental']} atualizações incrementais · "
+                f"{scrape_stats['actor_runs']} execuções Apify", "info")
+        if scrape_stats.get("profiles_shared") or tokens["shared_calls"]:
+            log(f"🤝 De outras análises em andamento ou recentes: {scrape_stats.get('profiles_shared', 0)} "
+                f"perfis coletados e {tokens['shared_calls']} respostas de IA", "info")
+        carry_info = None
+        if previous:
+            # Each carried-over profile saves its niche and analysis calls: one
+            # analysis call for the own profile, facts + angle for a competitor
+            skipped = sum(2 if profiles[i]["type"] == "own" else 3 for i in carried)
+            carry_info = {"profiles": len(carried), "model_calls_skipped": skipped,
+                          "apify_runs_skipped": scrape_stats.get("actor_runs_skipped", 0),
+                          "posts_fetches_skipped": scrape_stats.get("posts_skipped", 0),
+                          "candidates": len(previous),
+                          "max_age_days": float(config.get("carry_over_max_days") or 0)}
+            log(f"♻️  {len(carried)} de {len(profiles)} perfis sem novidades: "
+                f"{carry_info['model_calls_skipped']} chamadas de IA e "
+                f"{carry_info['apify_runs_skipped']} execuções Apify evitadas", "info")
 
         if not all_analyses:
             raise Exception("Nenhum perfil analisado. Verifique os usernames e credenciais.")
 
-        log(f"💡 Gerando plano de conteúdo para '{my_niche}'...", "info")
-        try:
-            content_plan = generate_content_plan(all_analyses, config, anthropic_key, my_niche)
-            log("✅ Plano de conteúdo gerado!", "success")
-        except Exception as e:
-            content_plan = f"Erro: {str(e)}"
-            log(f"⚠️  {str(e)}", "warn")
-
-        log("📋 Gerando relatório executivo...", "info")
-        try:
-            exec_summary = generate_executive_summary(all_analyses, config, anthropic_key, my_niche)
-            log("✅ Relatório executivo gerado!", "success")
-        except Exception as e:
-            exec_summary = f"Erro: {str(e)}"
-            log(f"⚠️  {str(e)}", "warn")
-
-        date_str = datetime.now().strftime("%Y%m%d_%H%M")
+        analyzed = [a["username"] for a in all_analyses]
+        # The final prompts need the analysis texts: read back from the draft for these two stages
+        texts = [dict(a, analysis=draft.analysis(a["username"])) for a in all_analyses]
+
+        def final_stage(name, label, fn, start_msg):
+            """Content plan / executive summary: reused from the checkpoint when it
+            was built from these same analyses, otherwise generated and saved"""
+            job.check_cancelled()
+            entry = saved.get(name)
+            if entry and entry["profiles"] == analyzed:
+                log(f"💾 {label} retomado do checkpoint", "info")
+                return entry["text"]
+            log(start_msg, "info")
+            try:
+                text, error, stages[name], usage = _timed(
+                    fn, texts, config, anthropic_key, my_niche, _stream_to(run_events, name))
+                if error:
+                    raise error
+                log_usage(label, usage)
+                log(f"✅ {label} gerado!", "success")
+            except Exception as e:
+                log(f"⚠️  {str(e)}", "warn")
+                return f"Erro: {str(e)}"
+            if checkpoint:
+                checkpoint.add(name, {"profiles": analyzed, "text": text})
+            return text
+
+        content_plan = final_stage("content_plan", "Plano de conteúdo", generate_content_plan,
+                                   f"💡 Gerando plano de conteúdo para '{my_niche}'...")
+        exec_summary = final_stage("executive_summary", "Relatório executivo",
+                                   generate_executive_summary, "📋 Gerando relatório executivo...")
+        del texts
+
+        wall_clock = time.perf_counter() - started
+        stage_sum = sum(stages.values())
+        timing = {
+            "wall_clock_s": round(wall_clock, 2), "stage_sum_s": round(stage_sum, 2),
+            "stages_s": {k: round(v, 2) for k, v in stages.items()},
+            "engine": "async" if use_async else "threads",
+            "scrape_concurrency": scrape_workers, "llm_concurrency": llm_workers,
+            "scrape_cache": scrape_stats, "tokens": tokens, "profile_retries": sum(retries.values()),
+            "resumed_profiles": resumed, "carry_over": carry_info, "memory": memory.stop(),
+            "profiles_per_min": round(len(all_analyses) / wall_clock * 60, 2) if wall_clock else None,
+            # Every traced call of this run, by span and labels (report_save comes after)
+            "trace": trace.snapshot(),
+        }
+        spent = trace.totals_by_span()
+        if spent:
+            log("⏱️  " + " · ".join(f"{name} {t['total_s']:.1f}s em {t['count']} chamadas"
+                                   for name, t in sorted(spent.items())), "dim")
+        cost = token_cost(tokens["input"], tokens["output"])
+        if batch_info:
+            batch_cost = token_cost(batch_info["input_tokens"], batch_info["output_tokens"], batch=True)
+            full_cost = token_cost(batch_info["input_tokens"], batch_info["output_tokens"])
+            batch_info.update(cost_usd=round(batch_cost, 4), sequential_cost_usd=round(full_cost, 4))
+            timing["batch"] = batch_info
+            cost += batch_cost
+            log(f"💰 Lotes: US$ {batch_cost:.2f} (sequencial seria US$ {full_cost:.2f})", "info")
+        timing["cost_usd"] = round(cost, 4)
+
+        # The job id makes it unique: jobs of any worker process can finish in
+        # the same minute, and checking for an existing report would race
+        date_str = f"{datetime.now().strftime('%Y%m%d_%H%M')}_{job.id[:6]}"
         report = {
             "id": date_str,
             "run_date": datetime.now().isoformat(),
@@ -360,23 +1426,67 @@ def run_analysis_thread(config):
             "analyses": all_analyses,
             "content_plan": content_plan,
             "executive_summary": exec_summary,
+            "timing": timing,
         }
-        (REPORTS_DIR / f"{date_str}.json").write_text(
-            json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
-
-        run_status.update({"progress": run_status["total"], "last_run": date_str})
+        save_report(report, draft)
+        if checkpoint:
+            checkpoint.remove()
+
+        set_status(progress=run_status["total"], last_run=date_str)
+        log(f"⏱️  Tempo total {wall_clock:.1f}s · soma das etapas {stage_sum:.1f}s · "
+            f"{tokens['input']:,} tokens de entrada em {tokens['calls']} chamadas", "info")
+        log(f"🧠 Memória do processo: pico de {timing['memory']['peak_mb']:.0f} MB "
+            f"(início {timing['memory']['start_mb']:.0f} MB)", "dim")
         log(f"🎉 Concluído! {len(all_analyses)} perfis analisados.", "success")
         log("📊 Acesse a aba Relatórios para ver os resultados.", "success")
 
+    except JobCancelled as e:
+        run_status["error"] = str(e)
+        log("⏹️  Análise cancelada.", "warn")
     except Exception as e:
         run_status["error"] = str(e)
         log(f"❌ Erro: {str(e)}", "error")
     finally:
-        run_status.update({"running": False, "finished": True})
+        tracing.end_run(trace_token)
+        if memory:
+            memory.stop()
+        if draft:
+            draft.discard()  # no-op once committed
+        set_status(running=False, finished=True)
+
+CHECKPOINT_DIR = DATA_DIR / "checkpoints"
+
+def job_checkpoint(job):
+    # A resumed job keeps writing to the checkpoint of the run it resumes
+    return Checkpoint(CHECKPOINT_DIR / f"{job.options.get('checkpoint', job.id)}.jsonl")
+
+def run_job(job):
+    """JobQueue runner: saved config + per-job overrides (secrets are never stored in the queue).
+    Jobs re-queued after a restart pick up their own checkpoint automatically."""
+    config = load_config()
+    config.update(job.options.get("overrides", {}))
+    run_analysis_thread(config, job.options.get("force_refresh", False), job, job_checkpoint(job))
+
+jobs = JobQueue(DATA_DIR / "jobs.sqlite", run_job,
+                max_concurrent=int(os.getenv("MAX_CONCURRENT_JOBS", 2)),
+                stale_after=float(os.getenv("JOB_STALE_SECONDS", 60)))
+
+_index_html = None
 
 @app.route("/")
 def index():
-    return render_template("index.html", config=load_config(), reports=get_reports_list())
+    # The page is static (its JS fetches /api/config and /api/reports), so it is
+    # rendered once per process instead of on every request and healthcheck
+    global _index_html
+    if _index_html is None:
+        _index_html = render_template("index.html")
+    return _index_html
+
+@app.route("/healthz")
+def healthz():
+    """Liveness for the platform healthcheck: in-memory only, no disk I/O"""
+    return jsonify({"ok": True, "uptime_s": round(time.time() - STARTED_AT, 1),
+                    "active_jobs": len(jobs.active())})
 
 @app.route("/api/test-anthropic")
 def test_anthropic():
@@ -384,9 +1494,8 @@ def test_anthropic():
     if not key:
         return jsonify({"ok": False, "error": "ANTHROPIC_API_KEY not set"})
     try:
-        import anthropic as ant
-        ai = ant.Anthropic(api_key=key)
-        msg = ai.messages.create(model="claude-opus-4-6", max_tokens=10,
+        ai = anthropic_clients.get(key)
+        msg = ai.messages.create(model=MODEL, max_tokens=10,
                                   messages=[{"role": "user", "content": "Say OK"}])
         return jsonify({"ok": True, "response": msg.content[0].text})
     except Exception as e:
@@ -398,8 +1507,7 @@ def test_apify():
     if not token:
         return jsonify({"ok": False, "error": "APIFY_TOKEN not set"})
     try:
-        from apify_client import ApifyClient
-        client = ApifyClient(token)
+        client = apify_clients.get(token)
         me = client.user("me").get()
         return jsonify({"ok": True, "username": me.get("username"), "plan": me.get("plan", {}).get("id")})
     except Exception as e:
@@ -412,12 +1520,12 @@ def debug_scrape(username):
     if not token:
         return jsonify({"ok": False, "error": "No Apify token"})
     try:
-        client = ApifyClient(token)
+        client = apify_clients.get(token)
         # Quick profile scrape
         run = client.actor("apify/instagram-profile-scraper").call(run_input={
             "usernames": [username.lstrip("@")]
         })
-        items = list(client.dataset(run["defaultDatasetId"]).iterate_items())
+        items = list(client.dataset(_dataset_id(run)).iterate_items())
         if not items:
             return jsonify({"ok": False, "error": "No data returned"})
         profile = items[0]
@@ -451,193 +1559,344 @@ def api_get_config():
 
 @app.route("/api/config", methods=["POST"])
 def api_save_config():
-    config = load_config()
-    config.update(request.json)
-    save_config(config)
+    with config_lock():
+        config = load_config()
+        config.update(request.json)
+        save_config(config)
+    # Drop pooled clients built for keys that are no longer configured
+    for registry in (anthropic_clients, async_anthropic_clients):
+        registry.retain(config.get("anthropic_key"), os.getenv("ANTHROPIC_API_KEY", ""))
+    for registry in (apify_clients, async_apify_clients):
+        registry.retain(config.get("apify_token"), os.getenv("APIFY_TOKEN", ""))
     return jsonify({"ok": True})
 
+@app.route("/metrics")
+def prometheus_metrics():
+    """Span latency histograms and call counters, in Prometheus text format"""
+    lines = [tracing.registry.prometheus().rstrip("\n")]
+    for api, gov in (("anthropic", anthropic_governor), ("apify", apify_governor)):
+        st = gov.stats()
+        for field in ("calls", "retries", "rate_limited", "failed"):
+            lines.append(f'radar_governor_{field}_total{{api="{api}"}} {st[field]}')
+        for field in ("in_flight", "limit"):
+            lines.append(f'radar_governor_{field}{{api="{api}"}} {st[field]}')
+    st = shared_artifacts.stats()
+    for field in ("computed", "joined", "reused", "failed", "abandoned"):
+        lines.append(f'radar_shared_artifacts_total{{result="{field}"}} {st[field]}')
+    lines.append(f"radar_shared_artifacts_in_flight {st['in_flight']}")
+    lines.append(f"radar_shared_artifacts_entries {st['entries']}")
+    lines.append(f"radar_active_jobs {len(jobs.active())}")
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+@app.route("/api/clients")
+def api_clients():
+    return jsonify({"anthropic": dict(anthropic_clients.stats(), governor=anthropic_governor.stats(),
+                                      async_clients=async_anthropic_clients.stats()),
+                    "apify": dict(apify_clients.stats(), governor=apify_governor.stats(),
+                                  async_clients=async_apify_clients.stats())})
+
+RUN_OVERRIDES = ("my_profile", "niche", "location", "competitors", "batch_mode", "engine")
+
 @app.route("/api/run", methods=["POST"])
 def api_run():
-    if run_status["running"]:
-        return jsonify({"ok": False, "error": "Análise já em andamento"})
+    """Queue an analysis. Body (optional): force_refresh, and my_profile/niche/
+    location/competitors to run a different set of profiles than the saved config."""
+    body = request.get_json(silent=True) or {}
+    overrides = {k: body[k] for k in RUN_OVERRIDES if k in body}
     config = load_config()
+    config.update(overrides)
     if not config.get("my_profile"):
         return jsonify({"ok": False, "error": "Configure seu perfil primeiro"})
-    threading.Thread(target=run_analysis_thread, args=(config,), daemon=True).start()
-    return jsonify({"ok": True})
+    job = jobs.submit({"overrides": overrides, "force_refresh": bool(body.get("force_refresh"))})
+    return jsonify({"ok": True, "job_id": job.id})
+
+@app.route("/api/run/<job_id>/resume", methods=["POST"])
+def api_run_resume(job_id):
+    """Re-run a failed or cancelled job, skipping the profiles (and final stages)
+    its checkpoint already holds"""
+    old = jobs.get(job_id)
+    if old is None:
+        return jsonify({"ok": False, "error": "Execução não encontrada"}), 404
+    if old.state not in ("error", "cancelled"):
+        return jsonify({"ok": False, "error": f"Execução está '{old.state}', não há o que retomar"}), 409
+    options = {k: v for k, v in old.options.items() if k != "recovered"}
+    options.update(checkpoint=old.options.get("checkpoint", old.id), resumed_from=old.id)
+    saved = job_checkpoint(old).load()
+    job = jobs.submit(options)
+    return jsonify({"ok": True, "job_id": job.id, "checkpointed_profiles": len(saved["analyses"])})
+
+def _job_or_latest():
+    job_id = request.args.get("job")
+    return jobs.get(job_id) if job_id else jobs.latest()
+
+def _status_payload(job, since=None):
+    if job is None:
+        return {"job_id": None, "state": None, "running": False, "logs": [], "progress": 0,
+                "total": 0, "current_profile": "", "finished": False, "last_run": None, "error": None}
+    status = job.summary()
+    if since is None:
+        status["logs"] = job.status["logs"]
+    else:
+        # Incremental polling: only the log lines the client hasn't seen yet
+        status.update({"logs": job.status["logs"][since:], "log_offset": since})
+    return status
 
 @app.route("/api/status")
 def api_status():
-    return jsonify(run_status)
+    """Status of ?job=<id>, or of the most recent job"""
+    return jsonify(_status_payload(_job_or_latest(), request.args.get("since", type=int)))
+
+@app.route("/api/jobs")
+def api_jobs():
+    return jsonify({"max_concurrent": jobs.max_concurrent,
+                    "jobs": jobs.list(request.args.get("limit", 50, type=int))})
+
+@app.route("/api/jobs/<job_id>")
+def api_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Não encontrado"}), 404
+    status = job.summary()
+    status["log_count"] = len(job.status["logs"])
+    return jsonify(status)
+
+@app.route("/api/jobs/<job_id>/logs")
+def api_job_logs(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Não encontrado"}), 404
+    since = request.args.get("since", 0, type=int)
+    return jsonify({"job_id": job.id, "log_offset": since, "logs": job.status["logs"][since:]})
+
+@app.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+def api_job_cancel(job_id):
+    if not jobs.cancel(job_id):
+        return jsonify({"ok": False, "error": "Job não encontrado ou já finalizado"}), 404
+    return jsonify({"ok": True})
+
+STREAM_MAX_S = float(os.getenv("STREAM_MAX_SECONDS", 30))
+
+@app.route("/api/stream")
+def api_stream():
+    """Server-Sent Events: log, status and streamed model text (delta) of ?job=<id>
+    (default: the most recent job)"""
+    job = _job_or_latest()
+    last_id = request.headers.get("Last-Event-ID", type=int) or \
+        request.args.get("last_event_id", 0, type=int)
+
+    def generate():
+        nonlocal last_id
+        yield "retry: 3000\n\n"
+        # A stream holds a server thread: it is closed after STREAM_MAX_S and
+        # the browser reconnects with Last-Event-ID, resuming where it stopped
+        deadline = time.monotonic() + STREAM_MAX_S
+        while job is not None:
+            # Only the state is re-read (the job may be running, or finish, in
+            # another worker); events come incrementally through job.events
+            active = jobs.state(job.id) in ("queued", "running")
+            left = deadline - time.monotonic()
+            if active and left <= 0:
+                return
+            events = job.events.since(last_id, timeout=min(15, left) if active else 0)
+            for event_id, kind, data in events:
+                last_id = event_id
+                yield f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+            if not events:
+                if not active:
+                    break
+                yield ": keep-alive\n\n"
+        yield "event: idle\ndata: {}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/api/llm-cache")
+def api_llm_cache():
+    return jsonify(llm_cache.stats())
+
+@app.route("/api/llm-cache", methods=["DELETE"])
+def api_llm_cache_clear():
+    llm_cache.clear()
+    return jsonify({"ok": True})
 
 @app.route("/api/reports")
 def api_reports():
-    return jsonify(get_reports_list())
+    """Report headers from the index. Optional filters: profile, niche,
+    date_from/date_to (YYYY-MM-DD); pagination: page (1-based), per_page."""
+    args = request.args
+    etag = f'"{report_index.version}-{zlib.crc32(request.query_string):x}"'
+    if request.if_none_match.contains(etag.strip('"')):
+        return Response(status=304, headers={"ETag": etag})
+    filters = {k: args.get(k) for k in ("profile", "niche", "date_from", "date_to") if args.get(k)}
+    page = args.get("page", type=int)
+    if page:
+        per_page = max(1, min(args.get("per_page", 20, type=int), 200))
+        filters.update(limit=per_page, offset=(max(page, 1) - 1) * per_page)
+    reports, total = report_index.query(**filters)
+    resp = jsonify(reports)
+    resp.headers["ETag"] = etag
+    resp.headers["X-Total-Count"] = str(total)
+    return resp
+
+@app.route("/api/analytics/<username>")
+def api_analytics(username):
+    """Engagement stats for a profile from the scrape cache (no scraping, no model call)"""
+    entry = scrape_cache.get(username.lstrip("@"))
+    if not entry or not entry.get("profile"):
+        return jsonify({"error": "Perfil não está no cache de coleta; rode uma análise primeiro"}), 404
+    tz = request.args.get("tz", ANALYTICS_UTC_OFFSET, type=float)
+    return jsonify(analytics.profile_stats(entry["profile"], entry.get("posts") or [], tz_offset_hours=tz))
+
+@app.route("/api/metrics/trends")
+def api_metrics_trends():
+    """Growth, engagement-rate trend and top movers over the last ?runs=N runs
+    (default 10), optionally for ?profile=a,b only"""
+    profiles = [p.strip().lstrip("@") for p in request.args.get("profile", "").split(",") if p.strip()]
+    runs = max(2, min(request.args.get("runs", 10, type=int), 1000))
+    top = max(1, min(request.args.get("top", 5, type=int), 50))
+    return jsonify(metrics.trends(profiles or None, runs, top))
+
+def gzip_json(raw):
+    """Response for gzip-compressed JSON bytes: sent as-is to clients that
+    accept gzip, decompressed for the others"""
+    if request.accept_encodings["gzip"]:
+        resp = Response(raw, mimetype="application/json")
+        resp.headers["Content-Encoding"] = "gzip"
+    else:
+        resp = Response(gzip.decompress(raw), mimetype="application/json")
+    resp.headers["Vary"] = "Accept-Encoding"
+    return resp
 
 @app.route("/api/report/<report_id>")
 def api_report(report_id):
-    path = REPORTS_DIR / f"{report_id}.json"
-    if not path.exists():
+    """The whole report; the UI loads /header and the sections below instead"""
+    try:
+        return gzip_json(encode_json(load_report(report_id)))
+    except FileNotFoundError:
+        return jsonify({"error": "Não encontrado"}), 404
+
+@app.route("/api/report/<report_id>/<any(header, content_plan, executive_summary):section>")
+def api_report_section(report_id, section):
+    try:
+        return gzip_json(report_store.raw(report_id, section))
+    except FileNotFoundError:
         return jsonify({"error": "Não encontrado"}), 404
-    return jsonify(json.loads(path.read_text(encoding="utf-8")))
 
+@app.route("/api/report/<report_id>/analysis/<username>")
+def api_report_analysis(report_id, username):
+    return api_report_section(report_id, f"analysis/{username.lstrip('@')}")
+
+
+# Bump when pdf_report's layout changes, so cached PDFs are re-rendered
+PDF_TEMPLATE_VERSION = 2
+PDF_PRERENDER = os.getenv("PDF_PRERENDER", "1") != "0"
+# PDF sections are laid out in this many worker processes (1 = in the calling thread)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", min(4, os.cpu_count() or 1)))
+pdf_executor = ThreadPoolExecutor(1, thread_name_prefix="pdf")
+_pdf_locks = {}
+_pdf_locks_guard = threading.Lock()
+_pdf_pool = None
+
+def render_pdf(r, out):
+    """Lay out a report into out, its sections spread over the PDF worker
+    processes. They are forked, not spawned: a spawned worker would import the
+    app (and start a job dispatcher) before rendering anything."""
+    global _pdf_pool
+    if PDF_WORKERS <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return pdf_report.render(r, out)
+    with _pdf_locks_guard:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(PDF_WORKERS, mp_context=multiprocessing.get_context("fork"))
+        pool = _pdf_pool
+    try:
+        return pdf_report.render(r, out, map=pool.map)
+    except BrokenProcessPool:
+        # A worker died (out of memory?): a new pool next time, this one here
+        with _pdf_locks_guard:
+            if _pdf_pool is pool:
+                _pdf_pool = None
+        out.seek(0)
+        out.truncate()
+        return pdf_report.render(r, out)
+
+def pdf_path(report_id):
+    return REPORTS_DIR / f"{report_id}.v{PDF_TEMPLATE_VERSION}.pdf"
+
+def ensure_pdf(report_id):
+    """Return the cached PDF of a report, rendering it first if it is missing or
+    older than the report JSON. Concurrent callers for the same report wait
+    for a single render."""
+    saved_at = report_store.mtime(report_id)
+    path = pdf_path(report_id)
+    with _pdf_locks_guard:
+        lock = _pdf_locks.setdefault(report_id, threading.Lock())
+    with lock:
+        if path.exists() and path.stat().st_mtime >= saved_at:
+            tracing.label(cached=1)
+            return path
+        with tracing.span("pdf_render") as sp:
+            r = load_report(report_id)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "wb") as out:
+                pages = render_pdf(r, out)
+            sp.add(bytes=tmp.stat().st_size, pages=pages)
+        os.replace(tmp, path)
+        for old in REPORTS_DIR.glob(f"{report_id}.v*.pdf"):
+            if old != path:
+                old.unlink(missing_ok=True)
+    return path
+
+def prerender_pdf(report_id):
+    if PDF_PRERENDER:
+        pdf_executor.submit(ensure_pdf, report_id)
 
 @app.route("/api/report/<report_id>/pdf")
 def export_pdf(report_id):
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import cm
-    from reportlab.lib import colors
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, HRFlowable, PageBreak, Table, TableStyle
-    from reportlab.lib.enums import TA_CENTER
     from flask import send_file
-    from io import BytesIO
 
-    path = REPORTS_DIR / f"{report_id}.json"
-    if not path.exists():
+    try:
+        with tracing.span("pdf_export"):
+            path = ensure_pdf(report_id)
+        cfg_profile = report_index.query_one(report_id).get("my_profile", "")
+    except FileNotFoundError:
         return jsonify({"error": "Nao encontrado"}), 404
 
-    r = json.loads(path.read_text(encoding="utf-8"))
-    buf = BytesIO()
-    doc = SimpleDocTemplate(
-        buf, pagesize=A4,
-        leftMargin=2*cm, rightMargin=2*cm,
-        topMargin=2*cm, bottomMargin=2*cm,
-    )
-
-    AMBER = colors.HexColor("#e8a020")
-    GREEN = colors.HexColor("#22c97a")
-    DARK  = colors.HexColor("#0f1822")
-    MID   = colors.HexColor("#7aaa94")
-    LIGHT = colors.HexColor("#d8ede6")
-    DARK2 = colors.HexColor("#162420")
-
-    s_title = ParagraphStyle("title", fontName="Helvetica-Bold", fontSize=32,
-        textColor=AMBER, spaceAfter=8, alignment=TA_CENTER, leading=36)
-    s_sub = ParagraphStyle("sub", fontName="Helvetica", fontSize=13,
-        textColor=MID, spaceAfter=6, alignment=TA_CENTER)
-    s_section = ParagraphStyle("section", fontName="Helvetica-Bold", fontSize=15,
-        textColor=AMBER, spaceBefore=18, spaceAfter=8, leading=18)
-    s_tag = ParagraphStyle("tag", fontName="Helvetica-Bold", fontSize=11,
-        textColor=GREEN, spaceBefore=14, spaceAfter=6)
-    s_body = ParagraphStyle("body", fontName="Helvetica", fontSize=9.5,
-        textColor=LIGHT, spaceAfter=4, leading=14)
-
-    def hr():
-        return HRFlowable(width="100%", thickness=0.5,
-            color=colors.HexColor("#1e3028"), spaceAfter=10, spaceBefore=6)
-
-    def safe(text):
-        return (text or "").replace("&","&amp;").replace("<","&lt;").replace(">","&gt;")
-
-    def text_blocks(text, style):
-        blocks = []
-        for line in (text or "").splitlines():
-            line = line.strip()
-            if line:
-                blocks.append(Paragraph(safe(line), style))
-        return blocks
-
-    def section_header(title):
-        return [Paragraph(title, s_section), hr()]
-
-    def profile_block(a):
-        badge = "MEU PERFIL" if a["type"] == "own" else "CONCORRENTE"
-        nicho = a.get("detected_niche", "")
-        followers = str(a.get("followers", 0))
-        tag = f"[{badge}] @{a['username']}  -  {followers} seguidores  -  {nicho}"
-        items = [Paragraph(safe(tag), s_tag)]
-        items += text_blocks(a.get("analysis", ""), s_body)
-        items.append(Spacer(1, 8))
-        return items
-
-    story = []
-
-    # Cover
-    story.append(Spacer(1, 3*cm))
-    story.append(Paragraph("IG INTELLIGENCE", s_title))
-    story.append(Paragraph("Relatorio de Inteligencia Competitiva", s_sub))
-    story.append(Spacer(1, 0.5*cm))
-    story.append(Paragraph(f"Gerado em {r.get('run_date_br','')}", s_sub))
-    cfg_profile = r.get("config", {}).get("my_profile", "")
-    story.append(Paragraph(f"Perfil: @{cfg_profile}   -   Nicho: {r.get('my_niche','')}", s_sub))
-    story.append(Spacer(1, 1*cm))
-
-    # Summary table
-    analyses = r.get("analyses", [])
-    own  = next((a for a in analyses if a["type"] == "own"), None)
-    comps = [a for a in analyses if a["type"] == "competitor"]
-
-    tdata = [["Perfil", "Tipo", "Seguidores", "Nicho"]]
-    for a in analyses:
-        tdata.append([
-            f"@{a['username']}",
-            "Meu Perfil" if a["type"] == "own" else "Concorrente",
-            str(a.get("followers", 0)),
-            (a.get("detected_niche") or "")[:40],
-        ])
-
-    t = Table(tdata, colWidths=[4*cm, 3*cm, 3*cm, 7*cm])
-    t.setStyle(TableStyle([
-        ("BACKGROUND",  (0,0), (-1,0),  AMBER),
-        ("TEXTCOLOR",   (0,0), (-1,0),  colors.black),
-        ("FONTNAME",    (0,0), (-1,0),  "Helvetica-Bold"),
-        ("FONTSIZE",    (0,0), (-1,-1), 9),
-        ("BACKGROUND",  (0,1), (-1,-1), DARK),
-        ("TEXTCOLOR",   (0,1), (-1,-1), LIGHT),
-        ("ROWBACKGROUNDS", (0,1), (-1,-1), [DARK, DARK2]),
-        ("GRID",        (0,0), (-1,-1), 0.4, colors.HexColor("#1e3028")),
-        ("TOPPADDING",  (0,0), (-1,-1), 5),
-        ("BOTTOMPADDING",(0,0),(-1,-1), 5),
-        ("LEFTPADDING", (0,0), (-1,-1), 6),
-    ]))
-    story.append(t)
-    story.append(PageBreak())
-
-    # Executive summary
-    story += section_header("RELATORIO EXECUTIVO")
-    story += text_blocks(r.get("executive_summary", ""), s_body)
-    story.append(PageBreak())
-
-    # My profile
-    if own:
-        story += section_header("ANALISE DO MEU PERFIL")
-        story += profile_block(own)
-        story.append(PageBreak())
-
-    # Competitors
-    if comps:
-        story += section_header("ANALISE DOS CONCORRENTES")
-        for a in comps:
-            story += profile_block(a)
-            story.append(hr())
-        story.append(PageBreak())
-
-    # Content plan
-    story += section_header("PLANO DE CONTEUDO - 4 SEMANAS")
-    story += text_blocks(r.get("content_plan", ""), s_body)
-
-    doc.build(story)
-    buf.seek(0)
-
     filename = f"IG_Intelligence_{cfg_profile}_{report_id}.pdf"
-    return send_file(buf, mimetype="application/pdf",
-                     as_attachment=True, download_name=filename)
-
-def get_reports_list():
-    reports = []
-    for f in sorted(REPORTS_DIR.glob("*.json"), reverse=True):
-        try:
-            d = json.loads(f.read_text(encoding="utf-8"))
-            reports.append({
-                "id": d["id"], "run_date_br": d.get("run_date_br", d["id"]),
-                "profiles_analyzed": d.get("profiles_analyzed", 0),
-                "my_niche": d.get("my_niche", ""),
-                "my_profile": d.get("config", {}).get("my_profile", ""),
-                "competitors": d.get("config", {}).get("competitors", []),
-            })
-        except: pass
-    return reports
+    return send_file(path.resolve(), mimetype="application/pdf", as_attachment=True,
+                     download_name=filename, conditional=True)
+
+def load_report(report_id):
+    return report_store.load(report_id)
+
+def save_report(report, draft=None):
+    """Write the report atomically (publishing the run's draft, if any), then
+    publish it in the report index"""
+    with tracing.span("report_save") as sp:
+        sp.add(bytes=draft.commit(report) if draft else report_store.save(report))
+        report_index.add(report)
+    prerender_pdf(report["id"])
+
+def get_reports_list(**filters):
+    return report_index.query(**filters)[0]
+
+report_store = ReportStore(REPORTS_DIR)
+report_store.remove_drafts(keep=jobs.running_ids())
+report_index = ReportIndex(REPORTS_DIR / "index.sqlite")
+report_index.sync(load_report, report_store.ids())
+
+@app.cli.command("migrate-reports")
+def migrate_reports():
+    """Convert reports saved as one <id>.json file to the split, compressed format"""
+    total_before = total_after = 0
+    for report_id in report_store.legacy_ids():
+        before, after = report_store.migrate(report_id)
+        total_before, total_after = total_before + before, total_after + after
+        print(f"✅ {report_id}: {before:,} → {after:,} bytes")
+    if total_before:
+        print(f"📦 {total_before:,} → {total_after:,} bytes ({total_after / total_before:.0%})")
+    else:
+        print("Nenhum relatório no formato antigo.")
+jobs.start()
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=int(os.getenv("PORT", 5000)), debug=False)
\ No newline at end of file
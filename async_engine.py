@@ -0,0 +1,80 @@
+"""
+Process-wide asyncio event loop on one background thread, for multiplexing
+many I/O-bound tasks (actor runs, model calls) without a thread per task.
+
+Synchronous code submits coroutines and gets concurrent.futures.Future back,
+so the analysis coordinator keeps waiting on them with concurrent.futures.wait
+exactly as it does on thread-pool futures.
+"""
+
+import asyncio
+import contextvars
+import threading
+
+
+class AsyncEngine:
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        """The engine's loop, started on first use"""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="async-engine", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        return self.submit(coro).result(timeout)
+
+    def group(self, limits):
+        return TaskGroup(self, limits)
+
+
+class TaskGroup:
+    """The tasks of one run: at most limits[kind] of each kind running at once,
+    and all of them cancelled together by cancel(). Tasks see the context
+    variables of the thread that submitted them, as thread-pool tasks do when
+    run with copy_context()."""
+
+    def __init__(self, engine, limits):
+        self.engine = engine
+        self.limits = limits
+        self._semaphores = {}
+        self._futures = set()
+        self._lock = threading.Lock()
+
+    async def _run(self, kind, fn, args, kwargs, context):
+        # The task runs in its own copy of the loop's context
+        for var, value in context.items():
+            var.set(value)
+        # Only ever touched from the loop thread, so no lock needed here
+        sem = self._semaphores.get(kind)
+        if sem is None:
+            sem = self._semaphores[kind] = asyncio.Semaphore(self.limits.get(kind, 1))
+        async with sem:
+            return await fn(*args, **kwargs)
+
+    def submit(self, kind, fn, *args, **kwargs):
+        fut = self.engine.submit(self._run(kind, fn, args, kwargs, contextvars.copy_context()))
+        with self._lock:
+            self._futures.add(fut)
+        fut.add_done_callback(self._discard)
+        return fut
+
+    def _discard(self, fut):
+        with self._lock:
+            self._futures.discard(fut)
+
+    def cancel(self):
+        with self._lock:
+            futures = list(self._futures)
+        for fut in futures:
+            fut.cancel()
+        return len(futures)
@@ -0,0 +1,85 @@
+"""
+Benchmark: full analysis runs on the thread-pool engine vs the async engine,
+against the fake Apify/Anthropic clients, for growing competitor lists. Both
+engines get the same concurrency (one actor run per profile, every profile's
+model calls in flight at once), so the difference is what that concurrency
+costs: peak thread count and peak Python memory.
+
+    python bench/bench_async_engine.py [sizes, comma-separated] [call_latency_s]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from functools import partial
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+os.chdir(tempfile.mkdtemp(prefix="bench_"))
+
+import app  # noqa: E402
+from fakes import FakeAnthropic, FakeAnthropicAsync, FakeApifyClient, FakeApifyClientAsync  # noqa: E402
+from governor import CallGovernor  # noqa: E402
+from jobs import Job  # noqa: E402
+
+
+def run(engine, n, config):
+    app.llm_cache.clear()
+    FakeAnthropic.reset()
+    FakeApifyClient.reset()
+    # No API budgets in the way: the engines are the only concurrency limit
+    app.anthropic_governor = CallGovernor("anthropic", max_concurrency=n + 1)
+    app.apify_governor = CallGovernor("apify", max_concurrency=n + 1)
+    config = dict(config, engine=engine, competitors=[f"concorrente{i:03d}" for i in range(n)])
+
+    peak_threads = threading.active_count()
+    done = threading.Event()
+
+    def sample():
+        nonlocal peak_threads
+        while not done.wait(0.01):
+            peak_threads = max(peak_threads, threading.active_count())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    tracemalloc.start()
+    job = Job(f"{engine}-{n}")
+    start = time.perf_counter()
+    app.run_analysis_thread(config, force_refresh=True, job=job)
+    elapsed = time.perf_counter() - start
+    _, peak_mem = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    done.set()
+    sampler.join()
+    if job.status["error"]:
+        raise SystemExit(f"{engine}: {job.status['error']}")
+    # The sampler itself is one of the counted threads
+    print(f"{n:>5}  {engine:<8} {elapsed:7.2f}s   threads {peak_threads - 1:>4}   "
+          f"memória {peak_mem / 1024 / 1024:7.1f} MB")
+
+
+def main():
+    sizes = [int(s) for s in (sys.argv[1] if len(sys.argv) > 1 else "5,50,200").split(",")]
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+    app.apify_clients.factory = partial(FakeApifyClient, cold_start=latency, per_item=0)
+    app.anthropic_clients.factory = partial(FakeAnthropic, latency=latency)
+    app.async_apify_clients.factory = partial(FakeApifyClientAsync, cold_start=latency, per_item=0)
+    app.async_anthropic_clients.factory = partial(FakeAnthropicAsync, latency=latency)
+    app.PDF_PRERENDER = False
+    app.STREAM_FLUSH_S = 1
+    base = dict(app.load_config(), my_profile="meuperfil", niche="", batch_mode=False,
+                apify_token="fake-token", anthropic_key="fake-key", scrape_batch_size=1)
+
+    print(f"{latency}s por chamada, uma coleta por perfil")
+    for n in sizes:
+        workers = n + 1
+        run("threads", n, dict(base, scrape_concurrency=workers, llm_concurrency=workers))
+        run("async", n, dict(base, async_concurrency=workers))
+
+
+if __name__ == "__main__":
+    main()
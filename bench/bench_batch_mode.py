@@ -0,0 +1,71 @@
+"""
+Benchmark: a full analysis run with live model calls vs Message Batches mode,
+against FakeAnthropic / FakeApifyClient. Reports wall clock, throughput and
+the estimated token cost of each path.
+
+    python bench/bench_batch_mode.py [n_competitors] [call_latency_s] [batch_latency_s]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+os.chdir(tempfile.mkdtemp(prefix="bench_"))
+
+import app  # noqa: E402
+from fakes import FakeAnthropic, FakeApifyClient  # noqa: E402
+from governor import CallGovernor  # noqa: E402
+from jobs import Job  # noqa: E402
+from shared_results import SharedResults  # noqa: E402
+
+
+def run(label, config):
+    app.llm_cache.clear()
+    app.anthropic_clients.retain()
+    FakeAnthropic.reset()
+    app.shared_artifacts = SharedResults()  # no niches or facts left over from the other run
+    job = Job(label)
+    start = time.perf_counter()
+    app.run_analysis_thread(config, force_refresh=False, job=job)
+    elapsed = time.perf_counter() - start
+    if job.status["error"]:
+        raise SystemExit(f"{label}: {job.status['error']}")
+    timing = app.load_report(job.status["last_run"])["timing"]
+    cost = timing["cost_usd"]
+    print(f"{label:<12} {elapsed:6.2f}s   {timing['profiles_per_min']:7.1f} perfis/min   "
+          f"US$ {cost:.4f}   chamadas: {len(FakeAnthropic.calls)}")
+    return elapsed, cost
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+    batch_latency = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
+    app.apify_clients.factory = partial(FakeApifyClient, cold_start=0.1)
+    app.anthropic_clients.factory = partial(FakeAnthropic, latency=latency, batch_latency=batch_latency)
+    app.BATCH_POLL_S = 0.2
+    # No per-minute budget: at this poll interval the batch status checks alone
+    # would use up ANTHROPIC_RPM and the run would measure the wait for it
+    app.anthropic_governor = CallGovernor("anthropic", max_concurrency=6)
+    app.PDF_PRERENDER = False
+    config = dict(app.load_config(), my_profile="meuperfil", niche="",
+                  competitors=[f"concorrente{i:02d}" for i in range(n)], carry_over_max_days=0,
+                  apify_token="fake-token", anthropic_key="fake-key")
+
+    print(f"1 + {n} perfis, {latency}s por chamada, lote termina em {batch_latency}s")
+    # Warm the scrape cache so both runs measure only the model calls
+    app.scrape_profiles([config["my_profile"]] + config["competitors"], "fake-token",
+                        cache=app.scrape_cache)
+    live_s, live_cost = run("sequencial", dict(config, batch_mode=False))
+    batch_s, batch_cost = run("lote", dict(config, batch_mode=True))
+    print(f"custo em lote: {batch_cost / live_cost:.0%} do sequencial · "
+          f"tempo: {batch_s / live_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Micro-benchmark: a fresh anthropic.Anthropic per call (old behaviour) vs the
+shared ClientRegistry, against a local HTTP stand-in for the Messages API.
+The stand-in counts accepted connections and sleeps `handshake` seconds on each
+new one, to simulate the TCP+TLS setup cost paid to the real API.
+
+    python bench/bench_client_pool.py [calls] [handshake_seconds]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.chdir(tempfile.mkdtemp(prefix="bench_"))
+
+import anthropic  # noqa: E402
+from clients import ClientRegistry  # noqa: E402
+
+REPLY = json.dumps({
+    "id": "msg_bench", "type": "message", "role": "assistant", "model": "claude-opus-4-6",
+    "content": [{"type": "text", "text": "OK"}], "stop_reason": "end_turn",
+    "stop_sequence": None, "usage": {"input_tokens": 3, "output_tokens": 1},
+}).encode()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(REPLY)))
+        self.end_headers()
+        self.wfile.write(REPLY)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandIn(ThreadingHTTPServer):
+    daemon_threads = True
+    connections = 0
+    handshake = 0.0
+
+    def process_request(self, request, client_address):
+        type(self).connections += 1
+        time.sleep(self.handshake)
+        super().process_request(request, client_address)
+
+
+def run(label, get_client, calls):
+    StandIn.connections = 0
+    start = time.perf_counter()
+    for _ in range(calls):
+        get_client().messages.create(model="claude-opus-4-6", max_tokens=10,
+                                     messages=[{"role": "user", "content": "Say OK"}])
+    elapsed = time.perf_counter() - start
+    print(f"{label:<20} conexões: {StandIn.connections:>3}   total: {elapsed:6.3f}s   "
+          f"por chamada: {elapsed / calls * 1000:6.1f}ms")
+    return elapsed
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    StandIn.handshake = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    server = StandIn(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def fresh():
+        return anthropic.Anthropic(api_key="bench", base_url=base_url, max_retries=0)
+
+    registry = ClientRegistry("anthropic", lambda key: anthropic.Anthropic(
+        api_key=key, base_url=base_url, max_retries=0))
+
+    print(f"{calls} chamadas, handshake simulado de {StandIn.handshake * 1000:.0f}ms por conexão nova")
+    slow = run("cliente novo", fresh, calls)
+    fast = run("registry (pool)", lambda: registry.get("bench"), calls)
+    print(f"economia: {slow - fast:.3f}s ({(slow - fast) / calls * 1000:.1f}ms por chamada)")
+    print("registry:", registry.stats())
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark: trend queries on a synthetic multi-year metrics history
+(profiles × runs × posts per run), without touching any report file.
+
+    python bench/bench_metrics.py [n_profiles] [n_runs] [posts_per_run]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fakes import fake_post, fake_profile  # noqa: E402
+from metrics_store import MetricsStore  # noqa: E402
+
+
+def main():
+    n_profiles = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    n_runs = int(sys.argv[2]) if len(sys.argv) > 2 else 730
+    n_posts = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+    path = Path(tempfile.mkdtemp(prefix="bench_")) / "metrics.sqlite"
+    store = MetricsStore(path)
+
+    start = time.perf_counter()
+    t0 = time.time() - n_runs * 12 * 3600
+    for r in range(n_runs):
+        for p in range(n_profiles):
+            username = f"perfil{p:02d}"
+            profile = fake_profile(username, latest=0)
+            profile["followersCount"] += r * (p + 1)
+            posts = [fake_post(username, r // 2 + k) for k in range(n_posts)]
+            for post in posts:
+                post["likesCount"] += r
+            store.record(f"run{r:04d}", username, profile, posts, ts=t0 + r * 12 * 3600)
+    load_s = time.perf_counter() - start
+    print(f"{n_profiles} perfis × {n_runs} execuções × {n_posts} posts: "
+          f"{n_profiles * n_runs * n_posts:,} snapshots de posts em {load_s:.1f}s · "
+          f"{os.path.getsize(path) / 1e6:.1f} MB")
+
+    for runs in (10, 100, n_runs):
+        start = time.perf_counter()
+        result = store.trends(runs=runs)
+        elapsed = time.perf_counter() - start
+        print(f"tendências das últimas {runs:>4} execuções: {elapsed * 1000:8.1f} ms "
+              f"({len(result['profiles'])} perfis)")
+    start = time.perf_counter()
+    store.trends(["perfil07"], runs=n_runs)
+    print(f"um perfil, histórico completo:            {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
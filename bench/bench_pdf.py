@@ -0,0 +1,58 @@
+"""
+Benchmark: PDF export time against competitor count, laid out in the request
+process (PDF_WORKERS=1) and spread over worker processes. Synthetic reports;
+the speedup is bounded by the machine's cores.
+
+    python bench/bench_pdf.py [competitor_counts] [worker_counts] [rounds]
+
+e.g. python bench/bench_pdf.py 5,15,30,60 1,2,4 3
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+os.chdir(tempfile.mkdtemp(prefix="bench_"))
+
+import app  # noqa: E402
+from synthetic import fake_report  # noqa: E402
+
+
+def render(report, workers, rounds):
+    app.PDF_WORKERS = workers
+    if app._pdf_pool:
+        app._pdf_pool.shutdown()
+        app._pdf_pool = None
+    app.render_pdf(report, io.BytesIO())  # warm-up: worker processes, imports
+    best = float("inf")
+    for _ in range(rounds):
+        out = io.BytesIO()
+        start = time.perf_counter()
+        pages = app.render_pdf(report, out)
+        best = min(best, time.perf_counter() - start)
+    return best, pages, len(out.getvalue())
+
+
+def main():
+    counts = [int(n) for n in (sys.argv[1] if len(sys.argv) > 1 else "5,15,30,60").split(",")]
+    workers = [int(n) for n in (sys.argv[2] if len(sys.argv) > 2 else "1,2,4").split(",")]
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    print(f"{os.cpu_count()} CPUs · melhor de {rounds}")
+    print(f"{'concorr.':>8} {'páginas':>8} {'KB':>7} " + " ".join(f"{f'{w} proc.':>16}" for w in workers))
+    for n in counts:
+        report = fake_report(0, n)
+        cells, base = [], None
+        for w in workers:
+            best, pages, size = render(report, w, rounds)
+            base = base or best
+            cells.append(f"{best:6.2f}s {base / best:4.1f}x")
+        print(f"{n:>8} {pages:>8} {size / 1024:>7.0f} " + " ".join(f"{c:>16}" for c in cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: report payloads and latency, legacy single pretty-printed JSON
+vs the split gzip format (header + one section, as the UI loads them).
+Synthetic reports; the legacy files are converted with `migrate-reports`.
+
+    python bench/bench_report_storage.py [n_reports] [n_competitors]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+os.chdir(tempfile.mkdtemp(prefix="bench_"))
+
+import app  # noqa: E402
+from synthetic import fake_report  # noqa: E402
+
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+def measure(client, urls, headers=None, rounds=20):
+    total, start = 0, time.perf_counter()
+    for _ in range(rounds):
+        for url in urls:
+            resp = client.get(url, headers=headers or {})
+            assert resp.status_code == 200, (url, resp.status_code)
+            total += len(resp.get_data())
+    return total / rounds, (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    competitors = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    for i in range(n):
+        report = fake_report(i, competitors)
+        (app.REPORTS_DIR / f"{report['id']}.json").write_text(
+            json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    ids = sorted(app.report_store.legacy_ids())
+    client = app.app.test_client()
+
+    before, before_ms = measure(client, [f"/api/report/{i}" for i in ids])
+    print(f"antes   relatório inteiro:      {before / n:>9,.0f} bytes · {before_ms / n:6.2f} ms")
+
+    runner = app.app.test_cli_runner()
+    print(runner.invoke(args=["migrate-reports"]).output.strip().splitlines()[-1])
+
+    for label, headers in (("sem gzip", None), ("com gzip", GZIP)):
+        full, full_ms = measure(client, [f"/api/report/{i}" for i in ids], headers)
+        lazy, lazy_ms = measure(client, [u for i in ids for u in (
+            f"/api/report/{i}/header", f"/api/report/{i}/analysis/concorrente00")], headers)
+        print(f"depois  {label}: inteiro {full / n:>9,.0f} bytes · {full_ms / n:6.2f} ms   "
+              f"cabeçalho+1 seção {lazy / n:>8,.0f} bytes · {lazy_ms / n:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
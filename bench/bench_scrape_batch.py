@@ -0,0 +1,58 @@
+"""
+Benchmark: per-profile scraping (scrape_profile per username) vs the batched
+scrape_profiles path, against FakeApifyClient.
+
+    python bench/bench_scrape_batch.py [n_profiles] [cold_start_seconds]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+os.chdir(tempfile.mkdtemp(prefix="bench_"))
+
+import app  # noqa: E402
+from fakes import FakeApifyClient  # noqa: E402
+from shared_results import SharedResults  # noqa: E402
+
+
+def run(label, fn):
+    FakeApifyClient.reset()
+    app.shared_artifacts = SharedResults()  # nothing reused from the previous pass
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<14} actor calls: {len(FakeApifyClient.calls):>3}   latency: {elapsed:6.2f}s")
+    return elapsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    cold_start = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    usernames = [f"perfil{i:02d}" for i in range(n)]
+    app.apify_clients.factory = partial(FakeApifyClient, cold_start=cold_start, missing={"perfil03"})
+
+    print(f"{n} perfis, cold start simulado de {cold_start}s por actor run")
+
+    def per_profile():
+        for u in usernames:
+            try:
+                app.scrape_profile(u, "fake-token")
+            except Exception:
+                pass
+
+    def batched():
+        app.scrape_profiles(usernames, "fake-token")
+
+    slow = run("por perfil", per_profile)
+    fast = run("em lote", batched)
+    print(f"speedup: {slow / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark: peak RSS of a full analysis run with raw Apify items kept as
+they arrive vs projected down to the used fields, against the fake clients.
+Each mode runs in its own process (RSS rarely shrinks back after a peak);
+the figure is the run's own measurement from its report timing.
+
+    python bench/bench_scrape_memory.py [n_competitors] [max_posts]
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from functools import partial
+from pathlib import Path
+
+
+def run(mode, n, max_posts):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    os.chdir(tempfile.mkdtemp(prefix="bench_"))
+
+    import app
+    from fakes import FakeAnthropic, FakeApifyClient
+    from governor import CallGovernor
+    from jobs import Job
+
+    app.apify_clients.factory = partial(FakeApifyClient, cold_start=0.05, per_item=0)
+    app.anthropic_clients.factory = partial(FakeAnthropic, latency=0.05)
+    app.anthropic_governor = CallGovernor("anthropic", max_concurrency=8)
+    app.PDF_PRERENDER = False
+    app.STREAM_FLUSH_S = 1
+    if mode == "bruto":
+        app.ACTOR_PROJECTIONS = {}
+    # run_analysis_thread scrapes with scrape_profiles' default max_posts
+    app.scrape_profiles.__defaults__ = (max_posts,) + app.scrape_profiles.__defaults__[1:]
+    config = dict(app.load_config(), my_profile="meuperfil", niche="nicho", batch_mode=False,
+                  competitors=[f"concorrente{i:03d}" for i in range(n)], carry_over_max_days=0,
+                  apify_token="fake-token", anthropic_key="fake-key", llm_concurrency=8)
+    job = Job(mode)
+    app.run_analysis_thread(config, force_refresh=True, job=job)
+    if job.status["error"]:
+        raise SystemExit(f"{mode}: {job.status['error']}")
+    timing = app.load_report(job.status["last_run"])["timing"]
+    cache_mb = sum(f.stat().st_size for f in Path("data/scrape_cache").glob("*.json")) / 1024 / 1024
+    print(json.dumps(dict(timing["memory"], wall_clock_s=timing["wall_clock_s"], cache_mb=round(cache_mb, 1))))
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    max_posts = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    print(f"1 + {n} perfis, {max_posts} posts cada")
+    for mode in ("bruto", "projetado"):
+        out = subprocess.run([sys.executable, __file__, "--run", mode, str(n), str(max_posts)],
+                             capture_output=True, text=True, check=True).stdout
+        m = json.loads(out.strip().splitlines()[-1])
+        print(f"{mode:<10} RSS pico {m['peak_mb']:7.1f} MB (início {m['start_mb']:.1f})   "
+              f"{m['wall_clock_s']:6.2f}s   cache de coleta {m['cache_mb']:6.1f} MB")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--run"]:
+        run(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+    else:
+        main()
@@ -0,0 +1,59 @@
+"""
+Benchmark: worker cold start — time to import app, to answer the first
+/healthz, and to serve / (first and cached render). Each sample runs in a
+fresh interpreter; the "eager" variant imports the SDKs up front, as app.py
+used to.
+
+    python bench/bench_startup.py [samples]
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from statistics import median
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+if {eager}:
+    import anthropic, apify_client
+sys.path.insert(0, {root!r})
+import app
+t_import = time.perf_counter()
+c = app.app.test_client()
+assert c.get("/healthz").status_code == 200
+t_health = time.perf_counter()
+c.get("/")
+t_index = time.perf_counter()
+c.get("/")
+t_index2 = time.perf_counter()
+print(json.dumps({{"import_s": t_import - t0, "first_healthz_s": t_health - t0,
+                  "first_index_s": t_index - t_health, "cached_index_s": t_index2 - t_index,
+                  "sdk_loaded": "anthropic" in sys.modules}}))
+"""
+
+
+def sample(eager):
+    cwd = tempfile.mkdtemp(prefix="bench_")
+    out = subprocess.run([sys.executable, "-c", CHILD.format(eager=eager, root=str(ROOT))],
+                         cwd=cwd, capture_output=True, text=True, env=dict(os.environ), check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for label, eager in (("eager SDKs", True), ("lazy SDKs", False)):
+        runs = [sample(eager) for _ in range(n)]
+        m = {k: median(r[k] for r in runs) for k in runs[0] if k != "sdk_loaded"}
+        print(f"{label:<11} import {m['import_s'] * 1000:7.0f} ms · primeiro /healthz "
+              f"{m['first_healthz_s'] * 1000:7.0f} ms · / {m['first_index_s'] * 1000:5.1f} ms "
+              f"(depois {m['cached_index_s'] * 1000:.2f} ms) · SDK carregado: {runs[0]['sdk_loaded']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Offline benchmark suite: end-to-end analysis runs (both engines), report
+listing over synthetic histories, post summaries over post sets of growing
+size and PDF rendering, against the fake clients with injected latency. No
+network, no credentials. Each scenario runs in its own process, so its peak
+RSS is its own.
+
+    python bench/bench_suite.py [--quick] [--latency S] [--fixtures [PATH]]
+                                [--only a,b] [--json OUT] [--baseline IN]
+
+--fixtures replays a recording (see fixtures.py) instead of synthetic items
+and replies. With --baseline (the --json of an earlier run), metrics that got
+worse by more than --tolerance are flagged and the exit status is 1.
+Metric names carry their direction: *_per_s higher is better; *_s, *_ms and
+*_mb lower is better; the rest are informational.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+
+FULL = {"e2e": [("threads", 10), ("threads", 50), ("async", 50)],
+        "reports_list": [200, 2000], "posts_summary": [30, 300, 3000], "pdf": [5, 25, 60]}
+QUICK = {"e2e": [("threads", 5), ("async", 5)],
+         "reports_list": [200], "posts_summary": [30, 300], "pdf": [5]}
+
+
+def _setup():
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    os.chdir(tempfile.mkdtemp(prefix="bench_"))
+
+
+def _latencies(fn, rounds):
+    out = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - start)
+    return out
+
+
+def _ms(samples):
+    ordered = sorted(samples)
+    return {"p50_ms": round(statistics.median(ordered) * 1000, 3),
+            "p95_ms": round(ordered[max(0, int(len(ordered) * 0.95) - 1)] * 1000, 3)}
+
+
+def e2e(opts, engine, n):
+    import app
+    from fakes import FakeAnthropic, FakeAnthropicAsync, FakeApifyClient, FakeApifyClientAsync
+    from fixtures import Fixtures
+    from governor import CallGovernor
+    from jobs import Job
+
+    fixtures = Fixtures.load(opts["fixtures"]) if opts["fixtures"] else None
+    latency = opts["latency"]
+    app.apify_clients.factory = partial(FakeApifyClient, cold_start=latency, per_item=0, fixtures=fixtures)
+    app.anthropic_clients.factory = partial(FakeAnthropic, latency=latency, fixtures=fixtures)
+    app.async_apify_clients.factory = partial(FakeApifyClientAsync, cold_start=latency, per_item=0,
+                                              fixtures=fixtures)
+    app.async_anthropic_clients.factory = partial(FakeAnthropicAsync, latency=latency, fixtures=fixtures)
+    # No per-minute API budgets: the run's own concurrency settings are the limit
+    app.anthropic_governor = CallGovernor("anthropic", max_concurrency=64)
+    app.apify_governor = CallGovernor("apify", max_concurrency=64)
+    app.PDF_PRERENDER = False
+    config = dict(app.load_config(), my_profile="meuperfil", niche="", batch_mode=False, engine=engine,
+                  competitors=[f"concorrente{i:03d}" for i in range(n)], carry_over_max_days=0,
+                  apify_token="fake-token", anthropic_key="fake-key")
+    job = Job(f"{engine}-{n}")
+    start = time.perf_counter()
+    app.run_analysis_thread(config, force_refresh=True, job=job)
+    wall = time.perf_counter() - start
+    if job.status["error"]:
+        raise SystemExit(f"❌ {engine}: {job.status['error']}")
+    trace = app.load_report(job.status["last_run"])["timing"]["trace"]
+    out = {"wall_s": round(wall, 3), "profiles_per_s": round((n + 1) / wall, 2)}
+    for name in ("apify", "llm"):
+        series = [s for s in trace if s["span"] == name]
+        if series:
+            out[f"{name}_calls"] = sum(s["count"] for s in series)
+            out[f"{name}_p95_s"] = max(s["p95_s"] for s in series)
+    return out
+
+
+def reports_list(opts, n):
+    import app
+    from report_index import ReportIndex
+    from synthetic import write_history
+
+    start = time.perf_counter()
+    ids = write_history(app.report_store.save, n, competitors=4, owners=4)
+    write_s = time.perf_counter() - start
+    # Cold start: index every report on disk from scratch, as on a fresh deploy
+    index = ReportIndex(Path(tempfile.mkdtemp()) / "index.sqlite")
+    start = time.perf_counter()
+    index.sync(app.load_report, set(ids))
+    index_s = time.perf_counter() - start
+    app.report_index = index
+    client = app.app.test_client()
+    rounds = 50
+    full = _latencies(app.get_reports_list, rounds)
+    page = _latencies(lambda: client.get("/api/reports?page=1&per_page=20"), rounds)
+    filtered = _latencies(lambda: client.get("/api/reports?profile=meuperfil1&date_from=2024-06-01"), rounds)
+    return {"write_per_s": round(n / write_s, 1), "index_build_s": round(index_s, 3),
+            "lists_per_s": round(rounds / sum(full), 1),
+            **{f"list_{k}": v for k, v in _ms(full).items()},
+            **{f"api_page_{k}": v for k, v in _ms(page).items()},
+            **{f"api_filtered_{k}": v for k, v in _ms(filtered).items()}}
+
+
+def posts_summary(opts, n):
+    import app
+    from fixtures import Fixtures
+    from synthetic import post_set
+
+    if opts["fixtures"]:
+        fixtures = Fixtures.load(opts["fixtures"])
+        recorded = [p for posts in fixtures.posts.values() for p in posts]
+        posts = [dict(recorded[k % len(recorded)], id=f"p{k}") for k in range(n)]
+    else:
+        posts = post_set("perfil", n)
+    profile = {"username": "perfil", "posts": posts}
+    app.build_posts_summary(profile)
+    samples = _latencies(lambda: app.build_posts_summary(profile), max(20, 3000 // n))
+    return {"summaries_per_s": round(len(samples) / sum(samples), 1), **_ms(samples)}
+
+
+def pdf(opts, competitors):
+    import app
+    from synthetic import fake_report
+
+    app.PDF_PRERENDER = False
+    report = fake_report(0, competitors)
+    app.save_report(report)
+    path = app.pdf_path(report["id"])
+
+    def render():
+        path.unlink(missing_ok=True)
+        app.ensure_pdf(report["id"])
+
+    samples = _latencies(render, 5)
+    client = app.app.test_client()
+    cached = _latencies(lambda: client.get(f"/api/report/{report['id']}/pdf").close(), 20)
+    return {"renders_per_s": round(len(samples) / sum(samples), 2),
+            **{f"render_{k}": v for k, v in _ms(samples).items()},
+            **{f"export_cached_{k}": v for k, v in _ms(cached).items()},
+            "pdf_kb": round(path.stat().st_size / 1024, 1)}
+
+
+SCENARIOS = {"e2e": e2e, "reports_list": reports_list, "posts_summary": posts_summary, "pdf": pdf}
+
+
+def run_scenario(kind, params, opts):
+    _setup()
+    from memwatch import PeakRSS
+
+    rss = PeakRSS(interval=0.05)
+    out = SCENARIOS[kind](opts, *params)
+    out["peak_mb"] = rss.stop()["peak_mb"]
+    print(json.dumps(out))
+
+
+def _name(kind, params):
+    return "_".join([kind] + [str(p) for p in params])
+
+
+def _regressions(results, baseline, tolerance):
+    flagged = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            before = baseline.get(name, {}).get(metric)
+            if not before or not isinstance(value, (int, float)):
+                continue
+            if metric.endswith("_per_s"):
+                worse = before / value - 1 if value else float("inf")
+            elif metric.endswith(("_s", "_ms", "_mb")):
+                worse = value / before - 1
+            else:
+                continue
+            if worse > tolerance:
+                flagged.append(f"{name}.{metric}: {before} → {value} ({worse:+.0%})")
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--quick", action="store_true", help="smaller sizes, for a quick check")
+    parser.add_argument("--latency", type=float, default=0.05, help="injected latency per API call (s)")
+    parser.add_argument("--fixtures", nargs="?", const="", default=None,
+                        help="replay a recording (default bench/fixtures/recorded.json.gz)")
+    parser.add_argument("--only", help="comma-separated scenario kinds: " + ",".join(SCENARIOS))
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results of an earlier --json run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    fixtures = args.fixtures
+    if fixtures == "":
+        from fixtures import DEFAULT_PATH
+        fixtures = str(DEFAULT_PATH)
+    opts = {"latency": args.latency, "fixtures": fixtures and str(Path(fixtures).resolve())}
+    plan = QUICK if args.quick else FULL
+    kinds = args.only.split(",") if args.only else list(plan)
+    print(f"{args.latency}s por chamada · {'gravação ' + fixtures if fixtures else 'dados sintéticos'}")
+
+    results = {}
+    for kind in kinds:
+        for params in plan[kind]:
+            params = params if isinstance(params, tuple) else (params,)
+            name = _name(kind, params)
+            proc = subprocess.run([sys.executable, __file__, "--scenario", kind, json.dumps(params),
+                                   json.dumps(opts)], capture_output=True, text=True)
+            if proc.returncode:
+                sys.stderr.write(proc.stderr)
+                raise SystemExit(f"❌ {name} falhou")
+            results[name] = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(f"{name:<22} " + "  ".join(f"{k}={v}" for k, v in results[name].items()), flush=True)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"latency": args.latency, "fixtures": fixtures,
+                                               "results": results}, indent=2), encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))["results"]
+        flagged = _regressions(results, baseline, args.tolerance)
+        for line in flagged:
+            print(f"⚠️  {line}")
+        if flagged:
+            raise SystemExit(1)
+        print(f"✅ nenhuma regressão acima de {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--scenario"]:
+        run_scenario(sys.argv[2], json.loads(sys.argv[3]), json.loads(sys.argv[4]))
+    else:
+        main()
@@ -0,0 +1,311 @@
+"""
+Local stand-ins for the external services used by app.py, for benchmarks.
+No network, no credentials: latency is simulated with time.sleep (or
+asyncio.sleep for the async clients). Items and replies are synthetic
+unless the clients are given recorded fixtures (see fixtures.py).
+"""
+
+import asyncio
+import itertools
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import partial
+
+
+def fake_post(owner, n):
+    return {
+        "id": f"{owner}_{n}", "shortCode": f"{owner[:4]}{n:04d}",
+        "ownerUsername": owner, "type": ["Image", "Video", "Sidecar"][n % 3],
+        "caption": f"Post {n} de @{owner} #dica #{owner[:6]} " + "conteúdo " * 20,
+        "hashtags": ["dica", owner[:6]],
+        "likesCount": 100 + (n * 37) % 900, "commentsCount": 5 + (n * 13) % 80,
+        "videoViewCount": 1000 + n * 50 if n % 3 == 1 else None,
+        "timestamp": (datetime(2026, 1, 1) - timedelta(days=n)).isoformat() + "Z",
+        "displayUrl": f"https://cdn.example/{owner}/{n}.jpg",
+        "images": [f"https://cdn.example/{owner}/{n}_{k}.jpg" for k in range(3)],
+        # Raw fields the app never reads, at roughly the size the real actor returns them
+        "url": f"https://www.instagram.com/p/{owner[:4]}{n:04d}/",
+        "latestComments": [{"id": f"{owner}_{n}_c{k}", "text": "Que conteúdo incrível! " * 3,
+                            "ownerUsername": f"fan{k}", "timestamp": "2026-01-01T00:00:00.000Z",
+                            "likesCount": k, "ownerProfilePicUrl": f"https://cdn.example/fan{k}.jpg"}
+                           for k in range(10)],
+        "childPosts": [{"id": f"{owner}_{n}_{k}", "type": "Image", "displayUrl":
+                        f"https://cdn.example/{owner}/{n}_{k}_full.jpg?" + "x" * 200}
+                       for k in range(3)] if n % 3 == 2 else [],
+        "taggedUsers": [{"username": f"amigo{k}", "full_name": f"Amigo {k}"} for k in range(3)],
+        "dimensionsHeight": 1350, "dimensionsWidth": 1080,
+    }
+
+
+def fake_profile(username, latest=12):
+    return {
+        "username": username, "fullName": username.title(),
+        "biography": f"Bio de @{username}", "followersCount": 1000 + len(username) * 997,
+        "followsCount": 300, "postsCount": 400,
+        "latestPosts": [fake_post(username, n) for n in range(latest)],
+    }
+
+
+class FakeApifyClient:
+    """Mimics the ApifyClient surface used by app.py (actor().call, dataset().iterate_items).
+
+    Every actor call costs `cold_start` seconds plus `per_item` per dataset item.
+    Usernames in `missing` behave like private/non-existent profiles. Dataset
+    items are generated (or replayed from `fixtures`) as they are iterated,
+    like pages of a real dataset.
+    """
+
+    calls = []
+    _lock = threading.Lock()
+    _ids = itertools.count()
+    _datasets = {}
+
+    def __init__(self, token=None, cold_start=0.5, per_item=0.002, missing=(), fixtures=None):
+        self.cold_start = cold_start
+        self.per_item = per_item
+        self.missing = set(missing)
+        self.fixtures = fixtures
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls.calls = []
+            cls._datasets = {}
+
+    def actor(self, name):
+        return _FakeActor(self, name)
+
+    def dataset(self, dataset_id):
+        return _FakeDataset(partial(self._items, *self._datasets[dataset_id]))
+
+    def _run(self, name, run_input):
+        time.sleep(self.cold_start + self.per_item * self._count(run_input))
+        return self._store(name, run_input)
+
+    @staticmethod
+    def _count(run_input):
+        if "usernames" in run_input:
+            return len(run_input["usernames"])
+        return len(run_input["directUrls"]) * run_input.get("resultsLimit", 30)
+
+    def _items(self, name, run_input):
+        if name == "apify/instagram-profile-scraper":
+            for u in run_input["usernames"]:
+                if u in self.missing:
+                    yield {"username": u, "error": "not_found"}
+                else:
+                    yield self.fixtures.profile_item(u) if self.fixtures else fake_profile(u)
+        else:
+            limit = run_input.get("resultsLimit", 30)
+            for url in run_input["directUrls"]:
+                owner = url.rstrip("/").rsplit("/", 1)[-1]
+                if self.fixtures:
+                    yield from self.fixtures.post_items(owner, limit)
+                else:
+                    for n in range(limit):
+                        yield fake_post(owner, n)
+
+    def _store(self, name, run_input):
+        dataset_id = f"ds{next(self._ids)}"
+        with self._lock:
+            self.calls.append((name, run_input))
+            self._datasets[dataset_id] = (name, run_input)
+        return {"defaultDatasetId": dataset_id}
+
+
+class _FakeActor:
+    def __init__(self, client, name):
+        self.client, self.name = client, name
+
+    def call(self, run_input=None, **kwargs):
+        return self.client._run(self.name, run_input or {})
+
+
+class _FakeDataset:
+    def __init__(self, items):
+        self.items = items  # () -> iterator over the items
+
+    def iterate_items(self, **kwargs):
+        return self.items()
+
+
+class FakeApifyClientAsync(FakeApifyClient):
+    """FakeApifyClient with the ApifyClientAsync surface (awaitable call, async iterate_items)"""
+
+    def actor(self, name):
+        return _FakeActorAsync(self, name)
+
+    def dataset(self, dataset_id):
+        return _FakeDatasetAsync(partial(self._items, *self._datasets[dataset_id]))
+
+    async def _run_async(self, name, run_input):
+        await asyncio.sleep(self.cold_start + self.per_item * self._count(run_input))
+        return self._store(name, run_input)
+
+
+class _FakeActorAsync(_FakeActor):
+    async def call(self, run_input=None, **kwargs):
+        return await self.client._run_async(self.name, run_input or {})
+
+
+class _FakeDatasetAsync(_FakeDataset):
+    async def iterate_items(self, **kwargs):
+        for item in self.items():
+            yield item
+
+
+class _Obj:
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+class FakeAnthropic:
+    """Mimics anthropic.Anthropic().messages.create/stream/batches for single-turn text prompts.
+
+    Each call sleeps `latency` seconds; the reply length follows max_tokens
+    (or the reply is a recorded one from `fixtures`). A Message Batch ends
+    `batch_latency` seconds after it is created.
+    """
+
+    calls = []
+    _lock = threading.Lock()
+    _batches = {}
+    _ids = itertools.count()
+
+    def __init__(self, api_key=None, latency=0.3, batch_latency=2.0, fixtures=None, **kwargs):
+        self.latency = latency
+        self.batch_latency = batch_latency
+        self.fixtures = fixtures
+        self.messages = _FakeMessages(self)
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls.calls = []
+            cls._batches = {}
+
+
+class _FakeMessages:
+    def __init__(self, client):
+        self.client = client
+        self.batches = _FakeBatches(client, self)
+
+    def _reply(self, model, max_tokens, messages):
+        prompt = messages[-1]["content"]
+        with FakeAnthropic._lock:
+            FakeAnthropic.calls.append((model, max_tokens, len(prompt)))
+        if self.client.fixtures:
+            text = self.client.fixtures.reply(max_tokens, prompt)
+        elif max_tokens <= 50:
+            text = "Nicho de teste"
+        else:
+            text = "\n".join(f"### {n}. SEÇÃO\nLinha de análise simulada {n}." for n in range(1, max_tokens // 100))
+        return _Obj(content=[_Obj(type="text", text=text)],
+                    usage=_Obj(input_tokens=len(prompt) // 4, output_tokens=len(text) // 4))
+
+    def create(self, model, max_tokens, messages, **kwargs):
+        time.sleep(self.client.latency)
+        return self._reply(model, max_tokens, messages)
+
+    def stream(self, model, max_tokens, messages, **kwargs):
+        return _FakeStream(self._reply(model, max_tokens, messages), self.client.latency)
+
+
+class _FakeStream:
+    """Context manager like MessageStream: text_stream spreads the latency over the words"""
+
+    def __init__(self, message, latency):
+        self.message, self.latency = message, latency
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @property
+    def text_stream(self):
+        words = self.message.content[0].text.split(" ")
+        for n, word in enumerate(words):
+            time.sleep(self.latency / len(words))
+            yield word if n == 0 else " " + word
+
+    def get_final_message(self):
+        return self.message
+
+
+class _FakeBatches:
+    """messages.batches: create/retrieve/results/cancel with simulated processing time"""
+
+    def __init__(self, client, messages):
+        self.client, self.messages = client, messages
+
+    def create(self, requests, **kwargs):
+        batch_id = f"msgbatch_{next(FakeAnthropic._ids)}"
+        with FakeAnthropic._lock:
+            FakeAnthropic._batches[batch_id] = {
+                "requests": list(requests), "cancelled": False,
+                "ends_at": time.monotonic() + self.client.batch_latency}
+        return self.retrieve(batch_id)
+
+    def retrieve(self, batch_id):
+        entry = FakeAnthropic._batches[batch_id]
+        ended = entry["cancelled"] or time.monotonic() >= entry["ends_at"]
+        n = len(entry["requests"])
+        return _Obj(id=batch_id, processing_status="ended" if ended else "in_progress",
+                    request_counts=_Obj(processing=0 if ended else n, succeeded=0 if entry["cancelled"]
+                                        else (n if ended else 0), errored=0, canceled=0, expired=0))
+
+    def cancel(self, batch_id):
+        FakeAnthropic._batches[batch_id]["cancelled"] = True
+        return self.retrieve(batch_id)
+
+    def results(self, batch_id):
+        entry = FakeAnthropic._batches[batch_id]
+        for request in entry["requests"]:
+            if entry["cancelled"]:
+                result = _Obj(type="canceled")
+            else:
+                params = request["params"]
+                result = _Obj(type="succeeded", message=self.messages._reply(
+                    params["model"], params["max_tokens"], params["messages"]))
+            yield _Obj(custom_id=request["custom_id"], result=result)
+
+
+class FakeAnthropicAsync(FakeAnthropic):
+    """FakeAnthropic with the AsyncAnthropic surface (awaitable create, async stream)"""
+
+    def __init__(self, api_key=None, latency=0.3, **kwargs):
+        super().__init__(api_key, latency, **kwargs)
+        self.messages = _FakeMessagesAsync(self)
+
+    async def close(self):
+        pass
+
+
+class _FakeMessagesAsync(_FakeMessages):
+    async def create(self, model, max_tokens, messages, **kwargs):
+        await asyncio.sleep(self.client.latency)
+        return self._reply(model, max_tokens, messages)
+
+    def stream(self, model, max_tokens, messages, **kwargs):
+        return _FakeStreamAsync(self._reply(model, max_tokens, messages), self.client.latency)
+
+
+class _FakeStreamAsync(_FakeStream):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    async def text_stream(self):
+        words = self.message.content[0].text.split(" ")
+        for n, word in enumerate(words):
+            await asyncio.sleep(self.latency / len(words))
+            yield word if n == 0 else " " + word
+
+    async def get_final_message(self):
+        return self.message
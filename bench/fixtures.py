@@ -0,0 +1,100 @@
+"""
+Recorded Apify items and model replies, replayed by the fake clients
+(fakes.py) instead of the synthetic ones.
+
+A recording is taken from the data directory of an instance that has done
+real runs: the scrape cache holds the (projected) profile and post items and
+the LLM cache the model replies, so recording costs no credit or tokens.
+It holds real profile data: the default location, bench/fixtures/, is
+ignored by git.
+
+    python bench/fixtures.py [data_dir] [out.json.gz]
+"""
+
+import gzip
+import json
+import sqlite3
+import sys
+import zlib
+from pathlib import Path
+
+DEFAULT_PATH = Path(__file__).resolve().parent / "fixtures" / "recorded.json.gz"
+SHORT_REPLY = 200  # chars; niche labels, as opposed to analyses and plans
+
+
+class Fixtures:
+    """Usernames that are not in the recording are mapped onto a recorded
+    profile (the same one every time) and renamed, so a handful of recorded
+    profiles can stand in for any competitor list."""
+
+    def __init__(self, profiles, posts, replies):
+        self.profiles = profiles  # {username: profile item}
+        self.posts = posts  # {username: [post items], newest first}
+        self.replies = replies  # [reply text]
+        self._names = sorted(profiles)
+        self._short = [t for t in replies if len(t) <= SHORT_REPLY]
+        self._long = [t for t in replies if len(t) > SHORT_REPLY]
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["profiles"], data["posts"], data["replies"])
+
+    def save(self, path=DEFAULT_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump({"profiles": self.profiles, "posts": self.posts, "replies": self.replies},
+                      f, ensure_ascii=False)
+
+    def _source(self, username):
+        if username in self.profiles:
+            return username
+        return self._names[zlib.crc32(username.encode("utf-8")) % len(self._names)]
+
+    @staticmethod
+    def _as(post, username):
+        return dict(post, ownerUsername=username, id=f"{username}_{post.get('id') or post.get('shortCode')}")
+
+    def profile_item(self, username):
+        item = dict(self.profiles[self._source(username)], username=username)
+        item["latestPosts"] = [self._as(p, username) for p in item.get("latestPosts") or []]
+        return item
+
+    def post_items(self, username, limit):
+        return [self._as(p, username) for p in self.posts.get(self._source(username), [])[:limit]]
+
+    def reply(self, max_tokens, prompt):
+        """A recorded reply of the right kind for the call, picked by prompt"""
+        pool = (self._short if max_tokens <= 50 else self._long) or self.replies
+        text = pool[zlib.crc32(prompt.encode("utf-8")) % len(pool)]
+        return text[:max_tokens * 4]
+
+
+def record(data_dir):
+    data_dir = Path(data_dir)
+    profiles, posts = {}, {}
+    for f in sorted((data_dir / "scrape_cache").glob("*.json")):
+        entry = json.loads(f.read_text(encoding="utf-8"))
+        if entry.get("profile") and not entry["profile"].get("error"):
+            profiles[entry["username"]] = entry["profile"]
+            posts[entry["username"]] = entry.get("posts") or []
+    db = sqlite3.connect(str(data_dir / "llm_cache.sqlite"))
+    replies = [row[0] for row in db.execute("SELECT text FROM responses ORDER BY created_at")]
+    db.close()
+    if not profiles or not replies:
+        raise SystemExit(f"❌ Nada para gravar em {data_dir}: faça uma análise real antes")
+    return Fixtures(profiles, posts, replies)
+
+
+def main():
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "data"
+    out = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PATH
+    fixtures = record(data_dir)
+    fixtures.save(out)
+    print(f"✅ {len(fixtures.profiles)} perfis, {sum(map(len, fixtures.posts.values()))} posts e "
+          f"{len(fixtures.replies)} respostas gravados em {out}")
+
+
+if __name__ == "__main__":
+    main()
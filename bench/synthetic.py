@@ -0,0 +1,62 @@
+"""
+Synthetic data for benchmarks: report histories and post sets of any size,
+deterministic for a given seed so runs on different commits compare.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+from fakes import fake_post
+from scrape_cache import project_post
+
+WORDS = ("conteúdo engajamento público reels carrossel estratégia nicho seguidores post "
+         "gancho legenda hashtag frequência crescimento autoridade oportunidade concorrente "
+         "formato tendência audiência métrica alcance comentário salvamento").split()
+NICHES = ("Nutrição esportiva", "Finanças pessoais", "Moda sustentável", "Confeitaria artesanal")
+
+
+def analysis_text(username, n):
+    rnd = random.Random(username)
+    return "\n".join(f"### {k}. SEÇÃO\nAnálise de @{username}: "
+                     + " ".join(rnd.choice(WORDS) for _ in range(60)) for k in range(1, n))
+
+
+def fake_report(i, competitors, owners=1):
+    """The i-th report of a history with one run every 12 hours, spread over
+    `owners` own profiles and their niches"""
+    owner = "meuperfil" if owners == 1 else f"meuperfil{i % owners}"
+    when = datetime(2024, 1, 1, 12) + timedelta(hours=12 * i)
+    users = [owner] + [f"concorrente{c:02d}" for c in range(competitors)]
+    return {
+        "id": when.strftime("%Y%m%d_%H%M"), "run_date": when.isoformat(),
+        "run_date_br": when.strftime("%d/%m/%Y às %H:%M"), "my_niche": NICHES[i % owners % len(NICHES)],
+        "config": {"my_profile": owner, "competitors": users[1:]},
+        "profiles_analyzed": len(users),
+        "analyses": [{"type": "own" if u == owner else "competitor", "username": u,
+                      "full_name": u.title(), "followers": 1000, "posts_analyzed": 30,
+                      "detected_niche": "Nicho", "analysis": analysis_text(u, 30)} for u in users],
+        "content_plan": analysis_text("plano", 35), "executive_summary": analysis_text("exec", 30),
+    }
+
+
+def write_history(save, n, competitors, owners=1):
+    """Save n reports through save(report) (e.g. app.report_store.save); returns their ids"""
+    ids = []
+    for i in range(n):
+        report = fake_report(i, competitors, owners)
+        save(report)
+        ids.append(report["id"])
+    return ids
+
+
+def post_set(owner, n, seed=0):
+    """n projected posts of one profile (as the scrape cache holds them), with
+    engagement and post type shuffled so the ranking has work to do"""
+    rnd = random.Random(f"{owner}:{seed}")
+    posts = []
+    for k in range(n):
+        post = project_post(fake_post(owner, k))
+        post["likesCount"] = int(rnd.paretovariate(1.2) * 50)
+        post["commentsCount"] = rnd.randint(0, 200)
+        posts.append(post)
+    return posts
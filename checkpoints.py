@@ -0,0 +1,47 @@
+"""
+Per-run checkpoint: an append-only JSONL file with one line per finished
+stage (profile analysis, content plan, executive summary), fsync'd as it is
+written, so a run killed partway through can resume from what it finished.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+
+class Checkpoint:
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def add(self, kind, data):
+        line = json.dumps({"kind": kind, "data": data}, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def load(self):
+        """{"analyses": {username: analysis}, kind: data for the other stages}.
+        A torn last line (killed mid-write) is ignored."""
+        state = {"analyses": {}}
+        if not self.path.exists():
+            return state
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry["kind"] == "analysis":
+                    state["analyses"][entry["data"]["username"]] = entry["data"]
+                else:
+                    state[entry["kind"]] = entry["data"]
+        return state
+
+    def remove(self):
+        with self._lock:
+            self.path.unlink(missing_ok=True)
@@ -0,0 +1,63 @@
+"""
+Process-wide registry of long-lived SDK clients, keyed by credential.
+Reusing one client per key keeps its HTTP connection pool (keep-alive, TLS
+sessions) warm across runs and request threads instead of paying a new
+handshake for every call.
+"""
+
+import hashlib
+import threading
+
+
+def _fingerprint(credential):
+    return hashlib.sha256((credential or "").encode("utf-8")).hexdigest()[:12]
+
+def _open_connections(client):
+    """Best-effort count of pooled connections of an httpx-based SDK client"""
+    http = getattr(client, "_client", None) or getattr(getattr(client, "http_client", None), "httpx_client", None)
+    pool = getattr(getattr(http, "_transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None)
+    return len(connections) if connections is not None else None
+
+
+class ClientRegistry:
+    def __init__(self, name, factory, close=None):
+        self.name = name
+        self.factory = factory
+        self.close = close  # close(client) for clients without a plain close() method
+        self._clients = {}
+        self._lock = threading.Lock()
+        self.counters = {"built": 0, "reused": 0, "closed": 0}
+
+    def get(self, credential):
+        fp = _fingerprint(credential)
+        with self._lock:
+            entry = self._clients.get(fp)
+            if entry is not None:
+                self.counters["reused"] += 1
+                entry["uses"] += 1
+                return entry["client"]
+            client = self.factory(credential)
+            self._clients[fp] = {"client": client, "uses": 1}
+            self.counters["built"] += 1
+            return client
+
+    def retain(self, *credentials):
+        """Close and drop every client whose credential is not in credentials"""
+        keep = {_fingerprint(c) for c in credentials if c}
+        with self._lock:
+            for fp in [fp for fp in self._clients if fp not in keep]:
+                client = self._clients.pop(fp)["client"]
+                self.counters["closed"] += 1
+                close = (lambda: self.close(client)) if self.close else getattr(client, "close", None)
+                if callable(close):
+                    try:
+                        close()
+                    except Exception:
+                        pass
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, clients=[
+                {"credential": fp, "uses": e["uses"], "open_connections": _open_connections(e["client"])}
+                for fp, e in self._clients.items()])
@@ -0,0 +1,19 @@
+"""
+SQLite connections for the stores under DATA_DIR and REPORTS_DIR. They are
+shared by every worker process: WAL mode lets readers go on while one process
+writes, and writers wait up to BUSY_TIMEOUT_S for each other instead of
+failing with "database is locked".
+"""
+
+import sqlite3
+
+BUSY_TIMEOUT_S = 30
+
+
+def connect(path, autocommit=False):
+    """One connection per store and process, used from several threads under the store's lock"""
+    db = sqlite3.connect(str(path), timeout=BUSY_TIMEOUT_S, check_same_thread=False,
+                         isolation_level=None if autocommit else "")
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
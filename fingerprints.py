@@ -0,0 +1,31 @@
+"""
+Change detection across runs: a short fingerprint of what a profile analysis
+depends on (bio, follower count, the latest posts and their engagement, and
+the prompt context). Counts are bucketed on a log scale, so a profile whose
+numbers only drifted a little keeps its fingerprint and its previous
+analysis can be carried over instead of paying for new model calls.
+
+Only fields of the profile-scraper item are used (latestPosts, not the posts
+actor's results), so the check can run before the posts are fetched.
+"""
+
+import hashlib
+import json
+import math
+
+from scrape_cache import post_key
+
+BUCKET_STEP = 0.1  # ~10% wide buckets
+
+
+def bucket(n, step=BUCKET_STEP):
+    return int(math.log1p(max(n or 0, 0)) / math.log1p(step))
+
+def profile_fingerprint(profile, context=()):
+    posts = sorted((post_key(p), bucket((p.get("likesCount") or 0) + (p.get("commentsCount") or 0)))
+                   for p in profile.get("latestPosts") or [] if post_key(p))
+    signals = [" ".join((profile.get("biography") or "").split()), profile.get("fullName") or "",
+               bucket(profile.get("followersCount")), profile.get("postsCount") or 0,
+               posts, list(context)]
+    raw = json.dumps(signals, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,207 @@
+"""
+Shared call governor for an external API: retries rate-limited and transient
+failures with jittered exponential backoff (honouring retry-after), keeps
+requests/tokens per minute under budget, and adapts how many calls may be in
+flight at once (AIMD: +1 after a run of successes, halved on a rate limit).
+"""
+
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+
+RATE_LIMITED = (429, 529)
+TRANSIENT = (408, 409, 500, 502, 503, 504)
+
+
+def status_code(error):
+    code = getattr(error, "status_code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+def retry_after(error):
+    """Seconds requested by a retry-after / retry-after-ms header, if any"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+def classify(error):
+    """'rate_limit', 'transient' or 'fatal'"""
+    code = status_code(error)
+    if code in RATE_LIMITED:
+        return "rate_limit"
+    if code in TRANSIENT:
+        return "transient"
+    if code is None and (isinstance(error, (ConnectionError, TimeoutError))
+                         or any(n in type(error).__name__ for n in ("Connection", "Timeout"))):
+        return "transient"
+    return "fatal"
+
+
+class CallGovernor:
+    def __init__(self, name, rpm=0, tpm=0, max_concurrency=8, min_concurrency=1,
+                 max_attempts=5, base_delay=1.0, max_delay=60.0, increase_after=5):
+        self.name = name
+        self.rpm, self.tpm = rpm, tpm
+        self.max_concurrency, self.min_concurrency = max_concurrency, min_concurrency
+        self.limit = max_concurrency
+        self.max_attempts = max_attempts
+        self.base_delay, self.max_delay = base_delay, max_delay
+        self.increase_after = increase_after
+        self.in_flight = 0
+        self._streak = 0
+        self._pause_until = 0.0
+        self._window = deque()  # (timestamp, tokens) of calls in the last minute
+        self._cond = threading.Condition()
+        # Per thread / per asyncio task: the window entry of the last call, for charge()
+        self._last_entry = contextvars.ContextVar(f"{name}_last_entry", default=None)
+        self._attempts = contextvars.ContextVar(f"{name}_attempts", default=0)
+        self.counters = {"calls": 0, "retries": 0, "rate_limited": 0, "failed": 0, "waited_s": 0.0}
+
+    def _budget_wait(self, now, tokens):
+        while self._window and now - self._window[0][0] >= 60:
+            self._window.popleft()
+        waits = [self._pause_until - now]
+        if self.rpm and len(self._window) >= self.rpm:
+            waits.append(self._window[0][0] + 60 - now)
+        if self.tpm and self._window:
+            used = sum(t for _, t in self._window)
+            if used + tokens > self.tpm:
+                # Wait until enough of the window expires to make room
+                for ts, t in self._window:
+                    used -= t
+                    if used + tokens <= self.tpm:
+                        break
+                waits.append(ts + 60 - now)
+        return max(waits)
+
+    def _try_acquire(self, tokens, started):
+        """Take a call slot if concurrency and budgets allow. Returns (entry, None),
+        or (None, seconds to wait) — None seconds meaning "until a slot frees up"."""
+        now = time.monotonic()
+        wait = self._budget_wait(now, tokens)
+        if self.in_flight >= self.limit or wait > 0:
+            return None, (wait if wait > 0 else None)
+        self.in_flight += 1
+        self.counters["calls"] += 1
+        self.counters["waited_s"] += now - started
+        entry = [now, tokens]
+        self._window.append(entry)
+        return entry, None
+
+    def _acquire(self, tokens):
+        started = time.monotonic()
+        with self._cond:
+            while True:
+                entry, wait = self._try_acquire(tokens, started)
+                if entry:
+                    return entry
+                self._cond.wait(wait)
+
+    async def _aacquire(self, tokens):
+        # The event loop thread must not block on the condition, so poll instead
+        started = time.monotonic()
+        while True:
+            with self._cond:
+                entry, wait = self._try_acquire(tokens, started)
+            if entry:
+                return entry
+            await asyncio.sleep(min(wait or 0.05, 1))
+
+    def _release(self, ok, rate_limited=False, pause=0.0):
+        with self._cond:
+            self.in_flight -= 1
+            if rate_limited:
+                self.counters["rate_limited"] += 1
+                self.limit = max(self.min_concurrency, self.limit // 2)
+                self._streak = 0
+                self._pause_until = max(self._pause_until, time.monotonic() + pause)
+            elif ok:
+                self._streak += 1
+                if self._streak >= self.increase_after and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self._streak = 0
+            self._cond.notify_all()
+
+    def retries(self):
+        """Retries made by this thread's (or task's) last call"""
+        return max(self._attempts.get() - 1, 0)
+
+    def charge(self, tokens):
+        """Replace the estimated token count of this thread's (or task's) last call with the real one"""
+        entry = self._last_entry.get()
+        if entry is None:
+            return
+        with self._cond:
+            entry[1] = tokens
+            self._cond.notify_all()
+
+    def backoff(self, attempt, error=None):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        hinted = retry_after(error) if error is not None else None
+        return max(delay, hinted or 0)
+
+    def _failed(self, error, attempt):
+        """Release after an error; returns the backoff delay, or None to give up"""
+        kind = classify(error)
+        last = attempt == self.max_attempts - 1
+        delay = 0 if kind == "fatal" or last else self.backoff(attempt, error)
+        self._release(False, kind == "rate_limit", delay)
+        if kind == "fatal" or last:
+            self.counters["failed"] += 1
+            return None
+        self.counters["retries"] += 1
+        return delay
+
+    def call(self, fn, *args, tokens=0, **kwargs):
+        """Run fn(*args, **kwargs) under the budgets, retrying rate-limited and
+        transient errors; `tokens` is the call's estimated size (see charge)"""
+        for attempt in range(self.max_attempts):
+            self._attempts.set(attempt + 1)
+            entry = self._acquire(tokens)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self._release(True)
+            self._last_entry.set(entry)
+            return result
+
+    async def acall(self, fn, *args, tokens=0, **kwargs):
+        """call() for coroutine functions, waiting without blocking the event loop"""
+        for attempt in range(self.max_attempts):
+            self._attempts.set(attempt + 1)
+            entry = await self._aacquire(tokens)
+            try:
+                result = await fn(*args, **kwargs)
+            except asyncio.CancelledError:
+                self._release(False)
+                raise
+            except Exception as e:
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self._release(True)
+            self._last_entry.set(entry)
+            return result
+
+    def stats(self):
+        with self._cond:
+            return dict(self.counters, waited_s=round(self.counters["waited_s"], 2),
+                        limit=self.limit, max_concurrency=self.max_concurrency,
+                        in_flight=self.in_flight, rpm=self.rpm, tpm=self.tpm)
@@ -0,0 +1,432 @@
+"""
+Analysis jobs: each run gets a job id, its own status/log/event stream, and a
+row in a persistent SQLite queue so queued work survives a restart.
+
+The queue is shared by all worker processes: any of them can queue, list,
+stream or cancel a job, and each job is run by exactly one of them, the one
+that claims it. A process keeps a heartbeat on the jobs it runs; jobs whose
+process stopped beating (crash, restart, deploy) are queued again.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from db import connect
+
+STATUS_FIELDS = ("running", "progress", "total", "current_profile", "finished", "last_run", "error")
+FINAL_STATES = ("done", "error", "cancelled")
+HEARTBEAT_S = 2  # claims renewed, cancellations and queued jobs picked up this often
+POLL_S = 0.5  # streams of jobs run by another process read new events this often
+FLUSH_S = 0.2  # buffered run events are written to the database this often
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class RunEvents:
+    """Append-only event log of one run, consumed by /api/stream.
+
+    Ids keep increasing for the lifetime of the log, so a client's
+    Last-Event-ID stays valid and resuming only sends the missing deltas.
+    Events of queued jobs are also stored in the queue's database, so other
+    processes can stream them: the process running the job wakes its own
+    readers at once, the others poll. They are buffered and written in
+    batches by a background thread, so emitting (once per streamed token,
+    from the event loop on the async engine) never waits on SQLite.
+    """
+    def __init__(self, queue=None, job_id=None, local=True):
+        self._queue, self._job_id, self._local = queue, job_id, local
+        self._cond = threading.Condition()
+        self._events = []
+        self._next_id = queue._last_event_id(job_id) + 1 if queue and local else 1
+
+    def reset(self):
+        with self._cond:
+            self._events = []
+            if self._queue:
+                self._queue._clear_events(self._job_id)
+
+    def emit(self, kind, data):
+        with self._cond:
+            event = (self._next_id, kind, data)
+            if self._queue:
+                self._queue._add_event(self._job_id, event)
+            self._events.append(event)
+            self._next_id += 1
+            self._cond.notify_all()
+
+    def _after(self, last_id):
+        if not self._events:
+            return []
+        return self._events[max(0, last_id - self._events[0][0] + 1):]
+
+    def since(self, last_id, timeout=15):
+        if not self._local:
+            return self._queue._events_since(self._job_id, last_id, timeout)
+        with self._cond:
+            if not self._after(last_id):
+                self._cond.wait(timeout)
+            return self._after(last_id)
+
+
+class Job:
+    def __init__(self, job_id, options=None, state="queued", created_at=None, events=None):
+        self.id = job_id
+        self.options = options or {}
+        self.state = state
+        self.created_at = created_at or time.time()
+        self.started_at = self.finished_at = None
+        self.status = {"running": False, "logs": [], "progress": 0, "total": 0,
+                       "current_profile": "", "finished": False, "last_run": None, "error": None}
+        self.events = events or RunEvents()
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled("Análise cancelada")
+
+    def summary(self):
+        return {"job_id": self.id, "state": self.state, "created_at": self.created_at,
+                "started_at": self.started_at, "finished_at": self.finished_at,
+                "options": self.options, **{k: self.status[k] for k in STATUS_FIELDS}}
+
+
+class JobQueue:
+    """Bounded pool of job workers fed from a persistent queue.
+
+    runner(job) does the work and reports through job.status / job.events.
+    At most max_concurrent jobs run at once across all processes sharing the
+    database; a running job whose process has not renewed its claim for
+    stale_after seconds is queued again (and resumes from its checkpoint).
+    """
+    def __init__(self, db_path, runner, max_concurrent=2, stale_after=60):
+        self.runner = runner
+        self.max_concurrent = max_concurrent
+        self.stale_after = stale_after
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._jobs = {}  # jobs run by this process (and the last few it finished)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = []  # (job_id, id, kind, data) not yet written to job_events
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # held while a batch is on its way to the database
+        self._flusher = None
+        self._dispatcher = None
+        self._pool = ThreadPoolExecutor(max_concurrent, thread_name_prefix="job")
+        self._db = connect(db_path, autocommit=True)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, state TEXT, options TEXT, created_at REAL,
+                started_at REAL, finished_at REAL, report_id TEXT, error TEXT, logs TEXT);
+            CREATE TABLE IF NOT EXISTS job_events (
+                job_id TEXT, id INTEGER, kind TEXT, data TEXT,
+                PRIMARY KEY (job_id, id)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS jobs_state ON jobs(state, created_at);
+        """)
+        columns = {r[1] for r in self._db.execute("PRAGMA table_info(jobs)")}
+        for column in ("owner TEXT", "heartbeat REAL", "cancel_requested INTEGER DEFAULT 0"):
+            if column.split()[0] not in columns:
+                try:
+                    self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column}")
+                except Exception:
+                    pass  # added by another process starting at the same time
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction taken up front: check-then-update sequences in it
+        are atomic across processes"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def start(self):
+        """Start claiming and running queued jobs in this process, including
+        the ones left behind by a process that stopped"""
+        if self._dispatcher is None:
+            self._dispatcher = threading.Thread(target=self._dispatch, name="job-dispatcher", daemon=True)
+            self._dispatcher.start()
+
+    def _dispatch(self):
+        while True:
+            try:
+                self._heartbeat()
+                self._requeue_stale()
+                while True:
+                    job = self._claim()
+                    if job is None:
+                        break
+                    self._pool.submit(self._run, job)
+            except Exception:
+                pass  # database busy for too long: try again on the next beat
+            self._wake.wait(HEARTBEAT_S)
+            self._wake.clear()
+
+    def _heartbeat(self):
+        """Renew this process's claims and pick up cancellations requested
+        through other processes. A job whose claim was lost (it went stale and
+        was queued again) is stopped, so it never runs twice."""
+        with self._lock:
+            mine = [j for j in self._jobs.values() if j.state == "running"]
+        if not mine:
+            return
+        with self._transaction() as db:
+            db.execute("UPDATE jobs SET heartbeat = ? WHERE owner = ? AND state = 'running'",
+                       (time.time(), self.owner))
+            held = dict(db.execute("SELECT id, cancel_requested FROM jobs "
+                                   "WHERE owner = ? AND state = 'running'", (self.owner,)).fetchall())
+        for job in mine:
+            if held.get(job.id, 1):
+                job._cancel.set()
+
+    def _alive(self, owner):
+        """False only when owner is a process of this host that no longer exists"""
+        host, pid, _ = (owner or "::").rsplit(":", 2)
+        if host != socket.gethostname() or not pid.isdigit() or int(pid) == os.getpid():
+            return True
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            pass
+        return True
+
+    def _requeue_stale(self):
+        """Queue again the running jobs of processes that stopped (cancelled
+        ones are just marked so); they resume from their checkpoint"""
+        cutoff = time.time() - self.stale_after
+        with self._transaction() as db:
+            rows = db.execute("SELECT id, options, owner, heartbeat, cancel_requested FROM jobs "
+                              "WHERE state = 'running' AND owner IS NOT ?", (self.owner,)).fetchall()
+            for job_id, options, owner, heartbeat, cancel in rows:
+                if (heartbeat or 0) >= cutoff and self._alive(owner):
+                    continue
+                if cancel:
+                    db.execute("UPDATE jobs SET state = 'cancelled', finished_at = ?, error = ? "
+                               "WHERE id = ?", (time.time(), "Análise cancelada", job_id))
+                    continue
+                options = dict(json.loads(options or "{}"), recovered=True)
+                db.execute("UPDATE jobs SET state = 'queued', owner = NULL, options = ? WHERE id = ?",
+                           (json.dumps(options, ensure_ascii=False), job_id))
+
+    def _claim(self):
+        """Take the oldest queued job if fewer than max_concurrent are running"""
+        now = time.time()
+        with self._transaction() as db:
+            running = db.execute("SELECT COUNT(*) FROM jobs WHERE state = 'running'").fetchone()[0]
+            if running >= self.max_concurrent:
+                return None
+            row = db.execute("SELECT id, options, created_at FROM jobs WHERE state = 'queued' "
+                             "ORDER BY created_at LIMIT 1").fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE jobs SET state = 'running', owner = ?, heartbeat = ?, started_at = ? "
+                       "WHERE id = ?", (self.owner, now, now, row[0]))
+        job = Job(row[0], json.loads(row[1] or "{}"), state="running", created_at=row[2],
+                  events=RunEvents(self, row[0]))
+        job.started_at = now
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    def submit(self, options):
+        job_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._db.execute("INSERT INTO jobs (id, state, options, created_at) VALUES (?, 'queued', ?, ?)",
+                             (job_id, json.dumps(options, ensure_ascii=False), time.time()))
+        self._wake.set()
+        return self.get(job_id)
+
+    def _run(self, job):
+        job.status.update({"running": True, "finished": False})
+        try:
+            self.runner(job)
+        except Exception as e:
+            job.status["error"] = str(e)
+        finally:
+            job.status.update({"running": False, "finished": True})
+            job.state = "cancelled" if job.cancelled else ("error" if job.status["error"] else "done")
+            job.finished_at = time.time()
+            try:
+                # All of its events are stored before it shows as finished, or a
+                # stream in another process could stop before the last ones
+                self._flush()
+            except Exception:
+                pass
+            with self._lock:
+                self._db.execute("UPDATE jobs SET state = ?, finished_at = ?, report_id = ?, error = ?, "
+                                 "logs = ? WHERE id = ? AND owner = ?", (
+                                     job.state, job.finished_at, job.status["last_run"], job.status["error"],
+                                     json.dumps(job.status["logs"], ensure_ascii=False), job.id, self.owner))
+            self._prune()
+            self._wake.set()  # a slot is free
+
+    def _prune(self, keep=20):
+        """Finished jobs are reloaded from the database on demand; only the most
+        recent few stay in memory, and keep their events, for clients still
+        streaming them"""
+        with self._lock:
+            done = sorted((j for j in self._jobs.values() if j.state in FINAL_STATES),
+                          key=lambda j: j.finished_at or 0)
+            for job in done[:-keep]:
+                del self._jobs[job.id]
+            self._db.execute("DELETE FROM job_events WHERE job_id IN (SELECT id FROM jobs WHERE state IN "
+                             "('done', 'error', 'cancelled') ORDER BY finished_at DESC LIMIT -1 OFFSET ?)",
+                             (keep,))
+
+    def cancel(self, job_id):
+        """Cancel a queued job, or have the process running it stop it"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None and job.state == "running":
+            job._cancel.set()
+            return True
+        with self._transaction() as db:
+            row = db.execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row[0] in FINAL_STATES:
+                return False
+            if row[0] == "running":
+                db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+            else:
+                db.execute("UPDATE jobs SET state = 'cancelled', finished_at = ?, error = ? WHERE id = ?",
+                           (time.time(), "Análise cancelada", job_id))
+        if row[0] == "queued":
+            job = self.get(job_id)
+            RunEvents(self, job_id).emit("status", {k: job.status[k] for k in STATUS_FIELDS})
+            self._flush()
+        return True
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return job
+            row = self._db.execute("SELECT id, state, options, created_at, started_at, finished_at, "
+                                   "report_id, error, logs FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._from_row(row) if row else None
+
+    def state(self, job_id):
+        """A job's state alone, cheap enough to poll"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return job.state
+            row = self._db.execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def _from_row(self, row):
+        """A read-only view of a job this process isn't running"""
+        job = Job(row[0], json.loads(row[2] or "{}"), state=row[1], created_at=row[3],
+                  events=RunEvents(self, row[0], local=False))
+        job.started_at, job.finished_at = row[4], row[5]
+        # Its latest status, and for a job that is queued or running in another
+        # process its logs so far, are in its events
+        kinds = ("status",) if row[1] in FINAL_STATES else ("status", "log")
+        with self._lock:
+            rows = self._db.execute(f"SELECT kind, data FROM job_events WHERE job_id = ? AND "
+                                    f"kind IN ({', '.join('?' * len(kinds))}) ORDER BY id",
+                                    (row[0], *kinds)).fetchall()
+        for kind, data in rows:
+            if kind == "log":
+                job.status["logs"].append(json.loads(data))
+            else:
+                job.status.update(json.loads(data))
+        if row[1] in FINAL_STATES:
+            job.status.update({"last_run": row[6], "error": row[7], "logs": json.loads(row[8] or "[]"),
+                               "running": False, "finished": True})
+        else:
+            job.status["running"] = row[1] == "running"
+        return job
+
+    def _add_event(self, job_id, event):
+        with self._pending_lock:
+            self._pending.append((job_id, *event))
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="job-events", daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_S)
+            try:
+                self._flush()
+            except Exception:
+                pass  # database busy for too long: written with the next batch
+
+    def _flush(self):
+        with self._flush_lock:
+            with self._pending_lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return
+            try:
+                with self._transaction() as db:
+                    db.executemany("INSERT OR REPLACE INTO job_events VALUES (?, ?, ?, ?)",
+                                   [(job_id, event_id, kind, json.dumps(data, ensure_ascii=False))
+                                    for job_id, event_id, kind, data in rows])
+            except Exception:
+                with self._pending_lock:
+                    self._pending[:0] = rows
+                raise
+
+    def _clear_events(self, job_id):
+        with self._flush_lock:
+            with self._pending_lock:
+                self._pending = [r for r in self._pending if r[0] != job_id]
+            with self._lock:
+                self._db.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+
+    def _last_event_id(self, job_id):
+        with self._flush_lock:
+            with self._pending_lock:
+                pending = max((r[1] for r in self._pending if r[0] == job_id), default=0)
+            with self._lock:
+                row = self._db.execute("SELECT MAX(id) FROM job_events WHERE job_id = ?", (job_id,)).fetchone()
+        return max(row[0] or 0, pending)
+
+    def _events_since(self, job_id, last_id, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                rows = self._db.execute("SELECT id, kind, data FROM job_events WHERE job_id = ? AND id > ? "
+                                        "ORDER BY id", (job_id, last_id)).fetchall()
+            if rows or time.monotonic() >= deadline:
+                return [(event_id, kind, json.loads(data)) for event_id, kind, data in rows]
+            time.sleep(POLL_S)
+
+    def latest(self):
+        with self._lock:
+            row = self._db.execute("SELECT id FROM jobs ORDER BY created_at DESC LIMIT 1").fetchone()
+        return self.get(row[0]) if row else None
+
+    def active(self):
+        """Jobs this process is running"""
+        with self._lock:
+            return [j for j in self._jobs.values() if j.state in ("queued", "running")]
+
+    def running_ids(self):
+        """Ids of the jobs running in any process"""
+        with self._lock:
+            return {r[0] for r in self._db.execute("SELECT id FROM jobs WHERE state = 'running'")}
+
+    def list(self, limit=50):
+        with self._lock:
+            ids = [r[0] for r in self._db.execute(
+                "SELECT id FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,))]
+        return [self.get(job_id).summary() for job_id in ids]
@@ -0,0 +1,75 @@
+"""
+Content-addressed cache of model responses, stored in a local SQLite file.
+Entries are keyed by sha256(model, max_tokens, prompt) and evicted LRU once
+the stored text exceeds max_bytes.
+"""
+
+import hashlib
+import threading
+import time
+from pathlib import Path
+
+from db import connect
+
+
+class LLMCache:
+    def __init__(self, path, max_bytes=50 * 1024 * 1024):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._db = connect(self.path)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY, model TEXT, text TEXT, size INTEGER,
+            created_at REAL, last_used REAL)""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(last_used)")
+        self._db.commit()
+
+    @staticmethod
+    def key(model, max_tokens, prompt):
+        h = hashlib.sha256()
+        for part in (model, str(max_tokens), prompt):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT text FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self.counters["hits"] += 1
+            return row[0]
+
+    def put(self, key, model, text):
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                             (key, model, text, len(text.encode("utf-8")), now, now))
+            self.counters["stores"] += 1
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            while total > self.max_bytes:
+                row = self._db.execute(
+                    "SELECT key, size FROM responses ORDER BY last_used LIMIT 1").fetchone()
+                if row is None or row[0] == key:
+                    break
+                self._db.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+                self.counters["evictions"] += 1
+                total -= row[1]
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return dict(self.counters, entries=entries, bytes=size, max_bytes=self.max_bytes,
+                        hit_rate=round(self.counters["hits"] / lookups, 3) if lookups else None)
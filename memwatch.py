@@ -0,0 +1,46 @@
+"""
+Process memory (resident set size) sampling, for the peak RSS of a run.
+
+The RSS is the whole worker's, so with concurrent jobs a run's figures
+include the others' memory too.
+"""
+
+import os
+import threading
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # No /proc: fall back to the process-lifetime peak (KB on Linux, bytes on macOS)
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakRSS:
+    """Samples the RSS every `interval` seconds on a daemon thread until stop()"""
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.start_bytes = self.peak_bytes = rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+        self._thread.start()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_bytes = max(self.peak_bytes, rss_bytes())
+
+    def stop(self):
+        """{"start_mb", "peak_mb", "end_mb"}"""
+        self._stop.set()
+        self._thread.join()
+        end = rss_bytes()
+        self.peak_bytes = max(self.peak_bytes, end)
+        mb = 1024 * 1024
+        return {"start_mb": round(self.start_bytes / mb, 1), "peak_mb": round(self.peak_bytes / mb, 1),
+                "end_mb": round(end / mb, 1)}
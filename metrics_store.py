@@ -0,0 +1,117 @@
+"""
+Time series of profile and post metrics across runs, in SQLite.
+
+A run appends only what it fetched itself, stamped with the fetch time: one
+snapshot per profile scraped (followers, following, posts) and one per post
+fetched (likes, comments, video views). Layers served from the scrape cache
+were recorded by the run that fetched them. The run's post averages are
+rolled up into the profile snapshot as it is written, so trend
+queries are one primary-key range read per profile over narrow rows and never
+touch report files or the per-post history.
+"""
+
+import threading
+import time
+
+from db import connect
+from scrape_cache import post_key
+
+
+class MetricsStore:
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._db = connect(path)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS profile_snapshots (
+                username TEXT, ts REAL, run_id TEXT, followers INTEGER,
+                following INTEGER, posts_count INTEGER, posts_sampled INTEGER,
+                avg_engagement REAL, avg_views REAL,
+                PRIMARY KEY (username, ts)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS post_snapshots (
+                username TEXT, run_id TEXT, post TEXT, posted_at TEXT,
+                likes INTEGER, comments INTEGER, views INTEGER,
+                PRIMARY KEY (username, run_id, post)) WITHOUT ROWID;
+        """)
+
+    def record(self, run_id, username, profile, posts, ts=None):
+        ts = ts or time.time()
+        username = username.lower()
+        rows = [(username, run_id, post_key(p), str(p.get("timestamp") or "")[:19],
+                 p.get("likesCount") or 0, p.get("commentsCount") or 0, p.get("videoViewCount"))
+                for p in posts if post_key(p)]
+        views = [r[6] for r in rows if r[6] is not None]
+        with self._lock:
+            if profile is not None:  # None: only posts were fetched
+                self._db.execute("INSERT OR REPLACE INTO profile_snapshots VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", (
+                    username, ts, run_id, profile.get("followersCount") or 0,
+                    profile.get("followsCount") or 0, profile.get("postsCount") or 0, len(rows),
+                    sum(r[4] + r[5] for r in rows) / len(rows) if rows else None,
+                    sum(views) / len(views) if views else None))
+            self._db.executemany("INSERT OR REPLACE INTO post_snapshots VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._db.commit()
+
+    def series(self, usernames=None, runs=10):
+        """{username: [{ts, followers, avg_engagement, avg_views, posts}, ...]} oldest first,
+        at most `runs` snapshots per profile"""
+        with self._lock:
+            if not usernames:
+                usernames = [u for (u,) in self._db.execute("SELECT DISTINCT username FROM profile_snapshots")]
+            rows = []
+            for username in usernames:
+                # Primary-key seek: the newest `runs` rows of one profile
+                rows += reversed(self._db.execute(
+                    "SELECT username, ts, followers, avg_engagement, avg_views, posts_sampled "
+                    "FROM profile_snapshots WHERE username = ? ORDER BY ts DESC LIMIT ?",
+                    (username.lower(), runs)).fetchall())
+        out = {}
+        for username, ts, followers, avg_eng, avg_views, n in rows:
+            out.setdefault(username, []).append({
+                "ts": ts, "followers": followers, "avg_engagement": avg_eng,
+                "avg_views": avg_views, "posts": n})
+        return out
+
+    def trends(self, usernames=None, runs=10, top=5):
+        """Follower growth, engagement-rate trend and top movers over the last `runs` runs"""
+        profiles = {}
+        for username, points in self.series(usernames, runs).items():
+            first, last = points[0], points[-1]
+            days = max((last["ts"] - first["ts"]) / 86400, 0)
+            rates = [(p["ts"], p["avg_engagement"] / p["followers"] * 100)
+                     for p in points if p["avg_engagement"] is not None and p["followers"]]
+            growth = last["followers"] - first["followers"]
+            profiles[username] = {
+                "runs": len(points), "days": round(days, 1),
+                "followers": last["followers"], "followers_growth": growth,
+                "followers_growth_pct": round(growth / first["followers"] * 100, 2)
+                if first["followers"] else None,
+                "followers_per_day": round(growth / days, 1) if days else None,
+                "engagement_rate": round(rates[-1][1], 3) if rates else None,
+                "engagement_rate_change": round(rates[-1][1] - rates[0][1], 3) if len(rates) > 1 else None,
+                "engagement_trend_per_30d": _slope(rates, 30 * 86400),
+                "series": [dict(p, engagement_rate=round(p["avg_engagement"] / p["followers"] * 100, 3)
+                                if p["avg_engagement"] is not None and p["followers"] else None)
+                           for p in points],
+            }
+
+        def movers(field):
+            ranked = sorted((u for u in profiles if profiles[u][field] is not None),
+                            key=lambda u: profiles[u][field], reverse=True)
+            return [{"username": u, field: profiles[u][field]} for u in ranked[:top]]
+
+        return {"runs": runs, "profiles": profiles, "top_movers": {
+            "followers_growth_pct": movers("followers_growth_pct"),
+            "engagement_rate_change": movers("engagement_rate_change"),
+        }}
+
+
+def _slope(points, unit):
+    """Least-squares slope of (ts, value) points, per `unit` seconds"""
+    if len(points) < 2:
+        return None
+    n = len(points)
+    mx = sum(t for t, _ in points) / n
+    my = sum(v for _, v in points) / n
+    var = sum((t - mx) ** 2 for t, _ in points)
+    if not var:
+        return None
+    return round(sum((t - mx) * (v - my) for t, v in points) / var * unit, 4)
@@ -0,0 +1,186 @@
+"""
+PDF export of a report, laid out in independent sections (cover and profile
+table, executive summary, own profile, competitors a few at a time, content
+plan). Each section starts on a new page and is laid out on its own, so they
+can be rendered in parallel, in worker processes; merge() puts the pages back
+together in order and stamps the page numbers, which need the total count.
+
+Only plain data goes in and out of the workers (section dicts, PDF bytes),
+and this module doesn't import app, so a worker never loads the app itself.
+"""
+
+import io
+from functools import lru_cache
+
+COMPETITORS_PER_SECTION = 4
+
+
+def sections(r, per_section=COMPETITORS_PER_SECTION):
+    analyses = r.get("analyses", [])
+    own = next((a for a in analyses if a["type"] == "own"), None)
+    comps = [a for a in analyses if a["type"] == "competitor"]
+    out = [{"kind": "cover", "run_date_br": r.get("run_date_br", ""), "my_niche": r.get("my_niche", ""),
+            "my_profile": r.get("config", {}).get("my_profile", ""),
+            "rows": [[f"@{a['username']}", "Meu Perfil" if a["type"] == "own" else "Concorrente",
+                      str(a.get("followers", 0)), (a.get("detected_niche") or "")[:40]] for a in analyses]},
+           {"kind": "text", "title": "RELATORIO EXECUTIVO", "text": r.get("executive_summary", "")}]
+    if own:
+        out.append({"kind": "profiles", "title": "ANALISE DO MEU PERFIL", "analyses": [own], "rule": False})
+    for i in range(0, len(comps), per_section):
+        out.append({"kind": "profiles", "title": "ANALISE DOS CONCORRENTES" if i == 0 else None,
+                    "analyses": comps[i:i + per_section], "rule": True})
+    out.append({"kind": "text", "title": "PLANO DE CONTEUDO - 4 SEMANAS", "text": r.get("content_plan", "")})
+    return out
+
+
+@lru_cache(maxsize=1)
+def _styles():
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.styles import ParagraphStyle
+
+    AMBER = colors.HexColor("#e8a020")
+    GREEN = colors.HexColor("#22c97a")
+    MID   = colors.HexColor("#7aaa94")
+    LIGHT = colors.HexColor("#d8ede6")
+    return {
+        "amber": AMBER, "mid": MID, "light": LIGHT,
+        "dark": colors.HexColor("#0f1822"), "dark2": colors.HexColor("#162420"),
+        "rule": colors.HexColor("#1e3028"),
+        "title": ParagraphStyle("title", fontName="Helvetica-Bold", fontSize=32,
+            textColor=AMBER, spaceAfter=8, alignment=TA_CENTER, leading=36),
+        "sub": ParagraphStyle("sub", fontName="Helvetica", fontSize=13,
+            textColor=MID, spaceAfter=6, alignment=TA_CENTER),
+        "section": ParagraphStyle("section", fontName="Helvetica-Bold", fontSize=15,
+            textColor=AMBER, spaceBefore=18, spaceAfter=8, leading=18),
+        "tag": ParagraphStyle("tag", fontName="Helvetica-Bold", fontSize=11,
+            textColor=GREEN, spaceBefore=14, spaceAfter=6),
+        "body": ParagraphStyle("body", fontName="Helvetica", fontSize=9.5,
+            textColor=LIGHT, spaceAfter=4, leading=14),
+    }
+
+
+def _safe(text):
+    return (text or "").replace("&","&amp;").replace("<","&lt;").replace(">","&gt;")
+
+
+def _story(section):
+    from reportlab.lib import colors
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Paragraph, Spacer, HRFlowable, Table, TableStyle
+
+    st = _styles()
+
+    def hr():
+        return HRFlowable(width="100%", thickness=0.5, color=st["rule"], spaceAfter=10, spaceBefore=6)
+
+    def text_blocks(text, style):
+        return [Paragraph(_safe(line.strip()), style) for line in (text or "").splitlines() if line.strip()]
+
+    def section_header(title):
+        return [Paragraph(title, st["section"]), hr()] if title else []
+
+    def profile_block(a):
+        badge = "MEU PERFIL" if a["type"] == "own" else "CONCORRENTE"
+        tag = f"[{badge}] @{a['username']}  -  {a.get('followers', 0)} seguidores  -  {a.get('detected_niche', '')}"
+        return [Paragraph(_safe(tag), st["tag"])] + text_blocks(a.get("analysis", ""), st["body"]) \
+            + [Spacer(1, 8)]
+
+    kind = section["kind"]
+    if kind == "text":
+        return section_header(section["title"]) + text_blocks(section["text"], st["body"])
+    if kind == "profiles":
+        story = section_header(section["title"])
+        for a in section["analyses"]:
+            story += profile_block(a)
+            if section["rule"]:
+                story.append(hr())
+        return story
+
+    story = [
+        Spacer(1, 3*cm),
+        Paragraph("IG INTELLIGENCE", st["title"]),
+        Paragraph("Relatorio de Inteligencia Competitiva", st["sub"]),
+        Spacer(1, 0.5*cm),
+        Paragraph(f"Gerado em {section['run_date_br']}", st["sub"]),
+        Paragraph(f"Perfil: @{section['my_profile']}   -   Nicho: {section['my_niche']}", st["sub"]),
+        Spacer(1, 1*cm),
+    ]
+    t = Table([["Perfil", "Tipo", "Seguidores", "Nicho"]] + section["rows"],
+              colWidths=[4*cm, 3*cm, 3*cm, 7*cm])
+    t.setStyle(TableStyle([
+        ("BACKGROUND",  (0,0), (-1,0),  st["amber"]),
+        ("TEXTCOLOR",   (0,0), (-1,0),  colors.black),
+        ("FONTNAME",    (0,0), (-1,0),  "Helvetica-Bold"),
+        ("FONTSIZE",    (0,0), (-1,-1), 9),
+        ("BACKGROUND",  (0,1), (-1,-1), st["dark"]),
+        ("TEXTCOLOR",   (0,1), (-1,-1), st["light"]),
+        ("ROWBACKGROUNDS", (0,1), (-1,-1), [st["dark"], st["dark2"]]),
+        ("GRID",        (0,0), (-1,-1), 0.4, st["rule"]),
+        ("TOPPADDING",  (0,0), (-1,-1), 5),
+        ("BOTTOMPADDING",(0,0),(-1,-1), 5),
+        ("LEFTPADDING", (0,0), (-1,-1), 6),
+    ]))
+    story.append(t)
+    return story
+
+
+def render_section(section):
+    """PDF bytes of one section, without page numbers"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate
+
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=A4, leftMargin=2*cm, rightMargin=2*cm,
+                            topMargin=2*cm, bottomMargin=2*cm)
+    doc.build(_story(section))
+    return buf.getvalue()
+
+
+def merge(chunks, out):
+    """Write the sections' PDFs as one document, with page numbers, into out;
+    returns the page count.
+
+    The footers are added to each page as one more small content stream
+    instead of with merge_page(), which would decode and rewrite every
+    page's own stream (several times slower, and larger output)."""
+    from pypdf import PdfReader, PdfWriter
+    from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    def stream(data):
+        obj = DecodedStreamObject()
+        obj.set_data(data)
+        return writer._add_object(obj)
+
+    writer = PdfWriter()
+    for chunk in chunks:
+        writer.append(PdfReader(io.BytesIO(chunk)))
+    total = len(writer.pages)
+    font = DictionaryObject({NameObject("/Type"): NameObject("/Font"), NameObject("/Subtype"): NameObject("/Type1"),
+                             NameObject("/BaseFont"): NameObject("/Helvetica"),
+                             NameObject("/Encoding"): NameObject("/WinAnsiEncoding")})
+    save_state = stream(b"q\n")
+    r, g, b = _styles()["mid"].rgb()
+    for n, page in enumerate(writer.pages, 1):
+        text = f"{n} / {total}"
+        x = (A4[0] - stringWidth(text, "Helvetica", 8)) / 2
+        footer = stream(f"Q\nBT /PageNo 8 Tf {r:.3f} {g:.3f} {b:.3f} rg {x:.2f} {1*cm:.2f} Td ({text}) Tj ET\n"
+                        .encode())
+        contents = page.raw_get("/Contents")  # the reference, not a copy of the stream
+        contents = list(contents) if isinstance(contents, ArrayObject) else [contents]
+        page[NameObject("/Contents")] = ArrayObject([save_state, *contents, footer])
+        fonts = page["/Resources"].setdefault(NameObject("/Font"), DictionaryObject())
+        fonts.get_object()[NameObject("/PageNo")] = font
+    writer.write(out)
+    return total
+
+
+def render(r, out, map=map):
+    """Lay out a report as PDF into the binary file object out; returns the page
+    count. Sections are rendered through map (an executor's, to spread them
+    over processes)."""
+    return merge(map(render_section, sections(r)), out)
@@ -0,0 +1,102 @@
+"""
+Token-budgeted prompt packing: estimate tokens, rank posts by engagement and
+recency, and fill a per-call budget with a compact one-line-per-post format.
+
+Token counts are estimated locally (no API round-trip). The estimate is
+calibrated against the input_tokens the API reports for each real call.
+"""
+
+import json
+import re
+import threading
+from datetime import datetime, timezone
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_calibration = {"ratio": 1.3, "samples": 0}
+_calibration_lock = threading.Lock()
+
+
+def estimate_tokens(text):
+    """Approximate model tokens: regex word/punctuation pieces × a calibrated ratio"""
+    return int(len(_TOKEN_RE.findall(text or "")) * _calibration["ratio"]) + 1
+
+def calibrate(text, actual_tokens):
+    """Fold a real input_tokens count into the estimator (exponential moving average)"""
+    pieces = len(_TOKEN_RE.findall(text or ""))
+    if pieces < 50 or not actual_tokens:
+        return
+    with _calibration_lock:
+        observed = actual_tokens / pieces
+        weight = 0.2 if _calibration["samples"] else 1.0
+        _calibration["ratio"] += weight * (observed - _calibration["ratio"])
+        _calibration["samples"] += 1
+
+def compact_json(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+def _parse_ts(value):
+    try:
+        ts = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+def engagement(post):
+    return (post.get("likesCount") or 0) + (post.get("commentsCount") or 0)
+
+def rank_posts(posts, half_life_days=30, now=None):
+    """Highest engagement first, with engagement halved every half_life_days of age"""
+    now = now or datetime.now(timezone.utc)
+    def score(post):
+        ts = _parse_ts(post.get("timestamp"))
+        age = max((now - ts).total_seconds() / 86400, 0) if ts else half_life_days
+        return engagement(post) * 0.5 ** (age / half_life_days)
+    return sorted(posts, key=score, reverse=True)
+
+def post_line(post, caption_chars):
+    caption = " ".join((post.get("caption") or "").split())
+    if len(caption) > caption_chars:
+        caption = caption[:caption_chars].rsplit(" ", 1)[0] + "…"
+    tags = " ".join(f"#{h}" for h in (post.get("hashtags") or [])[:8])
+    return (f"{str(post.get('timestamp', ''))[:10]} | {post.get('type', '')} | "
+            f"{post.get('likesCount') or 0} likes | {post.get('commentsCount') or 0} coment. | "
+            f"{tags} | {caption}")
+
+def pack_posts(posts, budget_tokens, caption_chars=400, min_caption_chars=80):
+    """Best-ranked posts that fit the budget, one compact line each, oldest first.
+    Captions are shortened (down to min_caption_chars) before a post is dropped."""
+    header = "data | tipo | likes | comentários | hashtags | legenda"
+    used = estimate_tokens(header)
+    chosen = []
+    for post in rank_posts(posts):
+        for chars in (caption_chars, caption_chars // 2, min_caption_chars):
+            line = post_line(post, chars)
+            cost = estimate_tokens(line)
+            if used + cost <= budget_tokens:
+                chosen.append((str(post.get("timestamp", "")), line))
+                used += cost
+                break
+        else:
+            break
+    chosen.sort()
+    return "\n".join([header] + [line for _, line in chosen]), len(chosen), used
+
+def fit_text(text, budget_tokens):
+    """Cut text at a line boundary so it fits budget_tokens"""
+    if estimate_tokens(text) <= budget_tokens:
+        return text
+    kept, used = [], 0
+    for line in (text or "").splitlines():
+        cost = estimate_tokens(line)
+        if used + cost > budget_tokens:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept) + "\n[…]"
+
+def pack_analyses(items, text_field, budget_tokens):
+    """Split the budget evenly across items and fit each item's text into its share"""
+    if not items:
+        return items
+    share = max(budget_tokens // len(items), 50)
+    return [dict(item, **{text_field: fit_text(item[text_field], share)}) for item in items]
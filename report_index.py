@@ -0,0 +1,121 @@
+"""
+SQLite index of the report headers stored in REPORTS_DIR, so listing reports
+never has to open and parse the (large) report files themselves.
+"""
+
+import json
+import threading
+
+from db import connect
+
+
+class ReportIndex:
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._db = connect(path)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS reports (
+                id TEXT PRIMARY KEY, run_date TEXT, run_date_br TEXT,
+                profiles_analyzed INTEGER, my_niche TEXT, my_profile TEXT,
+                competitors TEXT);
+            CREATE INDEX IF NOT EXISTS reports_profile ON reports(my_profile);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+
+    @property
+    def version(self):
+        """Bumped on every change by any worker process (the ETag of report lists)"""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return int(row[0]) if row else 0
+
+    @staticmethod
+    def header(report):
+        cfg = report.get("config", {})
+        return {
+            "id": report["id"], "run_date_br": report.get("run_date_br", report["id"]),
+            "profiles_analyzed": report.get("profiles_analyzed", 0),
+            "my_niche": report.get("my_niche", ""),
+            "my_profile": cfg.get("my_profile", ""),
+            "competitors": cfg.get("competitors", []),
+        }
+
+    def _upsert(self, report):
+        h = self.header(report)
+        self._db.execute("INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?, ?, ?)", (
+            h["id"], report.get("run_date", ""), h["run_date_br"], h["profiles_analyzed"],
+            h["my_niche"], h["my_profile"], json.dumps(h["competitors"], ensure_ascii=False)))
+
+    def _bump(self):
+        self._db.execute("INSERT INTO meta VALUES ('version', '1') ON CONFLICT(key) "
+                         "DO UPDATE SET value = CAST(value AS INTEGER) + 1")
+        self._db.commit()
+
+    def add(self, report):
+        with self._lock:
+            self._upsert(report)
+            self._bump()
+
+    def remove(self, report_id):
+        with self._lock:
+            self._db.execute("DELETE FROM reports WHERE id = ?", (report_id,))
+            self._bump()
+
+    def sync(self, load, on_disk):
+        """Index the report ids in on_disk that are missing from the index, and
+        drop rows whose report is gone. Only new reports are parsed (via load)."""
+        with self._lock:
+            indexed = {r[0] for r in self._db.execute("SELECT id FROM reports")}
+            changed = False
+            for report_id in on_disk - indexed:
+                try:
+                    self._upsert(load(report_id))
+                    changed = True
+                except Exception:
+                    pass
+            for report_id in indexed - on_disk:
+                self._db.execute("DELETE FROM reports WHERE id = ?", (report_id,))
+                changed = True
+            if changed:
+                self._bump()
+
+    def query_one(self, report_id):
+        with self._lock:
+            r = self._db.execute(
+                "SELECT id, run_date_br, profiles_analyzed, my_niche, my_profile, competitors "
+                "FROM reports WHERE id = ?", (report_id,)).fetchone()
+        if r is None:
+            return {}
+        return {"id": r[0], "run_date_br": r[1], "profiles_analyzed": r[2], "my_niche": r[3],
+                "my_profile": r[4], "competitors": json.loads(r[5] or "[]")}
+
+    def latest_ids(self, limit):
+        """Ids of the newest reports by run time (ids of same-minute runs carry a suffix)"""
+        with self._lock:
+            return [r[0] for r in self._db.execute(
+                "SELECT id FROM reports ORDER BY run_date DESC, id DESC LIMIT ?", (limit,))]
+
+    def query(self, profile=None, niche=None, date_from=None, date_to=None, limit=None, offset=0):
+        where, args = [], []
+        if profile:
+            profile = profile.lstrip("@")
+            where.append("(my_profile = ? OR competitors LIKE ?)")
+            args += [profile, f'%"{profile}"%']
+        if niche:
+            where.append("my_niche LIKE ?")
+            args.append(f"%{niche}%")
+        if date_from:
+            where.append("substr(run_date, 1, 10) >= ?")
+            args.append(date_from)
+        if date_to:
+            where.append("substr(run_date, 1, 10) <= ?")
+            args.append(date_to)
+        sql_where = f" WHERE {' AND '.join(where)}" if where else ""
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM reports{sql_where}", args).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT id, run_date_br, profiles_analyzed, my_niche, my_profile, competitors "
+                f"FROM reports{sql_where} ORDER BY id DESC LIMIT ? OFFSET ?",
+                args + [-1 if limit is None else limit, offset]).fetchall()
+        return [{"id": r[0], "run_date_br": r[1], "profiles_analyzed": r[2], "my_niche": r[3],
+                 "my_profile": r[4], "competitors": json.loads(r[5] or "[]")} for r in rows], total
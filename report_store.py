@@ -0,0 +1,223 @@
+"""
+Split, gzip-compressed report storage.
+
+Each report is a directory REPORTS_DIR/<id>/ with a small header (metadata,
+timing, per-profile stats, without any long text) and one file per large
+text section: the content plan, the executive summary and every profile
+analysis. Every file is the gzip of the JSON body its API endpoint returns,
+so a section can be sent to a gzip-accepting client without re-encoding.
+
+A running analysis writes into a ReportDraft (REPORTS_DIR/.<key>.draft/):
+each profile analysis is stored as soon as it is finished, and the draft is
+published under the report id when the run completes.
+
+Reports written before this format (REPORTS_DIR/<id>.json, pretty-printed)
+are still read, and `migrate` converts them.
+"""
+
+import gzip
+import json
+import os
+import shutil
+from pathlib import Path
+
+TEXT_SECTIONS = ("content_plan", "executive_summary")
+HEADER = "header"
+
+
+def encode_json(data, level=6):
+    """Compact JSON, gzip-compressed (mtime=0 so equal data gives equal bytes)"""
+    return gzip.compress(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+                         compresslevel=level, mtime=0)
+
+def _decode(raw):
+    return json.loads(gzip.decompress(raw))
+
+
+class ReportStore:
+    def __init__(self, root):
+        self.root = Path(root)
+
+    @staticmethod
+    def _check_id(report_id):
+        if not report_id or "/" in report_id or "\\" in report_id or report_id.startswith("."):
+            raise FileNotFoundError(report_id)
+
+    def _dir(self, report_id):
+        self._check_id(report_id)
+        return self.root / report_id
+
+    def _name(self, section):
+        if section.startswith("analysis/"):
+            username = section.split("/", 1)[1]
+            self._check_id(username)
+            return f"analysis-{username.lower()}.json.gz"
+        if section in TEXT_SECTIONS or section == HEADER:
+            return f"{section}.json.gz"
+        raise FileNotFoundError(section)
+
+    def _file(self, report_id, section):
+        return self._dir(report_id) / self._name(section)
+
+    def legacy_path(self, report_id):
+        self._check_id(report_id)
+        return self.root / f"{report_id}.json"
+
+    def exists(self, report_id):
+        return self._file(report_id, HEADER).exists() or self.legacy_path(report_id).exists()
+
+    def ids(self):
+        split = {p.parent.name for p in self.root.glob(f"*/{HEADER}.json.gz")
+                 if not p.parent.name.startswith(".")}  # skip half-written .tmp/.old dirs
+        return split | {p.stem for p in self.root.glob("*.json")}
+
+    def mtime(self, report_id):
+        path = self._file(report_id, HEADER)
+        return (path if path.exists() else self.legacy_path(report_id)).stat().st_mtime
+
+    def save(self, report):
+        """Write all files into a temporary directory and swap it in whole;
+        returns the bytes written"""
+        report_id = report["id"]
+        files = {}
+        header = {k: v for k, v in report.items() if k not in TEXT_SECTIONS}
+        header["analyses"] = []
+        for section in TEXT_SECTIONS:
+            files[section] = encode_json({section: report.get(section, "")})
+        for a in report.get("analyses", []):
+            section = f"analysis/{a['username']}"
+            files[section] = encode_json({"username": a["username"], "analysis": a.get("analysis", "")})
+            header["analyses"].append({k: v for k, v in a.items() if k != "analysis"})
+        header["sections"] = {s: len(raw) for s, raw in files.items()}
+        files[HEADER] = encode_json(header)
+
+        tmp = self.root / f".{report_id}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        for section, raw in files.items():
+            (tmp / self._name(section)).write_bytes(raw)
+        self._publish(report_id, tmp)
+        return sum(len(raw) for raw in files.values())
+
+    def _publish(self, report_id, tmp):
+        """Swap a fully written directory in as the report"""
+        final = self._dir(report_id)
+        old = self.root / f".{report_id}.old"
+        if final.exists():
+            os.replace(final, old)
+        os.replace(tmp, final)
+        shutil.rmtree(old, ignore_errors=True)
+        self.legacy_path(report_id).unlink(missing_ok=True)
+
+    def draft(self, key):
+        return ReportDraft(self, key)
+
+    def remove_drafts(self, keep=()):
+        """Drop drafts left by runs that never finished (their checkpoints rebuild
+        them), except those of the runs in keep, still going in another process"""
+        for path in self.root.glob(".*.draft"):
+            if path.name[1:-len(".draft")] not in keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def raw(self, report_id, section):
+        """Stored gzip bytes of a section (or the header)"""
+        path = self._file(report_id, section)
+        if not path.exists():
+            if self.legacy_path(report_id).exists():
+                return encode_json(self._legacy_section(report_id, section))
+            raise FileNotFoundError(section)
+        return path.read_bytes()
+
+    def read(self, report_id, section):
+        return _decode(self.raw(report_id, section))
+
+    def header(self, report_id):
+        return self.read(report_id, HEADER)
+
+    def load(self, report_id):
+        """The whole report, as originally saved"""
+        if not self._file(report_id, HEADER).exists():
+            return json.loads(self.legacy_path(report_id).read_text(encoding="utf-8"))
+        report = self.header(report_id)
+        report.pop("sections", None)
+        for section in TEXT_SECTIONS:
+            report[section] = self.read(report_id, section)[section]
+        for a in report["analyses"]:
+            a["analysis"] = self.read(report_id, f"analysis/{a['username']}")["analysis"]
+        return report
+
+    def _legacy_section(self, report_id, section):
+        report = json.loads(self.legacy_path(report_id).read_text(encoding="utf-8"))
+        if section == HEADER:
+            header = {k: v for k, v in report.items() if k not in TEXT_SECTIONS}
+            header["analyses"] = [{k: v for k, v in a.items() if k != "analysis"}
+                                  for a in report.get("analyses", [])]
+            return header
+        if section in TEXT_SECTIONS:
+            return {section: report.get(section, "")}
+        username = section.split("/", 1)[1].lower()
+        for a in report.get("analyses", []):
+            if a["username"].lower() == username:
+                return {"username": a["username"], "analysis": a.get("analysis", "")}
+        raise FileNotFoundError(section)
+
+    def migrate(self, report_id):
+        """Rewrite a legacy <id>.json report in the split format; returns (old, new) bytes"""
+        path = self.legacy_path(report_id)
+        before = path.stat().st_size
+        self.save(json.loads(path.read_text(encoding="utf-8")))
+        after = sum(f.stat().st_size for f in self._dir(report_id).iterdir())
+        return before, after
+
+    def legacy_ids(self):
+        return sorted(p.stem for p in self.root.glob("*.json"))
+
+
+class ReportDraft:
+    """A report being written while its run progresses. Analyses go to their
+    section files as they finish, so the run only keeps their header entries
+    in memory; commit() adds the header and the remaining text sections."""
+
+    def __init__(self, store, key):
+        store._check_id(key)
+        self.store = store
+        self.dir = store.root / f".{key}.draft"
+        shutil.rmtree(self.dir, ignore_errors=True)
+        self.dir.mkdir(parents=True)
+        self.sizes = {}
+
+    def _write(self, section, data):
+        raw = encode_json(data)
+        path = self.dir / self.store._name(section)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(raw)
+        os.replace(tmp, path)
+        self.sizes[section] = len(raw)
+
+    def add_analysis(self, entry):
+        """Store an analysis; returns its header entry (everything but the text)"""
+        self._write(f"analysis/{entry['username']}",
+                    {"username": entry["username"], "analysis": entry.get("analysis", "")})
+        return {k: v for k, v in entry.items() if k != "analysis"}
+
+    def analysis(self, username):
+        return _decode((self.dir / self.store._name(f"analysis/{username}")).read_bytes())["analysis"]
+
+    def commit(self, report):
+        """Publish the report; its "analyses" are the header entries of the
+        analyses added to the draft, and it carries the text sections.
+        Returns the size of the report's files."""
+        for section in TEXT_SECTIONS:
+            self._write(section, {section: report.get(section, "")})
+        header = {k: v for k, v in report.items() if k not in TEXT_SECTIONS}
+        header["analyses"] = [{k: v for k, v in a.items() if k != "analysis"}
+                              for a in report.get("analyses", [])]
+        header["sections"] = {s: self.sizes[s] for s in TEXT_SECTIONS}
+        header["sections"].update((f"analysis/{a['username']}", self.sizes[f"analysis/{a['username']}"])
+                                  for a in header["analyses"])
+        self._write(HEADER, header)
+        self.store._publish(report["id"], self.dir)
+        return sum(self.sizes.values())
+
+    def discard(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
@@ -0,0 +1,122 @@
+"""
+On-disk cache of scraped Instagram profiles and posts, one JSON file per username.
+Profile stats and posts are cached as separate layers with their own TTL.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+
+def post_key(post):
+    return post.get("id") or post.get("shortCode") or post.get("url")
+
+# Fields of the Apify items that are actually used (prompts, analytics,
+# metrics, change detection); everything else is dropped as items arrive
+PROFILE_FIELDS = ("username", "fullName", "biography", "followersCount", "followsCount",
+                  "postsCount", "error")
+POST_FIELDS = ("id", "shortCode", "url", "ownerUsername", "type", "timestamp", "likesCount",
+               "commentsCount", "videoViewCount", "hashtags", "caption")
+CAPTION_CHARS = 600  # prompts use at most 400
+
+def project_post(post):
+    out = {k: post[k] for k in POST_FIELDS if post.get(k) is not None}
+    if len(out.get("caption") or "") > CAPTION_CHARS:
+        out["caption"] = out["caption"][:CAPTION_CHARS]
+    return out
+
+def project_profile(profile):
+    out = {k: profile[k] for k in PROFILE_FIELDS if profile.get(k) is not None}
+    out["latestPosts"] = [project_post(p) for p in profile.get("latestPosts") or []]
+    return out
+
+def newest_timestamp(posts):
+    stamps = [str(p.get("timestamp") or "") for p in posts]
+    return max(stamps, default="") or None
+
+def merge_posts(cached, fresh, limit):
+    """Merge fresh posts into the cached set (fresh wins), newest first"""
+    merged = {post_key(p): p for p in cached}
+    for p in fresh:
+        merged[post_key(p)] = p
+    posts = sorted(merged.values(), key=lambda p: str(p.get("timestamp") or ""), reverse=True)
+    return posts[:limit]
+
+
+class ScrapeCache:
+    def __init__(self, root, profile_ttl=24 * 3600, posts_ttl=6 * 3600, max_bytes=200 * 1024 * 1024):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.profile_ttl = profile_ttl
+        self.posts_ttl = posts_ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, username):
+        return self.root / f"{username.lstrip('@').lower()}.json"
+
+    def get(self, username):
+        path = self._path(username)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)  # mtime doubles as last-access time for eviction
+        except OSError:
+            pass
+        return entry
+
+    def profile_fresh(self, entry):
+        return bool(entry and entry.get("profile")) and \
+            time.time() - entry.get("profile_at", 0) < self.profile_ttl
+
+    def posts_fresh(self, entry):
+        return bool(entry and "posts" in entry) and \
+            time.time() - entry.get("posts_at", 0) < self.posts_ttl
+
+    def put(self, username, profile=None, posts=None):
+        """Update one or both layers of a username's entry"""
+        with self._lock:
+            entry = self.get(username) or {"username": username.lstrip("@")}
+            now = time.time()
+            if profile is not None:
+                entry["profile"] = {k: v for k, v in profile.items() if k != "posts"}
+                entry["profile_at"] = now
+            if posts is not None:
+                entry["posts"] = posts
+                entry["posts_at"] = now
+            path = self._path(username)
+            # Unique per writer: other worker processes may be caching the same profile
+            tmp = path.with_suffix(f".{os.getpid()}.{uuid.uuid4().hex}.tmp")
+            tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, path)
+            self._evict()
+
+    def _evict(self):
+        files = []
+        for f in self.root.glob("*.json"):
+            try:
+                st = f.stat()
+                files.append((st.st_mtime, st.st_size, f))
+            except OSError:
+                pass
+        total = sum(size for _, size, _ in files)
+        for _, size, f in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                f.unlink()
+                total -= size
+            except OSError:
+                pass
+
+    def stats(self):
+        files = list(self.root.glob("*.json"))
+        return {"profiles": len(files),
+                "bytes": sum(f.stat().st_size for f in files if f.exists()),
+                "max_bytes": self.max_bytes,
+                "profile_ttl_s": self.profile_ttl, "posts_ttl_s": self.posts_ttl}
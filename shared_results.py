@@ -0,0 +1,126 @@
+"""
+Process-wide registry of per-profile artifacts (scraped snapshots, detected
+niches, niche-independent competitor facts) shared by concurrent runs.
+
+Single flight: the first run that needs a key computes it and runs needing
+the same key meanwhile wait for that result instead of paying for another
+actor run or model call. Finished results stay available for `ttl` seconds
+(the scrape cache and LLM cache keep them for longer, on disk). Errors are
+handed to the runs already waiting but never kept, so the next caller tries
+again; if the computing run is cancelled, a waiting run computes it itself.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class Abandoned(Exception):
+    """The run computing a shared result gave it up (cancelled, or the result
+    was not shareable): whoever waited for it has to compute it"""
+
+
+class SharedResults:
+    def __init__(self, ttl=300, max_entries=512):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.counters = {"computed": 0, "joined": 0, "reused": 0, "failed": 0, "abandoned": 0}
+        self._entries = OrderedDict()  # key -> (Future, finished_at or None)
+        self._lock = threading.Lock()
+
+    def claim(self, key, fresh=False):
+        """(future, owner): owner is True when the caller must compute the key
+        and then resolve() or abandon() the future. With fresh, finished
+        results are not reused, only joined while in flight."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                fut, finished_at = entry
+                if finished_at is None:
+                    self.counters["joined"] += 1
+                    return fut, False
+                if not fresh and time.monotonic() - finished_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.counters["reused"] += 1
+                    return fut, False
+            fut = Future()
+            self._entries[key] = (fut, None)
+            self._entries.move_to_end(key)
+            self.counters["computed"] += 1
+            return fut, True
+
+    def resolve(self, key, fut, value):
+        with self._lock:
+            if self._entries.get(key, (None,))[0] is fut:
+                self._entries[key] = (fut, time.monotonic())
+                self._evict()
+        fut.set_result(value)
+
+    def fail(self, key, fut, error):
+        self._drop(key, fut)
+        self.counters["abandoned" if isinstance(error, Abandoned) else "failed"] += 1
+        fut.set_exception(error)
+
+    def abandon(self, key, fut):
+        self.fail(key, fut, Abandoned(str(key)))
+
+    def _drop(self, key, fut):
+        with self._lock:
+            if self._entries.get(key, (None,))[0] is fut:
+                del self._entries[key]
+
+    def _evict(self):
+        """Drop expired results, then the least recently used ones beyond max_entries"""
+        now = time.monotonic()
+        for key, (fut, finished_at) in list(self._entries.items()):
+            if finished_at is not None and (now - finished_at >= self.ttl
+                                            or len(self._entries) > self.max_entries):
+                del self._entries[key]
+
+    def get_or_compute(self, key, fn, *args, fresh=False):
+        """(value, computed): fn(*args) run once per key across concurrent callers"""
+        while True:
+            fut, owner = self.claim(key, fresh)
+            if owner:
+                try:
+                    value = fn(*args)
+                except Exception as e:
+                    self.fail(key, fut, e)
+                    raise
+                except BaseException:
+                    self.abandon(key, fut)
+                    raise
+                self.resolve(key, fut, value)
+                return value, True
+            try:
+                return fut.result(), False
+            except Abandoned:
+                continue
+
+    async def aget_or_compute(self, key, fn, *args, fresh=False):
+        """get_or_compute for a coroutine function, on the async engine"""
+        while True:
+            fut, owner = self.claim(key, fresh)
+            if owner:
+                try:
+                    value = await fn(*args)
+                except Exception as e:
+                    self.fail(key, fut, e)
+                    raise
+                except BaseException:
+                    self.abandon(key, fut)
+                    raise
+                self.resolve(key, fut, value)
+                return value, True
+            try:
+                return await asyncio.wrap_future(fut), False
+            except Abandoned:
+                continue
+
+    def stats(self):
+        with self._lock:
+            in_flight = sum(1 for _, finished_at in self._entries.values() if finished_at is None)
+            return dict(self.counters, entries=len(self._entries), in_flight=in_flight,
+                        ttl_s=self.ttl, max_entries=self.max_entries)
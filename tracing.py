@@ -0,0 +1,161 @@
+"""
+Lightweight tracing of the hot paths (actor runs, model calls, report writes,
+PDF renders). Each span records its duration plus counters (tokens, retries,
+items, bytes) into process-wide rolling histograms, exposed in Prometheus
+text format at /metrics, and into the trace of the run it belongs to, whose
+summary is saved in the report timing.
+
+The current span and run live in context variables: worker threads and
+async tasks see the run they were submitted from as long as they are
+started with the submitter's context (see run_analysis_thread's submit).
+"""
+
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+WINDOW = 1024  # samples kept per series for the rolling quantiles
+QUANTILES = (0.5, 0.95, 0.99)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_current_run = contextvars.ContextVar("current_run", default=None)
+
+
+def _quantile(ordered, q):
+    """Nearest-rank quantile of a sorted list"""
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class _Series:
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.count, self.sum = 0, 0.0
+        self.totals = {}
+
+    def add(self, seconds, fields):
+        self.samples.append(seconds)
+        self.count += 1
+        self.sum += seconds
+        for k, v in fields.items():
+            self.totals[k] = self.totals.get(k, 0) + v
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        out = {"count": self.count, "total_s": round(self.sum, 3), "max_s": round(ordered[-1], 3)}
+        for q in QUANTILES:
+            out[f"p{round(q * 100)}_s"] = round(_quantile(ordered, q), 3)
+        out.update(self.totals)
+        return out
+
+
+class Registry:
+    """Histograms of span durations, one series per span name and label set"""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, labels, seconds, fields):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(self.window)
+            series.add(seconds, fields)
+
+    def snapshot(self):
+        with self._lock:
+            return [dict(labels, span=name, **series.summary())
+                    for (name, labels), series in sorted(self._series.items())]
+
+    def totals_by_span(self):
+        """{span name: {"count", "total_s"}} across label sets"""
+        out = {}
+        for s in self.snapshot():
+            t = out.setdefault(s["span"], {"count": 0, "total_s": 0.0})
+            t["count"] += s["count"]
+            t["total_s"] = round(t["total_s"] + s["total_s"], 3)
+        return out
+
+    def prometheus(self, prefix="radar"):
+        lines = [f"# TYPE {prefix}_span_seconds summary"]
+        counters = {}
+        with self._lock:
+            items = sorted(self._series.items())
+            for (name, labels), series in items:
+                base = [("span", name)] + list(labels)
+                ordered = sorted(series.samples)
+                for q in QUANTILES:
+                    lines.append(f"{prefix}_span_seconds{_labels(base + [('quantile', str(q))])} "
+                                 f"{_quantile(ordered, q):.6f}")
+                lines.append(f"{prefix}_span_seconds_sum{_labels(base)} {series.sum:.6f}")
+                lines.append(f"{prefix}_span_seconds_count{_labels(base)} {series.count}")
+                for field, value in series.totals.items():
+                    counters.setdefault(field, []).append(f"{prefix}_span_{field}_total{_labels(base)} {value}")
+        for field, rows in sorted(counters.items()):
+            lines.append(f"# TYPE {prefix}_span_{field}_total counter")
+            lines += rows
+        return "\n".join(lines) + "\n"
+
+
+def _labels(pairs):
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Span:
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.fields = {}
+
+    def add(self, **fields):
+        for k, v in fields.items():
+            if v:
+                self.fields[k] = self.fields.get(k, 0) + v
+
+
+registry = Registry()
+
+
+@contextmanager
+def span(name, **labels):
+    s = Span(name, {k: str(v) for k, v in labels.items()})
+    token = _current_span.set(s)
+    start = time.perf_counter()
+    try:
+        yield s
+    except BaseException:
+        s.labels["error"] = "1"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _current_span.reset(token)
+        registry.record(s.name, s.labels, elapsed, s.fields)
+        run = _current_run.get()
+        if run is not None:
+            run.record(s.name, s.labels, elapsed, s.fields)
+
+def annotate(**fields):
+    """Add counters to the current span (no-op outside a span)"""
+    s = _current_span.get()
+    if s is not None:
+        s.add(**fields)
+
+def label(**labels):
+    s = _current_span.get()
+    if s is not None:
+        s.labels.update((k, str(v)) for k, v in labels.items())
+
+def start_run():
+    """Collect the spans of this context (and of tasks started from it) into a
+    new per-run Registry; returns it and the token for end_run"""
+    trace = Registry(window=None)
+    return trace, _current_run.set(trace)
+
+def end_run(token):
+    _current_run.reset(token)